@@ -0,0 +1,273 @@
+"""
+Control de admisión: cuántas peticiones atiende cada worker a la vez, cuáles
+esperan y en qué orden, y cuántas llamadas a Supabase tiene en vuelo.
+
+Ante un pico, atender todo a la vez solo alarga la espera a Supabase de
+todas las peticiones hasta que superan el timeout del frontend (10 s) y el
+proceso se queda sin memoria. En su lugar:
+
+- `AdmissionMiddleware` deja pasar hasta ADMISSION_MAX_ACTIVE peticiones de
+  /api; las demás esperan en una cola acotada (ADMISSION_MAX_QUEUE),
+  primero por clase de ruta (ADMISSION_PRIORITY) y dentro de la clase por
+  orden de llegada. La que no cabe o no entra en ADMISSION_QUEUE_TIMEOUT
+  recibe enseguida 503 con Retry-After.
+- `repository.execute` espera un lugar de `upstream_slots` (tantas llamadas como
+  hilos del pool, en el mismo orden de clases). Si para entonces la petición
+  ya pasó su plazo (REQUEST_DEADLINE desde que llegó) se corta con 503: su
+  respuesta llegaría cuando el cliente ya se rindió.
+
+Las clases son `read` (GET y búsquedas por lote), `write` y `bulk`
+(importación y exportación, que no tienen plazo porque duran lo que el
+archivo). /metrics expone ocupación y colas (`admission_*`) y las
+peticiones rechazadas por clase y etapa (`http_requests_shed_total`).
+"""
+import asyncio
+import contextvars
+import heapq
+import itertools
+import os
+import re
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+import metrics
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() not in ("0", "false", "no")
+# Peticiones de /api atendidas a la vez por worker y cuántas pueden esperar
+ADMISSION_MAX_ACTIVE = int(os.getenv("ADMISSION_MAX_ACTIVE", "64"))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "256"))
+# Segundos máximos en la cola antes de responder 503
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "2"))
+# Segundos desde la llegada tras los que ya no se espera a Supabase; por
+# debajo del timeout de 10 s del frontend
+REQUEST_DEADLINE = float(os.getenv("REQUEST_DEADLINE", "8"))
+# Segundos que se sugieren al cliente en Retry-After
+ADMISSION_RETRY_AFTER = int(os.getenv("ADMISSION_RETRY_AFTER", "2"))
+# Orden de atención de las clases, de la más favorecida a la menos
+ADMISSION_PRIORITY = [
+    name.strip()
+    for name in os.getenv("ADMISSION_PRIORITY", "read,write,bulk").split(",")
+    if name.strip()
+]
+# Llamadas a Supabase en vuelo: el mismo límite que el pool de repository
+UPSTREAM_MAX_ACTIVE = int(os.getenv("SUPABASE_MAX_WORKERS", "16"))
+
+API_PREFIX = "/api/"
+
+ROUTE_CLASSES = ("read", "write", "bulk")
+
+# Rutas cuya clase no sale del método HTTP: (método, patrón de la ruta, clase)
+ROUTE_OVERRIDES = [
+    ("POST", re.compile(r"^/api/v1/products/batch/?$"), "read"),
+    ("GET", re.compile(r"^/api/v1/products/export/?$"), "bulk"),
+    ("POST", re.compile(r"^/api/v1/products/import/?$"), "bulk"),
+]
+
+# Clase -> prioridad (0 se atiende primero); las no listadas van al final
+PRIORITIES = {
+    name: ADMISSION_PRIORITY.index(name) if name in ADMISSION_PRIORITY else len(ADMISSION_PRIORITY)
+    for name in ROUTE_CLASSES
+}
+
+class Overloaded(HTTPException):
+    """
+    503 con Retry-After; es HTTPException para que los handlers la dejen
+    pasar sin convertirla en 500.
+    """
+
+    def __init__(self):
+        super().__init__(
+            status_code=503,
+            detail="Servicio saturado, intente de nuevo en unos segundos",
+            headers={"Retry-After": str(ADMISSION_RETRY_AFTER)},
+        )
+
+class PriorityLimiter:
+    """
+    Semáforo con cola acotada y prioridades: al liberarse un lugar pasa al
+    que espera con menor prioridad y, entre iguales, al que llegó antes.
+    """
+
+    def __init__(self, limit: int, max_queue: Optional[int] = None):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.active = 0
+        # Montículo de [prioridad, llegada, future]
+        self._waiters: List[list] = []
+        self._arrivals = itertools.count()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def _remove(self, entry: list) -> None:
+        if entry in self._waiters:
+            self._waiters.remove(entry)
+            heapq.heapify(self._waiters)
+
+    def _expire(self, entry: list) -> None:
+        if not entry[2].done():
+            self._remove(entry)
+            entry[2].set_result(False)
+
+    async def acquire(self, priority: int, timeout: Optional[float] = None) -> bool:
+        """
+        Toma un lugar; False si no cabe en la cola o no se libera uno en
+        `timeout` segundos.
+        """
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return True
+        if timeout is not None and timeout <= 0:
+            return False
+        if self.max_queue is not None and len(self._waiters) >= self.max_queue:
+            # Cola llena: entra solo si desplaza al último de una clase menos favorecida
+            last = max(self._waiters)
+            if last[0] <= priority:
+                return False
+            self._expire(last)
+
+        loop = asyncio.get_running_loop()
+        entry = [priority, next(self._arrivals), loop.create_future()]
+        heapq.heappush(self._waiters, entry)
+        expiry = loop.call_later(timeout, self._expire, entry) if timeout is not None else None
+        try:
+            return await entry[2]
+        except asyncio.CancelledError:
+            # El cliente se fue: devolver el lugar si ya se lo habían pasado
+            future = entry[2]
+            if future.done() and not future.cancelled() and future.result():
+                self.release()
+            else:
+                self._remove(entry)
+            raise
+        finally:
+            if expiry is not None:
+                expiry.cancel()
+
+    def release(self) -> None:
+        # El lugar pasa directo al siguiente, sin bajar `active`
+        while self._waiters:
+            entry = heapq.heappop(self._waiters)
+            if not entry[2].done():
+                entry[2].set_result(True)
+                return
+        self.active -= 1
+
+request_slots = PriorityLimiter(ADMISSION_MAX_ACTIVE, ADMISSION_MAX_QUEUE)
+upstream_slots = PriorityLimiter(UPSTREAM_MAX_ACTIVE)
+
+# Clase y plazo (time.monotonic) de la petición en curso
+_current: ContextVar[Optional[Tuple[str, Optional[float]]]] = ContextVar("admission", default=None)
+
+_shed_total = 0
+
+def classify(method: str, path: str) -> str:
+    """
+    Clase de la ruta: la de ROUTE_OVERRIDES o, si no, `read` para GET/HEAD y
+    `write` para el resto.
+    """
+    for override_method, pattern, route_class in ROUTE_OVERRIDES:
+        if method == override_method and pattern.match(path):
+            return route_class
+    return "read" if method in ("GET", "HEAD") else "write"
+
+def _shed(route_class: str, stage: str) -> None:
+    global _shed_total
+    _shed_total += 1
+    metrics.SHED_REQUESTS.inc((route_class, stage))
+
+@asynccontextmanager
+async def upstream_slot():
+    """
+    Lugar para una llamada a Supabase. Fuera de una petición admitida
+    (arranque, /health) espera sin plazo y con la máxima prioridad.
+    """
+    request = _current.get()
+    route_class, deadline = request if request is not None else (None, None)
+    priority = PRIORITIES[route_class] if route_class is not None else -1
+    timeout = deadline - time.monotonic() if deadline is not None else None
+    if not await upstream_slots.acquire(priority, timeout):
+        _shed(route_class, "upstream")
+        raise Overloaded()
+    try:
+        yield
+    finally:
+        upstream_slots.release()
+
+def shared_context() -> contextvars.Context:
+    """
+    Contexto para una tarea que atiende a varias peticiones (single-flight):
+    conserva la clase de la petición en curso pero sin plazo, porque cada
+    petición espera el resultado con el suyo (`wait_shared`). Es un contexto
+    nuevo: tampoco hereda las métricas de la petición que la creó.
+    """
+    request = _current.get()
+    context = contextvars.Context()
+    if request is not None:
+        context.run(_current.set, (request[0], None))
+    return context
+
+async def wait_shared(future: "asyncio.Future[Any]") -> Any:
+    """
+    Espera el resultado de una tarea compartida hasta el plazo de la
+    petición en curso; lanza `Overloaded` (503) si lo vence. La tarea sigue
+    corriendo para las demás peticiones que la esperan.
+    """
+    request = _current.get()
+    deadline = request[1] if request is not None else None
+    timeout = deadline - time.monotonic() if deadline is not None else None
+    done, _ = await asyncio.wait({future}, timeout=timeout)
+    if not done:
+        _shed(request[0], "upstream")
+        raise Overloaded()
+    return future.result()
+
+def stats() -> Dict[str, Any]:
+    return {
+        "enabled": ADMISSION_ENABLED,
+        "active": request_slots.active,
+        "queued": request_slots.queued,
+        "max_active": request_slots.limit,
+        "max_queue": request_slots.max_queue,
+        "upstream_active": upstream_slots.active,
+        "upstream_queued": upstream_slots.queued,
+        "upstream_max_active": upstream_slots.limit,
+        "shed": _shed_total,
+    }
+
+class AdmissionMiddleware:
+    """
+    Middleware ASGI: admite, encola o rechaza cada petición de /api. El
+    lugar se retiene hasta enviar toda la respuesta (también en streaming).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not ADMISSION_ENABLED or not scope["path"].startswith(API_PREFIX):
+            await self.app(scope, receive, send)
+            return
+
+        route_class = classify(scope["method"], scope["path"])
+        arrived = time.monotonic()
+        if not await request_slots.acquire(PRIORITIES[route_class], ADMISSION_QUEUE_TIMEOUT):
+            _shed(route_class, "queue")
+            error = Overloaded()
+            response = JSONResponse({"detail": error.detail}, status_code=error.status_code, headers=error.headers)
+            await response(scope, receive, send)
+            return
+
+        deadline = arrived + REQUEST_DEADLINE if route_class != "bulk" else None
+        token = _current.set((route_class, deadline))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current.reset(token)
+            request_slots.release()
@@ -0,0 +1,7 @@
+"""
+Benchmarks de la API contra un PostgREST simulado en memoria.
+
+Se ejecutan desde ``backend/``, por ejemplo::
+
+    python -m benchmarks.bench_products_count
+"""
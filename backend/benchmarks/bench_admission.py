@@ -0,0 +1,153 @@
+"""
+Sobrecarga sostenida con y sin control de admisión.
+
+Llegan `--rate` peticiones por segundo durante `--duration` segundos
+(lecturas de producto y, en `--write-share`, cambios de stock), más de las
+que Supabase puede atender con la latencia de `--latency`. Sin admisión
+todas esperan su turno en el pool, la espera crece sin límite y desde cierto
+momento todas responden después de que el frontend se rindió
+(`--client-timeout`, 10 s en axios): trabajo perdido. Con admisión las que
+no caben reciben 503 con Retry-After enseguida y las admitidas responden a
+tiempo, primero las de la clase favorecida (ADMISSION_PRIORITY).
+
+Al final verifica que una lectura coalescida (single-flight) no herede el
+plazo de la primera petición que la pidió.
+
+    python -m benchmarks.bench_admission [--rate 160] [--duration 20] [--latency 0.2]
+"""
+import argparse
+import asyncio
+import random
+import time
+from collections import Counter
+from typing import Dict, List, Tuple
+
+import httpx
+
+from .datasets import make_catalog
+from .fake_postgrest import FakePostgrest
+from .harness import build_app, percentile
+
+API = "/api/v1/products"
+
+
+async def overload(client: httpx.AsyncClient, args, products: List[dict]) -> List[Tuple[str, int, float, bool]]:
+    rng = random.Random(9)
+
+    async def one(kind: str, product_id: str) -> Tuple[str, int, float, bool]:
+        started = time.perf_counter()
+        if kind == "write":
+            response = await client.patch(f"{API}/{product_id}/stock", params={"new_stock": rng.randint(0, 500)})
+        else:
+            response = await client.get(f"{API}/{product_id}")
+        return kind, response.status_code, time.perf_counter() - started, "retry-after" in response.headers
+
+    # Llegadas a ritmo fijo, sin esperar respuestas (como muchos clientes)
+    tasks = []
+    started = time.perf_counter()
+    for index in range(int(args.rate * args.duration)):
+        delay = started + index / args.rate - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        kind = "write" if rng.random() < args.write_share else "read"
+        tasks.append(asyncio.create_task(one(kind, rng.choice(products)["id"])))
+    return await asyncio.gather(*tasks)
+
+
+def summarize(results: List[Tuple[str, int, float, bool]], client_timeout: float) -> Dict[str, float]:
+    on_time = [latency for _, status, latency, _ in results if status < 400 and latency <= client_timeout]
+    late = sum(1 for _, status, latency, _ in results if status < 400 and latency > client_timeout)
+    shed = sum(1 for _, status, _, retry in results if status == 503 and retry)
+    by_kind = Counter(kind for kind, status, latency, _ in results if status < 400 and latency <= client_timeout)
+    totals = Counter(kind for kind, _, _, _ in results)
+    return {
+        "on_time": len(on_time),
+        "late": late,
+        "shed": shed,
+        "errors": sum(1 for _, status, _, retry in results if status >= 400 and not (status == 503 and retry)),
+        "p50": percentile(on_time, 50) * 1000,
+        "p99": percentile(on_time, 99) * 1000,
+        "read_ok": by_kind["read"] / max(1, totals["read"]),
+        "write_ok": by_kind["write"] / max(1, totals["write"]),
+    }
+
+
+async def coalesced_deadlines() -> Dict[str, object]:
+    """
+    Dos lecturas coalescidas con plazos distintos mientras Supabase está
+    saturado: la primera vence esperando un lugar y la que se unió con más
+    margen debe recibir el resultado igual.
+    """
+    import admission
+    from single_flight import SingleFlight
+
+    flights = SingleFlight()
+    slots = admission.upstream_slots
+
+    async def load() -> str:
+        async with admission.upstream_slot():
+            return "ok"
+
+    async def caller(budget: float) -> object:
+        admission._current.set(("read", time.monotonic() + budget))
+        try:
+            return await flights.run("producto", load)
+        except admission.Overloaded:
+            return 503
+
+    # Todos los lugares ocupados durante 0.3 s
+    slots.active = slots.limit
+    leader = asyncio.create_task(caller(0.1))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(caller(5))
+    await asyncio.sleep(0.3)
+    for _ in range(slots.limit):
+        slots.release()
+    return {"leader": await leader, "follower": await follower}
+
+
+async def run(args) -> None:
+    import admission
+
+    fake = FakePostgrest(latency=args.latency)
+    categories, products = make_catalog(args.products)
+    fake.load("categories", categories)
+    fake.load("products", products)
+    app = build_app(fake)
+
+    print(f"{'admisión':<10} {'a tiempo':>9} {'tarde':>6} {'503':>6} {'errores':>8} "
+          f"{'p50 ms':>8} {'p99 ms':>8} {'lect ok':>8} {'escr ok':>8} {'seg':>6} {'llamadas':>9}")
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for enabled in (False, True):
+            # Se lee en cada petición: basta cambiarlo entre corridas
+            admission.ADMISSION_ENABLED = enabled
+            fake.reset_stats()
+            started = time.perf_counter()
+            results = await overload(client, args, products)
+            elapsed = time.perf_counter() - started
+            stats = summarize(results, args.client_timeout)
+            print(f"{'sí' if enabled else 'no':<10} {stats['on_time']:>9} {stats['late']:>6} {stats['shed']:>6} "
+                  f"{stats['errors']:>8} {stats['p50']:>8.0f} {stats['p99']:>8.0f} {stats['read_ok']:>8.0%} "
+                  f"{stats['write_ok']:>8.0%} {elapsed:>6.1f} {fake.total_calls:>9}")
+    print(f"\nadmission.stats() al terminar: {admission.stats()}")
+
+    admission.ADMISSION_ENABLED = True
+    coalesced = await coalesced_deadlines()
+    print(f"coalescidas con plazos 0.1 s y 5 s: {coalesced}")
+    assert coalesced == {"leader": 503, "follower": "ok"}, coalesced
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--rate", type=float, default=160, help="peticiones por segundo")
+    parser.add_argument("--duration", type=float, default=20, help="segundos de sobrecarga")
+    parser.add_argument("--latency", type=float, default=0.2, help="segundos por llamada a Supabase")
+    parser.add_argument("--write-share", type=float, default=0.2, help="fracción de cambios de stock")
+    parser.add_argument("--client-timeout", type=float, default=10.0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
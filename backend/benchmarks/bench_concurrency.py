@@ -0,0 +1,66 @@
+"""
+Throughput con peticiones concurrentes y latencia fija hacia Supabase.
+
+Si las llamadas a Supabase bloquearan el event loop, el throughput se
+quedaría en ~1/latencia sin importar la concurrencia; con la capa
+`repository` debe crecer con ella hasta el tamaño del pool de hilos.
+
+    python -m benchmarks.bench_concurrency [--latency 0.05] [--levels 1 4 16]
+"""
+import argparse
+import asyncio
+import itertools
+
+import httpx
+
+from .datasets import make_catalog
+from .fake_postgrest import FakePostgrest
+from .harness import build_app, run_load
+
+
+async def run(args) -> None:
+    fake = FakePostgrest(latency=args.latency)
+    categories, products = make_catalog(args.products)
+    fake.load("categories", categories)
+    fake.load("products", products)
+    app = build_app(fake)
+
+    counter = itertools.count()
+    category_id = categories[0]["id"]
+
+    def new_product() -> dict:
+        index = next(counter)
+        return {
+            "name": f"Carga {index}",
+            "slug": f"carga-{index}",
+            "sku": f"LOAD-{index}",
+            "category_id": category_id,
+            "price_retail": 2.5,
+            "price_wholesale": 1.5,
+        }
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        scenarios = {
+            "GET /products": lambda: client.get("/api/v1/products/", params={"per_page": 20}),
+            "GET /categories": lambda: client.get("/api/v1/categories/"),
+            "POST /products": lambda: client.post("/api/v1/products/", json=new_product()),
+        }
+        print(f"{'endpoint':<18} {'conc':>5} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8}")
+        for name, send in scenarios.items():
+            for level in args.levels:
+                stats = await run_load(send, level, args.requests)
+                print(f"{name:<18} {level:>5} {stats['throughput']:>8.1f} {stats['p50']:>8.1f} {stats['p95']:>8.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=64)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Latencia de páginas profundas: paginación por offset frente a keyset (cursor).
+
+El simulador cobra ``--offset-cost`` por cada fila que PostgreSQL recorre y
+descarta con OFFSET; con cursor la página se lee directo desde el índice
+(created_at, id), así que la latencia no depende de la profundidad. Las
+cifras descuentan el CPU del propio simulador, como en bench_products_count.
+
+    python -m benchmarks.bench_deep_pages [--products 20000] [--pages 1 100 500]
+"""
+import argparse
+
+from fastapi.testclient import TestClient
+
+from .datasets import make_catalog
+from .fake_postgrest import FakePostgrest, _sort_rows
+from .harness import build_app, time_calls
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--products", type=int, default=20000)
+    parser.add_argument("--per-page", type=int, default=20)
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 100, 500, 900])
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--offset-cost", type=float, default=5e-6, help="Segundos por fila descartada")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    fake = FakePostgrest(latency=args.latency, offset_cost=args.offset_cost)
+    categories, products = make_catalog(args.products)
+    fake.load("categories", categories)
+    fake.load("products", products)
+    client = TestClient(build_app(fake))
+    from routers.products import encode_cursor
+
+    ordered = _sort_rows(products, "created_at.desc,id.desc")
+    base = {"per_page": args.per_page, "active_only": "false", "count_mode": "planned"}
+
+    def measure(params) -> float:
+        fake.reset_stats()
+        stats = time_calls(lambda: client.get("/api/v1/products/", params=params).raise_for_status(), repeat=args.repeat)
+        return stats["mean"] - fake.server_seconds / (args.repeat + 2) * 1000
+
+    print(f"{'página':>8} {'offset ms':>10} {'cursor ms':>10}")
+    for page in args.pages:
+        offset_ms = measure({**base, "page": page})
+        if page == 1:
+            cursor_params = dict(base)
+        else:
+            cursor_params = {**base, "cursor": encode_cursor(ordered[(page - 1) * args.per_page - 1])}
+        cursor_ms = measure(cursor_params)
+        print(f"{page:>8} {offset_ms:>10.1f} {cursor_ms:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Exportación del catálogo: `GET /products/export` vs. recorrer
+`GET /products/` página por página (per_page=100, con conteo en cada una).
+
+Reporta tiempo, llamadas a Supabase y el pico de memoria de Python mientras
+se descarga el cuerpo (sin contar los datos del backend simulado). La app
+se llama directo por ASGI y el cuerpo se descarta a medida que llega:
+`httpx.ASGITransport` lo acumularía completo y falsearía la medición.
+
+    python -m benchmarks.bench_export [--products 5000 50000] [--latency 0.02]
+"""
+import argparse
+import asyncio
+import time
+import tracemalloc
+
+import httpx
+
+from .datasets import make_catalog
+from .fake_postgrest import FakePostgrest
+from .harness import build_app
+
+
+async def asgi_get(app, path: str, params: dict) -> int:
+    """GET directo a la app ASGI; retorna los bytes del cuerpo sin guardarlos."""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": str(httpx.QueryParams(params)).encode(),
+        "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 1234),
+        "server": ("bench", 80),
+    }
+    received = 0
+    status = None
+    requested = False
+    finished = asyncio.Event()
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # Starlette escucha la desconexión mientras envía el stream
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal received, status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            received += len(message.get("body", b""))
+            if not message.get("more_body", False):
+                finished.set()
+
+    await app(scope, receive, send)
+    assert status == 200, status
+    return received
+
+
+async def export(app, params: dict) -> int:
+    return await asgi_get(app, "/api/v1/products/export", params)
+
+
+async def paginate(client: httpx.AsyncClient) -> int:
+    received, page = 0, 1
+    while True:
+        response = await client.get("/api/v1/products/", params={"page": page, "per_page": 100})
+        response.raise_for_status()
+        received += len(response.content)
+        if page >= response.json()["total_pages"]:
+            return received
+        page += 1
+
+
+async def run(args) -> None:
+    print(f"{'productos':>9} {'método':<16} {'segundos':>9} {'MB':>7} {'llamadas':>9} {'pico MB':>8}")
+    for count in args.products:
+        fake = FakePostgrest(latency=args.latency)
+        categories, products = make_catalog(count)
+        fake.load("categories", categories)
+        fake.load("products", products)
+        app = build_app(fake)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            scenarios = {
+                "export ndjson": lambda: export(app, {"format": "ndjson"}),
+                "export csv": lambda: export(app, {"format": "csv"}),
+                "páginas de 100": lambda: paginate(client),
+            }
+            for name, download in scenarios.items():
+                fake.reset_stats()
+                started = time.perf_counter()
+                received = await download()
+                elapsed = time.perf_counter() - started
+                calls = fake.total_calls
+                # Segunda pasada para la memoria: tracemalloc distorsiona los tiempos
+                tracemalloc.start()
+                await download()
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                print(
+                    f"{count:>9} {name:<16} {elapsed:>9.2f} {received / 1e6:>7.1f} "
+                    f"{calls:>9} {peak / 1e6:>8.1f}"
+                )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--products", type=int, nargs="+", default=[5000, 50000])
+    parser.add_argument("--latency", type=float, default=0.02)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Importación masiva vs. creación producto por producto.
+
+Compara `POST /products/import` (CSV y NDJSON) con llamar a
+`POST /products/` por cada fila, con latencia fija hacia Supabase. La
+creación individual se mide sobre una muestra y se extrapola al total.
+
+    python -m benchmarks.bench_import [--rows 5000] [--latency 0.02] [--chunk-size 500]
+"""
+import argparse
+import asyncio
+import csv
+import io
+import json
+import time
+
+import httpx
+
+from .datasets import make_catalog, make_products
+from .fake_postgrest import FakePostgrest
+from .harness import build_app
+
+PRODUCT_COLUMNS = (
+    "name", "description", "slug", "sku", "category_id", "price_retail",
+    "price_wholesale", "price_gym", "price_cafeteria", "price_store",
+    "weight_grams", "dimensions_cm", "ingredients", "nutritional_info",
+    "allergens", "stock_quantity", "min_stock_alert", "max_order_quantity",
+    "min_order_quantity", "main_image_url", "gallery_images", "is_active",
+    "is_featured", "tags",
+)
+
+
+def import_rows(count: int, categories, prefix: str):
+    rows = []
+    for product in make_products(count, categories, seed=7):
+        row = {column: product[column] for column in PRODUCT_COLUMNS}
+        row["slug"] = f"{prefix}-{row['slug']}"
+        row["sku"] = f"{prefix.upper()}-{row['sku']}"
+        rows.append(row)
+    return rows
+
+
+def to_csv(rows) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(PRODUCT_COLUMNS)
+    for row in rows:
+        cells = []
+        for column in PRODUCT_COLUMNS:
+            value = row[column]
+            if value is None:
+                cells.append("")
+            elif column == "nutritional_info":
+                cells.append(json.dumps(value))
+            elif isinstance(value, list):
+                cells.append("|".join(value))
+            else:
+                cells.append(value)
+        writer.writerow(cells)
+    return buffer.getvalue().encode()
+
+
+def to_ndjson(rows) -> bytes:
+    return "".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows).encode()
+
+
+async def run(args) -> None:
+    fake = FakePostgrest(latency=args.latency)
+    categories, products = make_catalog(args.products)
+    fake.load("categories", categories)
+    fake.load("products", products)
+    app = build_app(fake)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        print(f"{'método':<22} {'filas':>6} {'aceptadas':>10} {'segundos':>9} {'filas/s':>8} {'llamadas':>9}")
+
+        for name, content_type, encode in (
+            ("import CSV", "text/csv", to_csv),
+            ("import NDJSON", "application/x-ndjson", to_ndjson),
+        ):
+            rows = import_rows(args.rows, categories, name.split()[-1].lower())
+            body = encode(rows)
+            fake.reset_stats()
+            started = time.perf_counter()
+            response = await client.post(
+                "/api/v1/products/import",
+                params={"chunk_size": args.chunk_size},
+                content=body,
+                headers={"Content-Type": content_type},
+            )
+            elapsed = time.perf_counter() - started
+            response.raise_for_status()
+            report = response.json()
+            print(
+                f"{name:<22} {report['total_rows']:>6} {report['accepted']:>10} "
+                f"{elapsed:>9.2f} {args.rows / elapsed:>8.0f} {fake.total_calls:>9}"
+            )
+
+        rows = import_rows(args.sample, categories, "single")
+        fake.reset_stats()
+        started = time.perf_counter()
+        for row in rows:
+            (await client.post("/api/v1/products/", json=row)).raise_for_status()
+        elapsed = (time.perf_counter() - started) * args.rows / args.sample
+        calls = fake.total_calls * args.rows // args.sample
+        print(
+            f"{'POST /products (extr.)':<22} {args.rows:>6} {args.rows:>10} "
+            f"{elapsed:>9.2f} {args.rows / elapsed:>8.0f} {calls:>9}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--products", type=int, default=10000, help="productos ya existentes")
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--sample", type=int, default=100, help="filas creadas una a una")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Latencia de GET /api/v1/products según el tamaño del catálogo.
+
+Con el conteo en el servidor la primera página transfiere solo ``per_page``
+filas, así que la latencia debe mantenerse plana al crecer el catálogo. La
+columna "sin DB" descuenta el CPU del simulador (el filtrado y orden que en
+producción resuelve PostgreSQL con índices) y aísla red + API.
+
+    python -m benchmarks.bench_products_count [--sizes 1000 10000 50000]
+"""
+import argparse
+
+from fastapi.testclient import TestClient
+
+from .datasets import make_catalog
+from .fake_postgrest import FakePostgrest
+from .harness import build_app, time_calls
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--latency", type=float, default=0.02, help="Latencia por llamada (s)")
+    parser.add_argument("--bandwidth", type=float, default=20e6, help="Bytes/s hacia Supabase")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    fake = FakePostgrest(latency=args.latency, bandwidth=args.bandwidth)
+    client = TestClient(build_app(fake))
+
+    print(
+        f"{'productos':>10} {'modo':>10} {'p50 ms':>9} {'p95 ms':>9} "
+        f"{'sin DB ms':>10} {'llamadas':>9} {'KB upstream':>12}"
+    )
+    for size in args.sizes:
+        categories, products = make_catalog(size)
+        fake.load("categories", categories)
+        fake.load("products", products)
+        for mode in ("exact", "planned", "estimated"):
+            url = f"/api/v1/products/?per_page=20&count_mode={mode}"
+            fake.reset_stats()
+            stats = time_calls(lambda: client.get(url).raise_for_status(), repeat=args.repeat)
+            runs = args.repeat + 2
+            server_ms = fake.server_seconds / runs * 1000
+            print(
+                f"{size:>10} {mode:>10} {stats['p50']:>9.1f} {stats['p95']:>9.1f} "
+                f"{stats['mean'] - server_ms:>10.1f} {fake.total_calls / runs:>9.1f} "
+                f"{fake.bytes_sent / runs / 1024:>12.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
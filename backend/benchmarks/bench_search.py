@@ -0,0 +1,76 @@
+"""
+Búsqueda de productos: índice invertido en memoria frente a `ilike %term%`.
+
+Para cada tamaño de catálogo mide la construcción del índice (tiempo y
+memoria), el tiempo puro de consulta del índice y la latencia de punta a
+punta de GET /api/v1/products?search=... por ambos caminos. En el camino
+ilike el simulador recorre todas las filas, como el seq scan de PostgreSQL
+con comodín inicial; la columna "DB ms" muestra ese costo por separado.
+
+    python -m benchmarks.bench_search [--sizes 10000 100000]
+"""
+import argparse
+import asyncio
+import time
+import tracemalloc
+
+from fastapi.testclient import TestClient
+
+from .datasets import make_catalog
+from .fake_postgrest import FakePostgrest
+from .harness import build_app, time_calls
+
+QUERIES = ["proteina", "choco", "vegano almendra", "SKU-0000042", "cúrcuma jengibre"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    fake = FakePostgrest(latency=args.latency)
+    client = TestClient(build_app(fake))
+    import database
+    from search import ProductSearchIndex, search_index
+
+    for size in args.sizes:
+        categories, products = make_catalog(size)
+        fake.load("categories", categories)
+        fake.load("products", products)
+
+        started = time.perf_counter()
+        index = ProductSearchIndex()
+        index.rebuild(products)
+        build_ms = (time.perf_counter() - started) * 1000
+        del index
+        tracemalloc.start()
+        index = ProductSearchIndex()
+        index.rebuild(products)
+        memory_mb = tracemalloc.get_traced_memory()[0] / 1e6
+        tracemalloc.stop()
+        del index
+        print(f"\n{size} productos: índice construido en {build_ms:.0f} ms, {memory_mb:.1f} MB")
+
+        asyncio.run(search_index.load(database.get_supabase_client()))
+        print(f"{'consulta':<20} {'índice ms':>10} {'ilike ms':>10} {'DB ms':>8} {'API índice ms':>14}")
+        for query in QUERIES:
+            started = time.perf_counter()
+            for _ in range(args.repeat):
+                search_index.search(query)
+            engine_ms = (time.perf_counter() - started) * 1000 / args.repeat
+
+            url = "/api/v1/products/"
+            params = {"search": query, "per_page": 20}
+            search_index.enabled = False
+            fake.reset_stats()
+            ilike = time_calls(lambda: client.get(url, params=params).raise_for_status(), repeat=args.repeat, warmup=0)
+            db_ms = fake.server_seconds / args.repeat * 1000
+            search_index.enabled = True
+            indexed = time_calls(lambda: client.get(url, params=params).raise_for_status(), repeat=args.repeat)
+            print(f"{query:<20} {engine_ms:>10.2f} {ilike['p50']:>10.1f} {db_ms:>8.1f} {indexed['p50']:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+CPU de serialización de una página de productos (per_page=100).
+
+Compara, sobre las mismas 100 filas con categoría embebida:
+
+- FastAPI: construir ``ProductsListResponse`` y dejar que ``response_model``
+  lo valide otra vez, lo pase por ``jsonable_encoder`` y ``json.dumps``
+  (como respondía ``get_products`` originalmente)
+- ``render`` validado: una pasada por el TypeAdapter precompilado
+- ``render`` confiable: recorte de campos sin validar + orjson / json
+
+y luego el request completo ``GET /products?per_page=100`` descontando el
+tiempo del backend simulado.
+
+    python -m benchmarks.bench_serialization [--repeat 200]
+"""
+import argparse
+import asyncio
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.testclient import TestClient
+from fastapi.utils import create_model_field
+
+from .datasets import make_catalog
+from .fake_postgrest import FakePostgrest
+from .harness import build_app, time_calls
+
+
+def page_rows(categories, products):
+    by_id = {category["id"]: category for category in categories}
+    rows = []
+    for product in products:
+        category = by_id.get(product["category_id"])
+        rows.append({
+            **product,
+            "category": {key: category[key] for key in ("id", "name", "slug")} if category else None,
+        })
+    return rows
+
+
+def run(args) -> None:
+    fake = FakePostgrest()
+    categories, products = make_catalog(args.products)
+    fake.load("categories", categories)
+    fake.load("products", products)
+    app = build_app(fake)
+
+    import http_cache
+    from models import ProductsListResponse
+
+    rows = page_rows(categories, products[:100])
+    page = {"products": rows, "total": args.products, "page": 1, "per_page": 100, "total_pages": args.products // 100}
+    field = create_model_field("response", ProductsListResponse)
+    loop = asyncio.new_event_loop()
+
+    def fastapi_path():
+        model = ProductsListResponse(**page)
+        content = loop.run_until_complete(serialize_response(field=field, response_content=model))
+        return JSONResponse(content).body
+
+    def render_with(trusted: bool, encoder):
+        def call():
+            http_cache.TRUSTED_UPSTREAM, http_cache.orjson = trusted, encoder
+            return http_cache.render(ProductsListResponse, page, trusted=True).body
+        return call
+
+    orjson = http_cache.orjson
+    scenarios = {
+        "FastAPI response_model": fastapi_path,
+        "render validado": render_with(False, orjson),
+        "render confiable + json": render_with(True, None),
+    }
+    if orjson is not None:
+        scenarios["render confiable + orjson"] = render_with(True, orjson)
+
+    print(f"{'serialización (100 productos)':<30} {'p50 ms':>8} {'p95 ms':>8} {'KB':>6}")
+    for name, call in scenarios.items():
+        stats = time_calls(call, repeat=args.repeat, warmup=5)
+        print(f"{name:<30} {stats['p50']:>8.2f} {stats['p95']:>8.2f} {len(call()) / 1024:>6.1f}")
+
+    print(f"\n{'GET /products?per_page=100':<30} {'ms/req':>8} {'sin DB':>8}")
+    client = TestClient(app)
+    for name, trusted in (("validado", False), ("confiable", True)):
+        http_cache.TRUSTED_UPSTREAM, http_cache.orjson = trusted, orjson
+        fake.reset_stats()
+        stats = time_calls(
+            lambda: client.get("/api/v1/products/", params={"per_page": 100}).raise_for_status(),
+            repeat=args.repeat // 4,
+            warmup=3,
+        )
+        server_ms = fake.server_seconds * 1000 / fake.total_calls
+        print(f"{name:<30} {stats['mean']:>8.2f} {stats['mean'] - server_ms:>8.2f}")
+    loop.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=200)
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
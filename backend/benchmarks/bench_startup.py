@@ -0,0 +1,103 @@
+"""
+Arranque en frío: importar la app, correr el lifespan (crear el cliente y,
+con STARTUP_WARMUP, precalentar) y las primeras peticiones.
+
+Cada medición corre en un proceso nuevo, como un worker que despierta en
+Render. El backend simulado no tiene TLS, así que el ahorro de reutilizar
+conexiones no aparece aquí; sí el de la caché, el índice de búsqueda y los
+modelos ya compilados al llegar la primera petición.
+
+    python -m benchmarks.bench_startup [--runs 5] [--latency 0.05]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+PATHS = {
+    "GET /products": "/api/v1/products/",
+    "GET /categories": "/api/v1/categories/",
+    "GET /products search": "/api/v1/products/?search=proteina",
+}
+
+
+def child(args) -> None:
+    """Una medición; imprime los tiempos en ms como JSON."""
+    os.environ["CATALOG_CACHE_TTL"] = "60"
+    os.environ["STARTUP_WARMUP"] = "true" if args.warmup else "false"
+
+    import httpx
+
+    from .datasets import make_catalog
+    from .fake_postgrest import FakePostgrest
+
+    fake = FakePostgrest(latency=args.latency)
+    categories, products = make_catalog(args.products)
+    fake.load("categories", categories)
+    fake.load("products", products)
+
+    from .harness import build_app
+
+    started = time.perf_counter()
+    app = build_app(fake)
+    imported = time.perf_counter()
+
+    async def run() -> dict:
+        timings = {"import": (imported - started) * 1000}
+        async with app.router.lifespan_context(app):
+            timings["lifespan"] = (time.perf_counter() - imported) * 1000
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                for name, path in PATHS.items():
+                    for attempt in ("1ª", "2ª"):
+                        request_started = time.perf_counter()
+                        response = await client.get(path)
+                        response.raise_for_status()
+                        timings[f"{name} {attempt}"] = (time.perf_counter() - request_started) * 1000
+        return timings
+
+    print(json.dumps(asyncio.run(run())))
+
+
+def measure(args, warmup: bool) -> dict:
+    command = [
+        sys.executable, "-m", "benchmarks.bench_startup", "--child",
+        "--products", str(args.products), "--latency", str(args.latency),
+    ]
+    if warmup:
+        command.append("--warmup")
+    runs = []
+    for _ in range(args.runs):
+        output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    return {name: statistics.median(run[name] for run in runs) for name in runs[0]}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--warmup", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args)
+        return
+
+    cold = measure(args, warmup=False)
+    warm = measure(args, warmup=True)
+    print(f"{'etapa (mediana ms)':<28} {'sin precalentar':>16} {'STARTUP_WARMUP':>15}")
+    for name in cold:
+        print(f"{name:<28} {cold[name]:>16.1f} {warm[name]:>15.1f}")
+    for label, timings in (("sin precalentar", cold), ("STARTUP_WARMUP", warm)):
+        first_byte = timings["import"] + timings["lifespan"] + timings["GET /products 1ª"]
+        print(f"hasta la 1ª página de productos ({label}): {first_byte:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Pedidos simultáneos sobre los mismos productos: ¿se pierden descuentos de
+stock?
+
+Cada pedido descuenta 1 a 3 unidades de uno o dos productos "calientes".
+Se compara `POST /products/stock/adjustments` (sql/006, atómico) con leer
+el stock, restar y escribirlo con `PATCH /products/{id}/stock`. Al final
+el stock de cada producto debe ser el inicial menos lo descontado por los
+pedidos aceptados; la diferencia son actualizaciones perdidas. Termina con
+código 1 si el ajuste atómico pierde alguna o deja stock negativo.
+
+    python -m benchmarks.bench_stock_adjust [--orders 2000] [--concurrency 200] [--hot 5]
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+from typing import Dict, List
+
+import httpx
+
+from .datasets import make_catalog
+from .fake_postgrest import FakePostgrest
+from .harness import build_app
+
+API = "/api/v1/products"
+
+
+def make_orders(args, hot: List[dict]) -> List[List[dict]]:
+    rng = random.Random(5)
+    orders = []
+    for _ in range(args.orders):
+        lines = rng.sample(hot, rng.randint(1, min(2, len(hot))))
+        orders.append([{"product_id": product["id"], "delta": -rng.randint(1, 3)} for product in lines])
+    return orders
+
+
+async def atomic_order(client: httpx.AsyncClient, lines: List[dict]) -> bool:
+    response = await client.post(f"{API}/stock/adjustments", json={"items": lines})
+    if response.status_code == 409:
+        return False
+    response.raise_for_status()
+    return True
+
+
+async def read_modify_write_order(client: httpx.AsyncClient, lines: List[dict]) -> bool:
+    for line in lines:
+        response = await client.get(f"{API}/{line['product_id']}", params={"fields": "stock_quantity"})
+        response.raise_for_status()
+        new_stock = response.json()["stock_quantity"] + line["delta"]
+        if new_stock < 0:
+            return False
+        response = await client.patch(f"{API}/{line['product_id']}/stock", params={"new_stock": new_stock})
+        response.raise_for_status()
+    return True
+
+
+async def run(args) -> int:
+    failures = 0
+    print(f"{'método':<22} {'pedidos':>8} {'aceptados':>10} {'rechazados':>11} {'perdidas':>9} "
+          f"{'negativos':>10} {'llam/ped':>9} {'seg':>6}")
+    for name, place in (("ajuste atómico", atomic_order), ("leer-restar-escribir", read_modify_write_order)):
+        fake = FakePostgrest(latency=args.latency)
+        categories, products = make_catalog(args.products)
+        hot = products[:args.hot]
+        for product in hot:
+            product["stock_quantity"] = args.stock
+        fake.load("categories", categories)
+        fake.load("products", products)
+        app = build_app(fake)
+        orders = make_orders(args, hot)
+
+        semaphore = asyncio.Semaphore(args.concurrency)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            async def one(lines: List[dict]) -> bool:
+                async with semaphore:
+                    return await place(client, lines)
+
+            fake.reset_stats()
+            started = time.perf_counter()
+            accepted = await asyncio.gather(*(one(lines) for lines in orders))
+            elapsed = time.perf_counter() - started
+            calls = fake.total_calls
+
+        # Stock esperado: el inicial menos las líneas de los pedidos aceptados
+        expected: Dict[str, int] = {product["id"]: args.stock for product in hot}
+        for lines, ok in zip(orders, accepted):
+            if ok:
+                for line in lines:
+                    expected[line["product_id"]] += line["delta"]
+        final = {row["id"]: row["stock_quantity"] for row in fake.tables["products"] if row["id"] in expected}
+        lost = sum(final[product_id] - expected[product_id] for product_id in expected)
+        negative = sum(1 for stock in final.values() if stock < 0)
+        print(f"{name:<22} {len(orders):>8} {sum(accepted):>10} {len(orders) - sum(accepted):>11} {lost:>9} "
+              f"{negative:>10} {calls / len(orders):>9.2f} {elapsed:>6.2f}")
+        if place is atomic_order and (lost or negative):
+            failures += 1
+    return failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--products", type=int, default=200)
+    parser.add_argument("--hot", type=int, default=5, help="productos que reciben todos los pedidos")
+    parser.add_argument("--stock", type=int, default=1500, help="stock inicial de cada producto caliente")
+    parser.add_argument("--orders", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.005)
+    sys.exit(1 if asyncio.run(run(parser.parse_args())) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Sincronización de stock: `PATCH /products/stock` en lote vs. un
+`PATCH /products/{id}/stock` por producto.
+
+El lote se mide con la función `update_product_stock_batch` (sql/001) y sin
+ella (PATCH agrupado por stock). La versión individual se mide sobre una
+muestra y se extrapola.
+
+    python -m benchmarks.bench_stock_batch [--products 10000] [--items 5000] [--latency 0.02]
+"""
+import argparse
+import asyncio
+import random
+import time
+
+import httpx
+
+from .datasets import make_catalog
+from .fake_postgrest import FakePostgrest
+from .harness import build_app
+
+
+async def run(args) -> None:
+    fake = FakePostgrest(latency=args.latency)
+    categories, products = make_catalog(args.products)
+    fake.load("categories", categories)
+    fake.load("products", products)
+    app = build_app(fake)
+
+    rng = random.Random(3)
+    chosen = rng.sample(products, args.items)
+    items = [
+        {"product_id": product["id"], "new_stock": rng.randint(0, 500)} if index % 2
+        else {"sku": product["sku"], "new_stock": rng.randint(0, 500)}
+        for index, product in enumerate(chosen)
+    ]
+    # Algunos inexistentes, para verificar el reporte
+    items.append({"product_id": "00000000-0000-4000-8000-000000000000", "new_stock": 1})
+    items.append({"sku": "NO-EXISTE", "new_stock": 1})
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        print(f"{'método':<28} {'ítems':>6} {'segundos':>9} {'llamadas':>9} {'faltantes':>10}")
+
+        for name, rpcs in (
+            ("lote (función SQL)", dict(fake.rpcs)),
+            ("lote (PATCH por stock)", {}),
+        ):
+            fake.rpcs = rpcs
+            fake.reset_stats()
+            started = time.perf_counter()
+            response = await client.patch("/api/v1/products/stock", json={"items": items})
+            elapsed = time.perf_counter() - started
+            response.raise_for_status()
+            result = response.json()
+            missing = len(result["missing_ids"]) + len(result["missing_skus"])
+            assert len(result["updated"]) == args.items, len(result["updated"])
+            print(f"{name:<28} {len(items):>6} {elapsed:>9.2f} {fake.total_calls:>9} {missing:>10}")
+
+        sample = chosen[:args.sample]
+        fake.reset_stats()
+        started = time.perf_counter()
+        for product in sample:
+            response = await client.patch(
+                f"/api/v1/products/{product['id']}/stock", params={"new_stock": 7}
+            )
+            response.raise_for_status()
+        elapsed = (time.perf_counter() - started) * args.items / len(sample)
+        calls = fake.total_calls * args.items // len(sample)
+        print(f"{'PATCH /{id}/stock (extr.)':<28} {args.items:>6} {elapsed:>9.2f} {calls:>9} {'-':>10}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--products", type=int, default=10000)
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--sample", type=int, default=100, help="productos actualizados uno a uno")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
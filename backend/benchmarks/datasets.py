@@ -0,0 +1,99 @@
+"""
+Catálogos sintéticos y deterministas para los benchmarks.
+"""
+import random
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Tuple
+
+CATEGORY_NAMES = [
+    "Proteínas", "Barras energéticas", "Snacks saludables", "Bebidas funcionales",
+    "Cereales y granola", "Frutos secos", "Suplementos", "Repostería fit",
+    "Lácteos vegetales", "Café y té", "Untables", "Sin gluten",
+]
+
+PRODUCT_WORDS = [
+    "proteína", "whey", "vainilla", "chocolate", "cacao", "almendra", "maní",
+    "avena", "quinoa", "coco", "plátano", "fresa", "café", "matcha", "canela",
+    "miel", "chía", "linaza", "nuez", "arándano", "limón", "jengibre", "cúrcuma",
+    "keto", "vegano", "orgánico", "integral", "crujiente", "energía", "batido",
+]
+
+TAGS = [
+    "sin-azucar", "vegano", "keto", "sin-gluten", "alto-en-proteina", "organico",
+    "bajo-en-grasa", "fitness", "snack", "desayuno", "post-entreno", "natural",
+]
+
+ALLERGENS = ["leche", "soya", "maní", "frutos secos", "gluten", "huevo", "sésamo"]
+
+EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def make_categories(count: int = len(CATEGORY_NAMES), seed: int = 0) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    categories = []
+    for index in range(count):
+        base = CATEGORY_NAMES[index % len(CATEGORY_NAMES)]
+        name = base if index < len(CATEGORY_NAMES) else f"{base} {index}"
+        timestamp = (EPOCH + timedelta(minutes=index)).isoformat()
+        categories.append({
+            "id": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            "name": name,
+            "description": f"Categoría de {name.lower()}",
+            "slug": f"categoria-{index}",
+            "image_url": None,
+            "is_active": index % 7 != 6,
+            "created_at": timestamp,
+            "updated_at": timestamp,
+        })
+    return categories
+
+
+def make_products(count: int, categories: List[Dict[str, Any]], seed: int = 0) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    products = []
+    for index in range(count):
+        words = rng.sample(PRODUCT_WORDS, 3)
+        name = " ".join(words).capitalize() + f" {index}"
+        wholesale = round(rng.uniform(1, 80), 2)
+        timestamp = (EPOCH + timedelta(seconds=index * 37)).isoformat()
+        products.append({
+            "id": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            "name": name,
+            "description": f"{name} elaborado con {', '.join(rng.sample(PRODUCT_WORDS, 4))}.",
+            "slug": f"producto-{index}",
+            "sku": f"SKU-{index:07d}",
+            "category_id": rng.choice(categories)["id"] if categories else None,
+            "price_retail": round(wholesale * 1.4, 2),
+            "price_wholesale": wholesale,
+            "price_gym": round(wholesale * 1.2, 2) if rng.random() < 0.6 else None,
+            "price_cafeteria": round(wholesale * 1.25, 2) if rng.random() < 0.3 else None,
+            "price_store": round(wholesale * 1.3, 2) if rng.random() < 0.5 else None,
+            "weight_grams": rng.choice([30, 45, 60, 250, 500, 1000]),
+            "dimensions_cm": "10x5x2",
+            "ingredients": ", ".join(rng.sample(PRODUCT_WORDS, 6)),
+            "nutritional_info": {
+                "calorias": rng.randint(80, 450),
+                "proteina_g": rng.randint(0, 30),
+                "carbohidratos_g": rng.randint(0, 60),
+                "grasas_g": rng.randint(0, 25),
+            },
+            "allergens": rng.sample(ALLERGENS, rng.randint(0, 3)),
+            "stock_quantity": rng.randint(0, 500),
+            "min_stock_alert": 10,
+            "max_order_quantity": rng.choice([None, 50, 100, 500]),
+            "min_order_quantity": rng.choice([1, 1, 1, 6, 12]),
+            "main_image_url": f"https://cdn.example.com/products/{index}.jpg",
+            "gallery_images": [f"https://cdn.example.com/products/{index}-{g}.jpg" for g in range(3)],
+            "is_active": rng.random() < 0.9,
+            "is_featured": rng.random() < 0.05,
+            "tags": rng.sample(TAGS, rng.randint(1, 4)),
+            "created_at": timestamp,
+            "updated_at": timestamp,
+        })
+    return products
+
+
+def make_catalog(product_count: int, seed: int = 0) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    categories = make_categories(seed=seed)
+    return categories, make_products(product_count, categories, seed=seed)
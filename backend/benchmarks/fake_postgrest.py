@@ -0,0 +1,851 @@
+"""
+Sustituto en memoria de PostgREST para medir la API sin un proyecto de Supabase.
+
+Implementa el subconjunto del protocolo que usan los routers: selects con
+recursos embebidos, filtros (eq, neq, gt, gte, lt, lte, like, ilike, in, is,
+or/and anidados), order, limit/offset, conteos vía ``Prefer: count=...`` y
+escrituras con ``return=representation``, además de las restricciones
+unique/foreign key del esquema. Cada llamada puede llevar latencia inyectada
+y un costo de transferencia por byte para emular la red hasta Supabase.
+"""
+import asyncio
+import itertools
+import json
+import operator
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+# Restricciones del esquema: columnas únicas y llaves foráneas
+UNIQUE_COLUMNS = {
+    "categories": ("slug",),
+    "products": ("slug", "sku"),
+}
+
+FOREIGN_KEYS = {
+    # tabla: [(columna, tabla referenciada)]
+    "products": [("category_id", "categories")],
+}
+
+TABLE_DEFAULTS = {
+    "categories": {
+        "description": None,
+        "image_url": None,
+        "is_active": True,
+    },
+    "products": {
+        "description": None,
+        "sku": None,
+        "category_id": None,
+        "price_gym": None,
+        "price_cafeteria": None,
+        "price_store": None,
+        "weight_grams": None,
+        "dimensions_cm": None,
+        "ingredients": None,
+        "nutritional_info": None,
+        "allergens": None,
+        "stock_quantity": 0,
+        "min_stock_alert": 10,
+        "max_order_quantity": None,
+        "min_order_quantity": 1,
+        "main_image_url": None,
+        "gallery_images": None,
+        "is_active": True,
+        "is_featured": False,
+        "tags": None,
+    },
+}
+
+
+def _stock_alert(row: Dict[str, Any], previous: Optional[Dict[str, Any]]) -> None:
+    """Como la columna generada ``is_low_stock`` y el trigger de sql/005."""
+    low = row.get("stock_quantity", 0) <= row.get("min_stock_alert", 10)
+    if previous is None:
+        if low:
+            row.setdefault("stock_alert_changed_at", row.get("created_at") or utcnow_iso())
+    elif previous.get("is_low_stock") != low:
+        row["stock_alert_changed_at"] = utcnow_iso()
+    row["is_low_stock"] = low
+
+
+# Columnas que PostgreSQL calcula en cada INSERT/UPDATE (generadas o por trigger)
+TRIGGERS: Dict[str, Callable[[Dict[str, Any], Optional[Dict[str, Any]]], None]] = {
+    "products": _stock_alert,
+}
+
+# Tablas cuyas filas eliminadas dejan una lápida en ``catalog_tombstones`` (sql/007)
+TOMBSTONE_TABLES = ("categories", "products")
+
+
+class PostgrestError(Exception):
+    def __init__(self, status_code: int, code: str, message: str, details: Optional[str] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.payload = {"code": code, "details": details, "hint": None, "message": message}
+
+
+def utcnow_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _split_top_level(text: str, sep: str = ",") -> List[str]:
+    """Divide por ``sep`` ignorando separadores entre paréntesis o comillas."""
+    parts, depth, quoted, current = [], 0, False, []
+    for char in text:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        if char == sep and depth == 0 and not quoted:
+            parts.append("".join(current))
+            current = []
+        else:
+            current.append(char)
+    if current:
+        parts.append("".join(current))
+    return parts
+
+
+def _unquote(value: str) -> str:
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        return value[1:-1]
+    return value
+
+
+def _coerce(criteria: str, sample: Any) -> Any:
+    if isinstance(sample, bool):
+        # PostgreSQL acepta true/True/TRUE; postgrest-py envía str(True)
+        return criteria.lower() == "true"
+    if isinstance(sample, (int, float)):
+        try:
+            return float(criteria)
+        except ValueError:
+            return criteria
+    return criteria
+
+
+def _pattern(criteria: str, flags: int = 0) -> "re.Pattern[str]":
+    parts = re.split(r"[*%]", criteria)
+    return re.compile("^" + ".*".join(re.escape(part) for part in parts) + "$", flags | re.DOTALL)
+
+
+def _compare(value: Any, operator: str, criteria: str) -> bool:
+    if operator == "is":
+        if criteria.lower() == "null":
+            return value is None
+        return value is (criteria.lower() == "true")
+    if operator == "in":
+        options = [_unquote(item) for item in _split_top_level(criteria.strip("()"))]
+        return value is not None and any(value == _coerce(option, value) or str(value) == option for option in options)
+    if operator in ("like", "ilike"):
+        if value is None:
+            return False
+        flags = re.IGNORECASE if operator == "ilike" else 0
+        return _pattern(criteria, flags).match(str(value)) is not None
+    if value is None:
+        return False
+    target = _coerce(criteria, value)
+    try:
+        if operator == "eq":
+            return value == target
+        if operator == "neq":
+            return value != target
+        if operator == "gt":
+            return value > target
+        if operator == "gte":
+            return value >= target
+        if operator == "lt":
+            return value < target
+        if operator == "lte":
+            return value <= target
+    except TypeError:
+        return False
+    raise PostgrestError(400, "PGRST100", f"Operador no soportado: {operator}")
+
+
+def _parse_condition(expression: str) -> Tuple[bool, str, str]:
+    negate = False
+    if expression.startswith("not."):
+        negate, expression = True, expression[4:]
+    operator, _, criteria = expression.partition(".")
+    return negate, operator, _unquote(criteria)
+
+
+_OPERATORS = {
+    "eq": operator.eq,
+    "neq": operator.ne,
+    "gt": operator.gt,
+    "gte": operator.ge,
+    "lt": operator.lt,
+    "lte": operator.le,
+}
+
+_MISSING = object()
+
+# Parámetros de PostgREST que no son filtros
+NON_FILTER_PARAMS = ("select", "order", "limit", "offset", "columns", "on_conflict")
+
+
+def _compile_logic(expression: str, conjunction: str) -> Callable[[Dict[str, Any]], bool]:
+    """Compila ``(a.eq.1,and(b.lt.2,c.is.null))`` en un predicado."""
+    predicates = []
+    for item in _split_top_level(expression[1:-1]):
+        negate = False
+        if item.startswith("not."):
+            negate, item = True, item[4:]
+        if item.startswith("and(") or item.startswith("or("):
+            name, _, rest = item.partition("(")
+            inner = _compile_logic("(" + rest, name)
+        else:
+            column, _, condition = item.partition(".")
+            inner = _compile_filter(column, condition)
+        predicates.append(inner if not negate else (lambda row, inner=inner: not inner(row)))
+    if conjunction == "or":
+        return lambda row: any(predicate(row) for predicate in predicates)
+    return lambda row: all(predicate(row) for predicate in predicates)
+
+
+def _compile_filter(column: str, expression: str) -> Callable[[Dict[str, Any]], bool]:
+    negate, operator, criteria = _parse_condition(expression)
+
+    # in, like e ilike preparan su criterio una vez por query y no por fila
+    if operator == "in":
+        options = {_unquote(item) for item in _split_top_level(criteria.strip("()"))}
+
+        def matches(value: Any) -> bool:
+            if value is None:
+                return False
+            if isinstance(value, str):
+                return value in options
+            return any(value == _coerce(option, value) for option in options)
+    elif operator in ("like", "ilike"):
+        pattern = _pattern(criteria, re.IGNORECASE if operator == "ilike" else 0)
+
+        def matches(value: Any) -> bool:
+            return value is not None and pattern.match(str(value)) is not None
+    elif operator in _OPERATORS:
+        compare = _OPERATORS[operator]
+        # El criterio convertido al tipo de la columna, calculado una vez por tipo
+        targets: Dict[type, Any] = {}
+
+        def matches(value: Any) -> bool:
+            if value is None:
+                return False
+            target = targets.get(type(value), _MISSING)
+            if target is _MISSING:
+                target = targets[type(value)] = _coerce(criteria, value)
+            try:
+                return compare(value, target)
+            except TypeError:
+                return False
+    else:
+        def matches(value: Any) -> bool:
+            return _compare(value, operator, criteria)
+
+    def predicate(row: Dict[str, Any]) -> bool:
+        result = matches(row.get(column))
+        return not result if negate else result
+
+    return predicate
+
+
+def _parse_select(select: str) -> Tuple[List[str], List[Dict[str, Any]]]:
+    columns, embeds = [], []
+    for item in _split_top_level(select or "*"):
+        item = item.strip()
+        if "(" in item:
+            head, _, inner = item.partition("(")
+            alias, _, table = head.rpartition(":")
+            embeds.append({
+                "alias": alias or table.split("!")[0],
+                "table": table.split("!")[0],
+                "inner": table.endswith("!inner"),
+                "select": inner[:-1],
+            })
+        elif item:
+            columns.append(item.split("::")[0])
+    return columns, embeds
+
+
+def _parse_order(order: str) -> List[Tuple[str, bool, Optional[bool]]]:
+    keys = []
+    for item in order.split(","):
+        parts = item.split(".")
+        column, desc, nullsfirst = parts[0], "desc" in parts[1:], None
+        if "nullsfirst" in parts[1:]:
+            nullsfirst = True
+        elif "nullslast" in parts[1:]:
+            nullsfirst = False
+        keys.append((column, desc, nullsfirst))
+    return keys
+
+
+def _sort_rows(rows: List[Dict[str, Any]], order: str) -> List[Dict[str, Any]]:
+    for column, desc, nullsfirst in reversed(_parse_order(order)):
+        # PostgreSQL: NULLS LAST en orden ascendente, NULLS FIRST en descendente
+        if nullsfirst is None:
+            nullsfirst = desc
+        present = [row for row in rows if row.get(column) is not None]
+        missing = [row for row in rows if row.get(column) is None]
+        present.sort(key=lambda row: row[column], reverse=desc)
+        rows = missing + present if nullsfirst else present + missing
+    return rows
+
+
+class FakePostgrest:
+    """
+    Backend PostgREST en memoria con latencia configurable.
+
+    - **latency**: segundos fijos por llamada (ida y vuelta a Supabase)
+    - **bandwidth**: bytes por segundo de la respuesta; ``None`` la hace gratuita
+    - **offset_cost**: segundos por fila descartada con OFFSET, que PostgreSQL
+      tiene que recorrer antes de devolver la página
+    """
+
+    def __init__(self, latency: float = 0.0, bandwidth: Optional[float] = None, offset_cost: float = 0.0):
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.offset_cost = offset_cost
+        self.tables: Dict[str, List[Dict[str, Any]]] = {"categories": [], "products": [], "catalog_tombstones": []}
+        self._tombstone_ids = itertools.count(1)
+        self.rpcs: Dict[str, Callable[["FakePostgrest", Any], Any]] = dict(SQL_FUNCTIONS)
+        self.calls: Counter = Counter()
+        self.bytes_sent = 0
+        # Tiempo de CPU del propio simulador (lo que en producción haría PostgreSQL)
+        self.server_seconds = 0.0
+        self._lock = threading.Lock()
+        # Índices por llave primaria y órdenes ya calculados; cualquier escritura los descarta
+        self._derived: Dict[Any, Any] = {}
+
+    # ------------------------------------------------------------------ datos
+
+    def load(self, table: str, rows: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            self.tables[table] = [dict(row) for row in rows]
+            if table in TRIGGERS:
+                for row in self.tables[table]:
+                    TRIGGERS[table](row, None)
+            self._derived.clear()
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.calls.clear()
+            self.bytes_sent = 0
+            self.server_seconds = 0.0
+
+    @property
+    def total_calls(self) -> int:
+        return sum(self.calls.values())
+
+    # ------------------------------------------------------------- transporte
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handle)
+
+    def async_transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handle_async)
+
+    def install(self, client) -> None:
+        """Redirige el cliente postgrest de un ``supabase.Client`` a este backend."""
+        session = client.postgrest.session
+        client.postgrest.session = httpx.Client(
+            base_url=session.base_url,
+            headers=session.headers,
+            transport=self.transport(),
+        )
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        response, delay = self._respond(request)
+        if delay:
+            time.sleep(delay)
+        return response
+
+    async def handle_async(self, request: httpx.Request) -> httpx.Response:
+        response, delay = self._respond(request)
+        if delay:
+            await asyncio.sleep(delay)
+        return response
+
+    def _respond(self, request: httpx.Request) -> Tuple[httpx.Response, float]:
+        started = time.perf_counter()
+        try:
+            with self._lock:
+                status_code, headers, payload = self._dispatch(request)
+        except PostgrestError as error:
+            status_code, headers, payload = error.status_code, {}, error.payload
+        skipped = int(request.url.params.get("offset", 0)) if request.method == "GET" else 0
+        body = b"" if payload is None else json.dumps(payload).encode()
+        headers.setdefault("Content-Type", "application/json")
+        with self._lock:
+            self.bytes_sent += len(body)
+            self.server_seconds += time.perf_counter() - started
+        delay = self.latency + skipped * self.offset_cost
+        if self.bandwidth:
+            delay += len(body) / self.bandwidth
+        return httpx.Response(status_code, headers=headers, content=body), delay
+
+    # ----------------------------------------------------------------- router
+
+    def _dispatch(self, request: httpx.Request) -> Tuple[int, Dict[str, str], Any]:
+        path = request.url.path.split("/rest/v1/", 1)[-1].strip("/")
+        method = request.method
+        if path.startswith("rpc/"):
+            name = path[4:]
+            self.calls[(method, path)] += 1
+            if name not in self.rpcs:
+                raise PostgrestError(404, "PGRST202", f"Could not find the function public.{name}")
+            arguments = json.loads(request.content or b"{}")
+            try:
+                return 200, {}, self.rpcs[name](self, arguments)
+            finally:
+                self._derived.clear()
+
+        table = path
+        if table not in self.tables:
+            raise PostgrestError(404, "42P01", f'relation "public.{table}" does not exist')
+        self.calls[(method, table)] += 1
+
+        params = request.url.params
+        prefer = request.headers.get("prefer", "")
+        count_requested = re.search(r"count=(exact|planned|estimated)", prefer) is not None
+        representation = "return=representation" in prefer
+
+        if method in ("GET", "HEAD"):
+            return self._select(table, params, count_requested, head=method == "HEAD")
+        try:
+            if method == "POST":
+                rows = json.loads(request.content or b"[]")
+                upsert = "resolution=merge-duplicates" in prefer
+                written = self._insert(table, rows, upsert, params.get("on_conflict") or "id")
+            elif method == "PATCH":
+                written = self._update(table, params, json.loads(request.content or b"{}"))
+            elif method == "DELETE":
+                written = self._delete(table, params)
+            else:
+                raise PostgrestError(405, "PGRST117", f"Método no soportado: {method}")
+        finally:
+            self._derived.clear()
+
+        headers = {}
+        if count_requested:
+            headers["Content-Range"] = f"*/{len(written)}"
+        if not representation:
+            return 204 if method != "POST" else 201, headers, None
+        projected = [self._project(table, row, params.get("select", "*"), params) for row in written]
+        return (201 if method == "POST" else 200), headers, projected
+
+    # ---------------------------------------------------------------- lectura
+
+    def _row_filters(self, params: httpx.QueryParams) -> List[Callable[[Dict[str, Any]], bool]]:
+        predicates = []
+        for key, value in params.multi_items():
+            if key in NON_FILTER_PARAMS:
+                continue
+            if key in ("or", "and"):
+                predicates.append(_compile_logic(value, key))
+            elif "." not in key:
+                predicates.append(_compile_filter(key, value))
+        return predicates
+
+    def _primary_index(self, table: str) -> Dict[str, Dict[str, Any]]:
+        key = ("id", table)
+        if key not in self._derived:
+            self._derived[key] = {row["id"]: row for row in self.tables[table]}
+        return self._derived[key]
+
+    def _ordered(self, table: str, order: str) -> List[Dict[str, Any]]:
+        key = ("order", table, order)
+        if key not in self._derived:
+            self._derived[key] = _sort_rows(self.tables[table], order)
+        return self._derived[key]
+
+    def _eq_index(self, table: str, column: str, order: Optional[str]) -> Optional[Dict[str, List[Dict[str, Any]]]]:
+        """Valor -> filas (en ``order``) de una columna de texto; None si no es de texto."""
+        key = ("eq", table, column, order)
+        if key not in self._derived:
+            index: Optional[Dict[str, List[Dict[str, Any]]]] = {}
+            for row in self._ordered(table, order) if order else self.tables[table]:
+                value = row.get(column)
+                if value is None:
+                    continue
+                if not isinstance(value, str):
+                    index = None
+                    break
+                index.setdefault(value, []).append(row)
+            self._derived[key] = index
+        return self._derived[key]
+
+    def _source(
+        self,
+        table: str,
+        params: httpx.QueryParams,
+        order: Optional[str] = None,
+    ) -> Tuple[Optional[List[Dict[str, Any]]], bool]:
+        """
+        Filas candidatas según los índices, como haría PostgreSQL: llave
+        primaria para ``id=eq``/``id=in`` y el índice más selectivo entre
+        los ``columna=eq`` de texto. Indica además si ya vienen en ``order``.
+        """
+        criteria = params.get_list("id")
+        if len(criteria) == 1 and criteria[0].startswith(("eq.", "in.")):
+            index = self._primary_index(table)
+            if criteria[0].startswith("eq."):
+                ids = [_unquote(criteria[0][3:])]
+            else:
+                ids = [_unquote(item) for item in _split_top_level(criteria[0][3:].strip("()"))]
+            return [index[row_id] for row_id in dict.fromkeys(ids) if row_id in index], False
+
+        best = None
+        for column, value in params.multi_items():
+            if column in NON_FILTER_PARAMS or column in ("or", "and") or "." in column or not value.startswith("eq."):
+                continue
+            index = self._eq_index(table, column, order)
+            if index is None:
+                continue
+            rows = index.get(_unquote(value[3:]), [])
+            if best is None or len(rows) < len(best):
+                best = rows
+        return best, best is not None
+
+    def _filtered(
+        self,
+        table: str,
+        params: httpx.QueryParams,
+        rows: Optional[List[Dict[str, Any]]] = None,
+    ) -> List[Dict[str, Any]]:
+        if rows is None:
+            rows, _ = self._source(table, params)
+        if rows is None:
+            rows = self.tables[table]
+        predicates = self._row_filters(params)
+        if len(predicates) == 1:
+            predicate = predicates[0]
+            return [row for row in rows if predicate(row)]
+        return [row for row in rows if all(predicate(row) for predicate in predicates)]
+
+    def _select(self, table: str, params: httpx.QueryParams, count_requested: bool, head: bool):
+        order = params.get("order")
+        rows, presorted = self._source(table, params, order)
+        if rows is None:
+            # Filtrar un orden ya calculado lo conserva: no hay que ordenar de nuevo
+            rows = self._ordered(table, order) if order else self.tables[table]
+            presorted = True
+        rows = self._filtered(table, params, rows)
+        _, embeds = _parse_select(params.get("select", "*"))
+        # Los embebidos con !inner descartan las filas padre sin coincidencias
+        for embed in embeds:
+            if embed["inner"]:
+                rows = [row for row in rows if self._embedded(table, row, embed, params)]
+        total = len(rows)
+        if order and not presorted:
+            rows = _sort_rows(rows, order)
+        offset = int(params.get("offset", 0))
+        limit = params.get("limit")
+        if count_requested and offset > 0 and offset >= total:
+            raise PostgrestError(
+                416,
+                "PGRST103",
+                "Requested range not satisfiable",
+                f"An offset of {offset} was requested, but there are only {total} rows.",
+            )
+        rows = rows[offset:offset + int(limit)] if limit is not None else rows[offset:]
+        headers = {}
+        if count_requested:
+            span = f"{offset}-{offset + len(rows) - 1}" if rows else "*"
+            headers["Content-Range"] = f"{span}/{total}"
+        if head:
+            return 200, headers, None
+        select = params.get("select", "*")
+        return 200, headers, [self._project(table, row, select, params) for row in rows]
+
+    def _embed_filters(self, alias: str, params: httpx.QueryParams) -> List[Callable[[Dict[str, Any]], bool]]:
+        prefix = f"{alias}."
+        return [
+            _compile_filter(key[len(prefix):], value)
+            for key, value in params.multi_items()
+            if key.startswith(prefix) and key[len(prefix):] not in ("order", "limit", "offset")
+        ]
+
+    def _embedded(self, table: str, row: Dict[str, Any], embed: Dict[str, Any], params: httpx.QueryParams):
+        target = embed["table"]
+        predicates = self._embed_filters(embed["alias"], params)
+        # Muchos a uno: products.category_id -> categories.id
+        for column, referenced in FOREIGN_KEYS.get(table, []):
+            if referenced == target:
+                value = row.get(column)
+                if value is None:
+                    return None
+                for candidate in self.tables[target]:
+                    if candidate["id"] == value and all(predicate(candidate) for predicate in predicates):
+                        return self._project(target, candidate, embed["select"], params)
+                return None
+        # Uno a muchos: categories.id <- products.category_id
+        for column, referenced in FOREIGN_KEYS.get(target, []):
+            if referenced == table:
+                children = [
+                    child for child in self.tables[target]
+                    if child.get(column) == row["id"] and all(predicate(child) for predicate in predicates)
+                ]
+                if embed["select"] == "count":
+                    return [{"count": len(children)}]
+                return [self._project(target, child, embed["select"], params) for child in children]
+        raise PostgrestError(400, "PGRST200", f"Could not find a relationship between '{table}' and '{target}'")
+
+    def _project(self, table: str, row: Dict[str, Any], select: str, params: httpx.QueryParams) -> Dict[str, Any]:
+        columns, embeds = _parse_select(select)
+        if not columns or "*" in columns:
+            result = dict(row)
+        else:
+            result = {}
+        for column in columns:
+            if column == "*":
+                continue
+            alias, _, source = column.rpartition(":")
+            result[alias or source] = row.get(source)
+        for embed in embeds:
+            result[embed["alias"]] = self._embedded(table, row, embed, params)
+        return result
+
+    # -------------------------------------------------------------- escritura
+
+    def _constraint_index(self, table: str) -> Dict[str, Any]:
+        """Valor -> id por columna única e ids referenciables por FK, para
+        validar un lote sin recorrer la tabla completa por cada fila."""
+        index: Dict[str, Any] = {
+            column: {row[column]: row["id"] for row in self.tables[table] if row.get(column) is not None}
+            for column in UNIQUE_COLUMNS.get(table, ())
+        }
+        for column, referenced in FOREIGN_KEYS.get(table, []):
+            index[f"fk:{column}"] = {row["id"] for row in self.tables[referenced]}
+        return index
+
+    def _check_constraints(
+        self,
+        table: str,
+        row: Dict[str, Any],
+        ignore_id: Optional[str] = None,
+        index: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        if index is None:
+            index = self._constraint_index(table)
+        for column in UNIQUE_COLUMNS.get(table, ()):
+            value = row.get(column)
+            if value is None:
+                continue
+            owner = index[column].get(value)
+            if owner is not None and owner != ignore_id:
+                raise PostgrestError(
+                    409,
+                    "23505",
+                    f'duplicate key value violates unique constraint "{table}_{column}_key"',
+                    f"Key ({column})=({value}) already exists.",
+                )
+        for column, referenced in FOREIGN_KEYS.get(table, []):
+            value = row.get(column)
+            if value is not None and value not in index[f"fk:{column}"]:
+                raise PostgrestError(
+                    409,
+                    "23503",
+                    f'insert or update on table "{table}" violates foreign key constraint "{table}_{column}_fkey"',
+                    f'Key ({column})=({value}) is not present in table "{referenced}".',
+                )
+        # Las filas siguientes del mismo lote también deben respetar esta
+        for column in UNIQUE_COLUMNS.get(table, ()):
+            if row.get(column) is not None:
+                index[column][row[column]] = row["id"]
+
+    def _insert(self, table: str, payload: Any, upsert: bool, on_conflict: str) -> List[Dict[str, Any]]:
+        rows = payload if isinstance(payload, list) else [payload]
+        written, staged = [], []
+        for data in rows:
+            existing = None
+            if upsert:
+                existing = next(
+                    (row for row in self.tables[table] if data.get(on_conflict) is not None and row.get(on_conflict) == data.get(on_conflict)),
+                    None,
+                )
+            if existing is not None:
+                staged.append((existing, {**existing, **data, "updated_at": utcnow_iso()}))
+                if table in TRIGGERS:
+                    TRIGGERS[table](staged[-1][1], existing)
+                continue
+            now = utcnow_iso()
+            row = {**TABLE_DEFAULTS.get(table, {}), "id": str(uuid.uuid4()), "created_at": now, "updated_at": now}
+            row.update({key: value for key, value in data.items() if value is not None or key not in row})
+            if table in TRIGGERS:
+                TRIGGERS[table](row, None)
+            staged.append((None, row))
+        # Validar todo el lote antes de escribir: el INSERT es atómico
+        snapshot = list(self.tables[table])
+        index = self._constraint_index(table)
+        try:
+            for existing, row in staged:
+                self._check_constraints(table, row, ignore_id=existing["id"] if existing else None, index=index)
+                if existing is not None:
+                    existing.clear()
+                    existing.update(row)
+                    written.append(existing)
+                else:
+                    self.tables[table].append(row)
+                    written.append(row)
+        except PostgrestError:
+            self.tables[table] = snapshot
+            raise
+        return written
+
+    def _update(self, table: str, params: httpx.QueryParams, changes: Dict[str, Any]) -> List[Dict[str, Any]]:
+        targets = self._filtered(table, params)
+        updated = []
+        index = self._constraint_index(table)
+        for row in targets:
+            candidate = {**row, **changes, "updated_at": utcnow_iso()}
+            if table in TRIGGERS:
+                TRIGGERS[table](candidate, row)
+            self._check_constraints(table, candidate, ignore_id=row["id"], index=index)
+            updated.append((row, candidate))
+        for row, candidate in updated:
+            row.update(candidate)
+        return [row for row, _ in updated]
+
+    def _delete(self, table: str, params: httpx.QueryParams) -> List[Dict[str, Any]]:
+        targets = self._filtered(table, params)
+        target_ids = {row["id"] for row in targets}
+        for child, columns in FOREIGN_KEYS.items():
+            for column, referenced in columns:
+                if referenced == table and any(row.get(column) in target_ids for row in self.tables[child]):
+                    raise PostgrestError(
+                        409,
+                        "23503",
+                        f'update or delete on table "{table}" violates foreign key constraint "{child}_{column}_fkey" on table "{child}"',
+                        f'Key is still referenced from table "{child}".',
+                    )
+        self.tables[table] = [row for row in self.tables[table] if row["id"] not in target_ids]
+        if table in TOMBSTONE_TABLES:
+            deleted_at = utcnow_iso()
+            self.tables["catalog_tombstones"].extend(
+                {"id": next(self._tombstone_ids), "table_name": table, "row_id": row["id"], "deleted_at": deleted_at}
+                for row in targets
+            )
+        return targets
+
+
+# ------------------------------------------------------------ funciones SQL
+# Equivalentes de las funciones de ``backend/sql/`` que los routers llaman por RPC
+
+
+def update_product_stock_batch(fake: FakePostgrest, arguments: Dict[str, Any]) -> List[Dict[str, Any]]:
+    by_id = {row["id"]: row for row in fake.tables["products"]}
+    by_sku = {row["sku"]: row for row in fake.tables["products"] if row.get("sku") is not None}
+    updated = {}
+    for item in arguments["items"]:
+        row = by_id.get(item.get("product_id")) if item.get("product_id") else by_sku.get(item.get("sku"))
+        if row is None:
+            continue
+        previous = dict(row)
+        row["stock_quantity"] = item["new_stock"]
+        row["updated_at"] = utcnow_iso()
+        _stock_alert(row, previous)
+        updated[row["id"]] = row
+    return [
+        {column: row[column] for column in ("id", "sku", "stock_quantity", "updated_at")}
+        for row in updated.values()
+    ]
+
+
+def adjust_product_stock(fake: FakePostgrest, arguments: Dict[str, Any]) -> Dict[str, Any]:
+    """Como ``adjust_product_stock`` de sql/006: todo o nada; el lock del simulador hace de FOR UPDATE."""
+    by_id = {row["id"]: row for row in fake.tables["products"]}
+    by_sku = {row["sku"]: row for row in fake.tables["products"] if row.get("sku") is not None}
+    enforce = arguments.get("p_enforce_order_limits", False)
+    requested = []
+    totals: Dict[str, int] = {}
+    for position, item in enumerate(arguments["items"]):
+        row = by_id.get(item.get("product_id")) if item.get("product_id") else by_sku.get(item.get("sku"))
+        requested.append((position, item, row))
+        if row is not None:
+            totals[row["id"]] = totals.get(row["id"], 0) + item["delta"]
+    rejected = []
+    for position, item, row in requested:
+        quantity = -item["delta"]
+        if row is None:
+            reason = "not_found"
+        elif row["stock_quantity"] + totals[row["id"]] < 0:
+            reason = "insufficient_stock"
+        elif enforce and quantity > 0 and quantity < row.get("min_order_quantity", 1):
+            reason = "below_min_order_quantity"
+        elif enforce and quantity > 0 and row.get("max_order_quantity") is not None and quantity > row["max_order_quantity"]:
+            reason = "above_max_order_quantity"
+        else:
+            continue
+        rejected.append({
+            "position": position,
+            "product_id": item.get("product_id"),
+            "sku": item.get("sku"),
+            "delta": item["delta"],
+            "stock_quantity": row["stock_quantity"] if row is not None else None,
+            "reason": reason,
+        })
+    if rejected:
+        return {"updated": [], "rejected": rejected}
+    updated = []
+    for product_id, total in totals.items():
+        row = by_id[product_id]
+        previous = dict(row)
+        row["stock_quantity"] += total
+        row["updated_at"] = utcnow_iso()
+        _stock_alert(row, previous)
+        updated.append({column: row[column] for column in ("id", "sku", "stock_quantity", "updated_at")})
+    return {"updated": updated, "rejected": []}
+
+
+def product_facets(fake: FakePostgrest, arguments: Dict[str, Any]) -> Dict[str, Any]:
+    """Como ``product_facets`` de sql/004: agregado crudo con los filtros del listado."""
+    edges = arguments.get("p_price_edges") or [0, 5, 10, 20, 50, 100]
+    search = (arguments.get("p_search") or "").lower()
+    result: Dict[str, Any] = {"total": 0, "categories": {}, "tags": {}, "allergens": {}, "prices": {}}
+    for row in fake.tables["products"]:
+        if arguments.get("p_active_only", True) and not row.get("is_active"):
+            continue
+        if arguments.get("p_featured_only") and not row.get("is_featured"):
+            continue
+        if arguments.get("p_category_id") and row.get("category_id") != arguments["p_category_id"]:
+            continue
+        if search and search not in (row.get("name") or "").lower() and search not in (row.get("description") or "").lower():
+            continue
+        tier_price = row.get(arguments.get("p_price_tier") or "price_wholesale")
+        if arguments.get("p_min_price") is not None and (tier_price is None or tier_price < arguments["p_min_price"]):
+            continue
+        if arguments.get("p_max_price") is not None and (tier_price is None or tier_price > arguments["p_max_price"]):
+            continue
+        result["total"] += 1
+        counts = [("categories", [row["category_id"]] if row.get("category_id") else [])]
+        counts += [("tags", row.get("tags") or []), ("allergens", row.get("allergens") or [])]
+        for facet, values in counts:
+            for value in values:
+                result[facet][value] = result[facet].get(value, 0) + 1
+        for tier in ("price_retail", "price_wholesale", "price_gym", "price_cafeteria", "price_store"):
+            price = row.get(tier)
+            if price is None:
+                continue
+            stats = result["prices"].setdefault(tier, {"count": 0, "min": price, "max": price, "buckets": {}})
+            stats["count"] += 1
+            stats["min"], stats["max"] = min(stats["min"], price), max(stats["max"], price)
+            bucket = str(sum(1 for edge in edges if edge <= price))
+            stats["buckets"][bucket] = stats["buckets"].get(bucket, 0) + 1
+    return result
+
+
+SQL_FUNCTIONS: Dict[str, Callable[[FakePostgrest, Any], Any]] = {
+    "update_product_stock_batch": update_product_stock_batch,
+    "product_facets": product_facets,
+    "adjust_product_stock": adjust_product_stock,
+}
@@ -0,0 +1,77 @@
+"""
+Utilidades compartidas: arranque de la app contra el backend simulado y
+medición de latencias.
+"""
+import os
+import statistics
+import time
+from typing import Callable, Dict, List
+
+# database.py exige credenciales para crear el cliente; el backend simulado las ignora
+os.environ.setdefault("SUPABASE_URL", "http://supabase.local")
+os.environ.setdefault("SUPABASE_ANON_KEY", "benchmark.anon.key")
+# Sin caché por defecto: los benchmarks miden el camino hasta Supabase
+os.environ.setdefault("CATALOG_CACHE_TTL", "0")
+
+from .fake_postgrest import FakePostgrest  # noqa: E402
+
+
+def build_app(fake: FakePostgrest):
+    """Importa ``main.app`` con el cliente de Supabase apuntando a ``fake``."""
+    import database
+    from main import app
+
+    fake.install(database.get_supabase_client())
+    return app
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def time_calls(call: Callable[[], object], repeat: int = 20, warmup: int = 2) -> Dict[str, float]:
+    """Ejecuta ``call`` varias veces y retorna estadísticas en milisegundos."""
+    for _ in range(warmup):
+        call()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        call()
+        samples.append((time.perf_counter() - started) * 1000)
+    return {
+        "p50": statistics.median(samples),
+        "p95": percentile(samples, 95),
+        "mean": statistics.fmean(samples),
+    }
+
+
+async def run_load(send, concurrency: int, requests: int) -> Dict[str, float]:
+    """
+    Lanza ``requests`` llamadas a ``send()`` con ``concurrency`` en vuelo a la vez.
+
+    Retorna throughput (req/s) y percentiles de latencia en milisegundos.
+    """
+    import asyncio
+
+    samples: List[float] = []
+    pending = iter(range(requests))
+
+    async def worker() -> None:
+        for _ in pending:
+            started = time.perf_counter()
+            await send()
+            samples.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "throughput": requests / elapsed,
+        "p50": percentile(samples, 50),
+        "p95": percentile(samples, 95),
+        "p99": percentile(samples, 99),
+    }
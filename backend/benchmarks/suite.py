@@ -0,0 +1,346 @@
+"""
+Suite de carga reproducible para todos los endpoints de productos y
+categorías, contra el backend simulado de Supabase.
+
+Para cada tamaño de catálogo (sintético y determinista) y cada nivel de
+concurrencia lanza peticiones a ``main.app`` por ASGI y reporta p50, p95,
+p99, throughput y llamadas a Supabase por petición. Con ``--baseline``
+compara contra una corrida guardada y termina con código 1 si algún
+endpoint empeora más allá de la tolerancia (o hace más llamadas).
+
+    python -m benchmarks.suite [--sizes 1000 10000 100000] [--levels 1 8 32]
+    python -m benchmarks.suite --sizes 1000 --save-baseline
+    python -m benchmarks.suite --sizes 1000 --baseline benchmarks/baseline.json
+
+Los endpoints de escritura modifican el catálogo simulado: los DELETE
+eliminan lo que crearon los POST anteriores, así que no tocan los datos
+sembrados. Las latencias incluyen la latencia fija de ``--latency``; la
+columna "DB ms" es el CPU que gasta el simulador por petición, que en los
+catálogos grandes compite con la app por el GIL.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import platform
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+from .bench_import import PRODUCT_COLUMNS as IMPORT_COLUMNS, import_rows
+from .datasets import make_catalog
+from .fake_postgrest import FakePostgrest
+from .harness import build_app, run_load
+
+DEFAULT_BASELINE = Path(__file__).with_name("baseline.json")
+API = "/api/v1"
+
+SEARCH_TERMS = ["proteina", "choco", "vegano almendra", "cúrcuma", "SKU-00001"]
+PRICE_TIERS = ["retail", "wholesale", "gym", "cafeteria", "store"]
+PRICE_SORTS = ["price_asc", "price_desc"]
+
+# Endpoints costosos por petición: se limita su número de peticiones
+REQUEST_LIMITS = {"GET /products/export": 16, "POST /products/import": 32}
+
+Send = Callable[[], Awaitable[httpx.Response]]
+
+
+class Workload:
+    """
+    Catálogo sembrado más los contadores que necesitan las escrituras
+    (slugs únicos, productos y categorías creados para luego eliminarlos).
+    """
+
+    def __init__(self, client: httpx.AsyncClient, categories: List[dict], products: List[dict]):
+        self.client = client
+        self.categories = categories
+        self.products = products
+        self.rng = random.Random(12)
+        self.counter = itertools.count()
+        self.created_products: List[str] = []
+        self.created_categories: List[str] = []
+        self.cursor: Optional[str] = None
+        self.deep_page = 1
+        self.changes_since: Optional[str] = None
+
+    def any_product(self) -> dict:
+        return self.rng.choice(self.products)
+
+    def new_product(self) -> dict:
+        index = next(self.counter)
+        return {
+            "name": f"Suite {index}",
+            "slug": f"suite-{index}",
+            "sku": f"SUITE-{index:07d}",
+            "category_id": self.rng.choice(self.categories)["id"],
+            "price_retail": 2.5,
+            "price_wholesale": 1.5,
+            "stock_quantity": 10,
+            "tags": ["snack"],
+        }
+
+    def new_category(self) -> dict:
+        index = next(self.counter)
+        return {"name": f"Suite {index}", "slug": f"suite-categoria-{index}", "is_active": True}
+
+    async def prepare(self) -> None:
+        """
+        Cursor de la segunda página, una página a mitad del catálogo y una
+        copia local ya sincronizada (para pedir solo los cambios).
+        """
+        response = await self.client.get(f"{API}/products/", params={"per_page": 20})
+        response.raise_for_status()
+        first = response.json()
+        self.cursor = first["next_cursor"]
+        self.deep_page = max(1, first["total_pages"] // 2)
+        has_more = True
+        while has_more:
+            params = {"limit": 1000, **({"since": self.changes_since} if self.changes_since else {})}
+            response = await self.client.get(f"{API}/changes/", params=params)
+            response.raise_for_status()
+            has_more = response.json()["has_more"]
+            self.changes_since = response.json()["next_since"]
+
+
+def scenarios(work: Workload) -> Dict[str, Send]:
+    client = work.client
+
+    async def create_product() -> httpx.Response:
+        response = await client.post(f"{API}/products/", json=work.new_product())
+        if response.status_code == 201:
+            work.created_products.append(response.json()["id"])
+        return response
+
+    async def delete_product() -> httpx.Response:
+        product_id = work.created_products.pop() if work.created_products else work.any_product()["id"]
+        return await client.delete(f"{API}/products/{product_id}")
+
+    async def update_product() -> httpx.Response:
+        product = work.any_product()
+        payload = {column: product[column] for column in IMPORT_COLUMNS}
+        return await client.put(f"{API}/products/{product['id']}", json=payload)
+
+    async def import_products() -> httpx.Response:
+        prefix = f"suite{next(work.counter)}"
+        body = b"\n".join(json.dumps(row).encode() for row in import_rows(100, work.categories, prefix))
+        return await client.post(
+            f"{API}/products/import",
+            content=body,
+            headers={"Content-Type": "application/x-ndjson"},
+        )
+
+    async def update_stock_batch() -> httpx.Response:
+        items = [
+            {"product_id": product["id"], "new_stock": work.rng.randint(0, 500)}
+            for product in work.rng.sample(work.products, 100)
+        ]
+        return await client.patch(f"{API}/products/stock", json={"items": items})
+
+    async def create_category() -> httpx.Response:
+        response = await client.post(f"{API}/categories/", json=work.new_category())
+        if response.status_code == 201:
+            work.created_categories.append(response.json()["id"])
+        return response
+
+    async def update_category() -> httpx.Response:
+        category = work.rng.choice(work.categories)
+        payload = {key: category[key] for key in ("name", "description", "slug", "image_url", "is_active")}
+        return await client.put(f"{API}/categories/{category['id']}", json=payload)
+
+    async def delete_category() -> httpx.Response:
+        category_id = work.created_categories.pop() if work.created_categories else work.categories[0]["id"]
+        return await client.delete(f"{API}/categories/{category_id}")
+
+    return {
+        "GET /products": lambda: client.get(f"{API}/products/", params={"per_page": 20}),
+        "GET /products deep page": lambda: client.get(
+            f"{API}/products/", params={"per_page": 20, "page": work.deep_page}
+        ),
+        "GET /products cursor": lambda: client.get(
+            f"{API}/products/", params={"per_page": 20, "cursor": work.cursor}
+        ),
+        "GET /products category": lambda: client.get(
+            f"{API}/products/", params={"per_page": 20, "category_id": work.rng.choice(work.categories)["id"]}
+        ),
+        "GET /products search": lambda: client.get(
+            f"{API}/products/", params={"per_page": 20, "search": work.rng.choice(SEARCH_TERMS)}
+        ),
+        "GET /products card": lambda: client.get(
+            f"{API}/products/", params={"per_page": 100, "page": work.rng.randint(1, 5), "fields": "card"}
+        ),
+        "GET /products price sort": lambda: client.get(
+            f"{API}/products/",
+            params={"per_page": 20, "price_tier": work.rng.choice(PRICE_TIERS), "sort": work.rng.choice(PRICE_SORTS)}
+        ),
+        "GET /products/facets": lambda: client.get(
+            f"{API}/products/facets", params={"category_id": work.rng.choice(work.categories)["id"]}
+        ),
+        "GET /products/low-stock": lambda: client.get(f"{API}/products/low-stock"),
+        "GET /products/{id}": lambda: client.get(f"{API}/products/{work.any_product()['id']}"),
+        "POST /products/batch": lambda: client.post(
+            f"{API}/products/batch", json={"keys": [product["id"] for product in work.rng.sample(work.products, 30)]}
+        ),
+        "GET /products/export": lambda: client.get(
+            f"{API}/products/export", params={"category_id": work.rng.choice(work.categories)["id"]}
+        ),
+        "POST /products": create_product,
+        "PUT /products/{id}": update_product,
+        "PATCH /products/{id}/stock": lambda: client.patch(
+            f"{API}/products/{work.any_product()['id']}/stock", params={"new_stock": work.rng.randint(0, 500)}
+        ),
+        "PATCH /products/stock": update_stock_batch,
+        "POST /products/import": import_products,
+        "DELETE /products/{id}": delete_product,
+        "GET /changes": lambda: client.get(f"{API}/changes/", params={"since": work.changes_since}),
+        "GET /categories": lambda: client.get(f"{API}/categories/"),
+        "GET /categories/{id}": lambda: client.get(f"{API}/categories/{work.rng.choice(work.categories)['id']}"),
+        "POST /categories": create_category,
+        "PUT /categories/{id}": update_category,
+        "DELETE /categories/{id}": delete_category,
+    }
+
+
+async def measure(fake: FakePostgrest, send: Send, level: int, requests: int, warmup: int) -> Dict[str, float]:
+    errors = 0
+
+    async def checked() -> None:
+        nonlocal errors
+        response = await send()
+        if response.status_code >= 400:
+            errors += 1
+
+    for _ in range(warmup):
+        await checked()
+    errors = 0
+    fake.reset_stats()
+    stats = await run_load(checked, level, requests)
+    stats["calls_per_request"] = fake.total_calls / requests
+    # CPU del simulador (filtrar, ordenar, serializar): no es costo de la API
+    stats["db_ms"] = fake.server_seconds * 1000 / requests
+    stats["errors"] = errors
+    return stats
+
+
+async def run_size(args, size: int) -> Dict[str, Dict[str, float]]:
+    fake = FakePostgrest(latency=args.latency)
+    categories, products = make_catalog(size)
+    fake.load("categories", categories)
+    fake.load("products", products)
+    app = build_app(fake)
+
+    import database
+    from search import search_index
+
+    # El índice de búsqueda es global: se reconstruye con el catálogo nuevo
+    await search_index.load(database.get_supabase_client())
+
+    results: Dict[str, Dict[str, float]] = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        work = Workload(client, categories, products)
+        await work.prepare()
+        for name, send in scenarios(work).items():
+            if args.only and not any(pattern in name for pattern in args.only):
+                continue
+            requests = min(args.requests, REQUEST_LIMITS.get(name, args.requests))
+            for level in args.levels:
+                stats = await measure(fake, send, level, requests, args.warmup)
+                results[f"{size}|{name}|{level}"] = stats
+                print(
+                    f"{size:>7} {name:<28} {level:>5} {stats['p50']:>8.1f} {stats['p95']:>8.1f} "
+                    f"{stats['p99']:>8.1f} {stats['throughput']:>8.1f} {stats['calls_per_request']:>7.2f} "
+                    f"{stats['db_ms']:>7.1f} {stats['errors']:>5}",
+                    flush=True,
+                )
+    return results
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], tolerance: float) -> List[str]:
+    """
+    Regresiones frente a la línea base: p95 o throughput peor que la
+    tolerancia relativa, más llamadas a Supabase por petición, o errores.
+    """
+    regressions = []
+    for key, stats in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        if stats["p95"] > base["p95"] * (1 + tolerance):
+            regressions.append(f"{key}: p95 {base['p95']:.1f} -> {stats['p95']:.1f} ms")
+        if stats["throughput"] < base["throughput"] * (1 - tolerance):
+            regressions.append(f"{key}: throughput {base['throughput']:.1f} -> {stats['throughput']:.1f} req/s")
+        if stats["calls_per_request"] > base["calls_per_request"] + 0.01:
+            regressions.append(
+                f"{key}: llamadas/req {base['calls_per_request']:.2f} -> {stats['calls_per_request']:.2f}"
+            )
+        if stats["errors"] > base.get("errors", 0):
+            regressions.append(f"{key}: errores {base.get('errors', 0)} -> {stats['errors']}")
+    return regressions
+
+
+async def run(args) -> int:
+    print(
+        f"{'tamaño':>7} {'endpoint':<28} {'conc':>5} {'p50 ms':>8} {'p95 ms':>8} "
+        f"{'p99 ms':>8} {'req/s':>8} {'llam/req':>7} {'DB ms':>7} {'err':>5}"
+    )
+    results: Dict[str, Dict[str, float]] = {}
+    for size in args.sizes:
+        results.update(await run_size(args, size))
+
+    report: Dict[str, Any] = {
+        "settings": {
+            "latency": args.latency,
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "python": platform.python_version(),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2, sort_keys=True))
+
+    if args.save_baseline:
+        Path(args.baseline).write_text(json.dumps(report, indent=2, sort_keys=True))
+        print(f"\nLínea base guardada en {args.baseline}")
+        return 0
+
+    baseline_path = Path(args.baseline)
+    if not baseline_path.exists():
+        print(f"\nSin línea base en {baseline_path}; use --save-baseline para crearla")
+        return 0
+    baseline = json.loads(baseline_path.read_text())
+    if baseline["settings"]["latency"] != args.latency:
+        print(f"\nAviso: la línea base usa latency={baseline['settings']['latency']}")
+    regressions = compare(results, baseline["results"], args.tolerance)
+    compared = sum(key in baseline["results"] for key in results)
+    if regressions:
+        print(f"\n{len(regressions)} regresiones (tolerancia {args.tolerance:.0%}, {compared} comparados):")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    print(f"\nSin regresiones frente a {baseline_path} ({compared} comparados, tolerancia {args.tolerance:.0%})")
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=64, help="peticiones medidas por endpoint y nivel")
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--only", nargs="+", help="solo endpoints cuyo nombre contenga alguno de estos textos")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE))
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="empeoramiento relativo tolerado")
+    parser.add_argument("--output", help="guarda los resultados de esta corrida en JSON")
+    sys.exit(asyncio.run(run(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
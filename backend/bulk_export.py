@@ -0,0 +1,108 @@
+"""
+Exportación del catálogo completo como NDJSON o CSV en streaming.
+
+Los productos llegan de Supabase en bloques (ver `repository.iter_rows`) y
+cada bloque se serializa y se envía antes de pedir el siguiente, así que la
+memoria usada no depende del tamaño del catálogo. El CSV usa las mismas
+convenciones que la importación masiva (listas separadas por `|`, objetos
+como JSON), de modo que un archivo exportado se puede volver a importar.
+"""
+import csv
+import io
+import json
+import logging
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import http_cache
+from models import ProductResponse
+from bulk_import import JSON_COLUMNS, LIST_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+PRODUCT_COLUMNS = ["id"] + [name for name in ProductResponse.model_fields if name not in ("id", "category")]
+CATEGORY_COLUMNS = ["category_name", "category_slug"]
+
+def _products(rows: List[dict]) -> List[Dict[str, Any]]:
+    """
+    Valida el bloque contra ProductResponse (o solo lo recorta, con
+    TRUSTED_UPSTREAM): la exportación tiene la misma forma que la API
+    aunque la tabla tenga más columnas.
+    """
+    if http_cache.TRUSTED_UPSTREAM:
+        return http_cache.get_projector(List[ProductResponse])(rows)
+    adapter = http_cache.get_adapter(List[ProductResponse])
+    return adapter.dump_python(adapter.validate_python(rows), mode="json")
+
+def _ndjson(rows: List[dict], include_category: bool) -> bytes:
+    lines = []
+    for product in _products(rows):
+        if not include_category:
+            del product["category"]
+        lines.append(http_cache.dumps(product))
+    return b"\n".join(lines) + b"\n"
+
+def _csv_cell(column: str, value: Any) -> Any:
+    if value is None:
+        return ""
+    if column in JSON_COLUMNS:
+        return json.dumps(value, ensure_ascii=False)
+    if column in LIST_COLUMNS:
+        return "|".join(value)
+    return value
+
+def _csv(rows: List[dict], include_category: bool, header: bool) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(PRODUCT_COLUMNS + (CATEGORY_COLUMNS if include_category else []))
+    for product in _products(rows):
+        cells = [_csv_cell(column, product[column]) for column in PRODUCT_COLUMNS]
+        if include_category:
+            category = product["category"] or {}
+            cells += [category.get("name", ""), category.get("slug", "")]
+        writer.writerow(cells)
+    return buffer.getvalue().encode()
+
+async def _next_chunk(chunks: AsyncIterator[List[dict]]) -> Optional[List[dict]]:
+    try:
+        return await chunks.__anext__()
+    except StopAsyncIteration:
+        return None
+
+async def open_export(
+    chunks: AsyncIterator[List[dict]],
+    format: str,
+    include_category: bool,
+) -> AsyncIterator[bytes]:
+    """
+    Pide el primer bloque antes de responder, para que un error de Supabase
+    todavía pueda devolverse como 500; retorna el generador del cuerpo.
+
+    Un error posterior ya no puede cambiar el status: se registra y la
+    descarga termina incompleta.
+    """
+    first = await _next_chunk(chunks)
+
+    async def body() -> AsyncIterator[bytes]:
+        rows = first
+        header = format == "csv"
+        if rows is None and header:
+            yield _csv([], include_category, header=True)
+        try:
+            while rows is not None:
+                if format == "csv":
+                    yield _csv(rows, include_category, header=header)
+                    header = False
+                else:
+                    yield _ndjson(rows, include_category)
+                rows = await _next_chunk(chunks)
+        except Exception:
+            logger.exception("Exportación de productos interrumpida")
+            raise
+
+    return body()
@@ -0,0 +1,232 @@
+"""
+Importación masiva de productos desde CSV o NDJSON.
+
+El archivo se lee como stream, fila por fila, sin cargarlo completo en
+memoria. Cada fila se valida contra `ProductCreate`; las filas válidas se
+acumulan en bloques de `chunk_size` y por bloque se hace una sola consulta
+de slugs y SKUs ya existentes y un solo insert. Las categorías se cargan
+una vez al inicio. El resultado es un reporte fila por fila.
+
+En CSV la primera fila son los nombres de columna. Las listas (`tags`,
+`allergens`, `gallery_images`) se escriben separadas por `|` o como arreglo
+JSON y `nutritional_info` como objeto JSON; las celdas vacías se omiten.
+"""
+import asyncio
+import codecs
+import csv
+import json
+from typing import Any, AsyncIterator, Dict, List, Set, Tuple, Union
+
+from postgrest.exceptions import APIError
+from pydantic import ValidationError
+from supabase import Client
+
+from models import ImportRowResult, ProductCreate, ProductImportReport
+import catalog_events
+import repository
+
+IMPORT_FORMATS = ("csv", "ndjson")
+
+LIST_COLUMNS = frozenset({"allergens", "tags", "gallery_images"})
+JSON_COLUMNS = frozenset({"nutritional_info"})
+
+# Una fila leída: su número (desde 1, sin contar el encabezado) y sus datos,
+# o el mensaje de error si no se pudo interpretar
+ParsedRow = Tuple[int, Union[Dict[str, Any], str]]
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """
+    Divide un stream de bytes UTF-8 en líneas (sin el salto de línea).
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+def _csv_value(column: str, value: str) -> Any:
+    if column in JSON_COLUMNS:
+        return json.loads(value)
+    if column in LIST_COLUMNS:
+        if value.startswith("["):
+            return json.loads(value)
+        return [item.strip() for item in value.split("|") if item.strip()]
+    return value
+
+async def iter_csv_rows(lines: AsyncIterator[str]) -> AsyncIterator[ParsedRow]:
+    header = None
+    record = ""
+    row_number = 0
+    async for line in lines:
+        record = f"{record}\n{line}" if record else line
+        # Comillas sin cerrar: la celda sigue en la próxima línea
+        if record.count('"') % 2:
+            continue
+        text, record = record, ""
+        if not text.strip():
+            continue
+        values = next(csv.reader([text]))
+        if header is None:
+            header = [column.strip() for column in values]
+            continue
+        row_number += 1
+        if len(values) > len(header):
+            yield row_number, f"La fila tiene {len(values)} columnas y el encabezado {len(header)}"
+            continue
+        try:
+            yield row_number, {
+                column: _csv_value(column, value.strip())
+                for column, value in zip(header, values)
+                if column and value.strip()
+            }
+        except ValueError as e:
+            yield row_number, f"JSON inválido en la fila: {e}"
+    if record:
+        yield row_number + 1, "Comillas sin cerrar al final del archivo"
+
+async def iter_ndjson_rows(lines: AsyncIterator[str]) -> AsyncIterator[ParsedRow]:
+    row_number = 0
+    async for line in lines:
+        if not line.strip():
+            continue
+        row_number += 1
+        try:
+            data = json.loads(line)
+        except ValueError as e:
+            yield row_number, f"JSON inválido: {e}"
+            continue
+        if not isinstance(data, dict):
+            yield row_number, "Cada línea debe ser un objeto JSON"
+            continue
+        yield row_number, data
+
+def _rejected(row_number: int, errors: List[str], slug: Any = None) -> ImportRowResult:
+    return ImportRowResult(
+        row=row_number,
+        status="rejected",
+        slug=slug if isinstance(slug, str) else None,
+        errors=errors,
+    )
+
+def _validation_errors(error: ValidationError) -> List[str]:
+    return [
+        f"{'.'.join(str(part) for part in detail['loc']) or 'fila'}: {detail['msg']}"
+        for detail in error.errors()
+    ]
+
+async def _load_category_ids(supabase: Client) -> Set[str]:
+    category_ids: Set[str] = set()
+    async for rows in repository.iter_rows(supabase, "categories", "id"):
+        category_ids.update(str(row["id"]) for row in rows)
+    return category_ids
+
+async def _insert_chunk(
+    supabase: Client,
+    chunk: List[Tuple[int, ProductCreate]],
+) -> List[ImportRowResult]:
+    """
+    Descarta las filas cuyo slug o SKU ya existe en Supabase e inserta el
+    resto con un solo request.
+    """
+    taken_slugs, taken_skus = await asyncio.gather(
+        repository.existing_values(supabase, "products", "slug", (p.slug for _, p in chunk)),
+        repository.existing_values(supabase, "products", "sku", (p.sku for _, p in chunk)),
+    )
+    results: List[ImportRowResult] = []
+    pending: List[Tuple[int, ProductCreate]] = []
+    for row_number, product in chunk:
+        errors = []
+        if product.slug in taken_slugs:
+            errors.append(f"Ya existe un producto con el slug '{product.slug}'")
+        if product.sku and product.sku in taken_skus:
+            errors.append(f"Ya existe un producto con el SKU '{product.sku}'")
+        if errors:
+            results.append(_rejected(row_number, errors, product.slug))
+        else:
+            pending.append((row_number, product))
+    if not pending:
+        return results
+
+    try:
+        response = await repository.execute(
+            supabase.table("products").insert(
+                [product.model_dump(mode="json") for _, product in pending]
+            )
+        )
+    except APIError as e:
+        # Conflicto con una escritura concurrente u otra restricción: el
+        # insert es atómico, así que ninguna fila del bloque quedó guardada
+        message = f"Error al insertar el bloque: {e.message}"
+        results.extend(_rejected(row_number, [message], p.slug) for row_number, p in pending)
+        return results
+
+    inserted = {row["slug"]: row for row in response.data or []}
+    for row_number, product in pending:
+        row = inserted.get(product.slug)
+        if row is None:
+            results.append(_rejected(row_number, ["Supabase no retornó la fila insertada"], product.slug))
+            continue
+        results.append(ImportRowResult(row=row_number, status="accepted", id=row["id"], slug=product.slug))
+    catalog_events.products_imported(list(inserted.values()))
+    return results
+
+async def import_products(
+    supabase: Client,
+    rows: AsyncIterator[ParsedRow],
+    chunk_size: int = 500,
+) -> ProductImportReport:
+    """
+    Valida e inserta las filas en bloques y retorna el reporte por fila.
+    """
+    category_ids = await _load_category_ids(supabase)
+    # Slugs y SKUs aceptados hasta ahora, para detectar repetidos en el archivo
+    seen_slugs: Set[str] = set()
+    seen_skus: Set[str] = set()
+    results: List[ImportRowResult] = []
+    chunk: List[Tuple[int, ProductCreate]] = []
+
+    async for row_number, data in rows:
+        if isinstance(data, str):
+            results.append(_rejected(row_number, [data]))
+            continue
+        try:
+            product = ProductCreate.model_validate(data)
+        except ValidationError as e:
+            results.append(_rejected(row_number, _validation_errors(e), data.get("slug")))
+            continue
+
+        errors = []
+        if product.slug in seen_slugs:
+            errors.append(f"El slug '{product.slug}' se repite en el archivo")
+        if product.sku and product.sku in seen_skus:
+            errors.append(f"El SKU '{product.sku}' se repite en el archivo")
+        if product.category_id and str(product.category_id) not in category_ids:
+            errors.append("La categoría especificada no existe")
+        if errors:
+            results.append(_rejected(row_number, errors, product.slug))
+            continue
+
+        seen_slugs.add(product.slug)
+        if product.sku:
+            seen_skus.add(product.sku)
+        chunk.append((row_number, product))
+        if len(chunk) >= chunk_size:
+            results.extend(await _insert_chunk(supabase, chunk))
+            chunk = []
+
+    if chunk:
+        results.extend(await _insert_chunk(supabase, chunk))
+
+    results.sort(key=lambda result: result.row)
+    accepted = sum(1 for result in results if result.status == "accepted")
+    return ProductImportReport(
+        total_rows=len(results),
+        accepted=accepted,
+        rejected=len(results) - accepted,
+        rows=results,
+    )
@@ -0,0 +1,158 @@
+"""
+Caché en memoria del catálogo (categorías y productos).
+
+Las lecturas se guardan por endpoint y parámetros normalizados, con TTL y
+desalojo LRU al llegar al máximo de entradas. Cada entrada lleva etiquetas
+(`product:<id>`, `category:<id>`, `product-lists`, `category-lists`) y las
+escrituras invalidan solo las etiquetas afectadas. La caché es por proceso:
+con varios workers, el TTL acota cuánto puede tardar un cambio en verse.
+"""
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional, Set, Tuple
+
+# Segundos que vive una entrada; 0 desactiva la caché
+CATALOG_CACHE_TTL = float(os.getenv("CATALOG_CACHE_TTL", "60"))
+CATALOG_CACHE_MAX_ENTRIES = int(os.getenv("CATALOG_CACHE_MAX_ENTRIES", "1024"))
+
+PRODUCT_LISTS = "product-lists"
+CATEGORY_LISTS = "category-lists"
+
+def product_tag(product_id: Any) -> str:
+    return f"product:{product_id}"
+
+def category_tag(category_id: Any) -> str:
+    return f"category:{category_id}"
+
+class CatalogCache:
+    """
+    Caché LRU con expiración e invalidación por etiquetas.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 60.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any, Tuple[str, ...]]]" = OrderedDict()
+        self._tags: Dict[str, Set[Hashable]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        # Se incrementa con cada invalidación: una lectura que empezó antes
+        # de una escritura no debe guardar su resultado (ya podría ser viejo)
+        self.generation = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_entries > 0
+
+    @staticmethod
+    def make_key(endpoint: str, **params: Any) -> Tuple:
+        """
+        Llave estable: endpoint + parámetros ordenados, omitiendo los vacíos.
+        """
+        return (endpoint,) + tuple(
+            (name, value) for name, value in sorted(params.items()) if value is not None
+        )
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Retorna el valor guardado o None si no existe o ya expiró.
+        """
+        if not self.enabled:
+            return None
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                self._discard(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(
+        self,
+        key: Hashable,
+        value: Any,
+        tags: Iterable[str] = (),
+        generation: Optional[int] = None,
+    ) -> None:
+        """
+        Guarda un valor. Si se pasa `generation` (leída antes de consultar
+        Supabase) y hubo invalidaciones desde entonces, no se guarda.
+        """
+        if not self.enabled:
+            return
+        if generation is not None and generation != self.generation:
+            return
+        if key in self._entries:
+            self._discard(key)
+        tags = tuple(tags)
+        self._entries[key] = (time.monotonic() + self.ttl, value, tags)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._discard(oldest)
+            self.evictions += 1
+
+    def invalidate(self, *tags: str) -> int:
+        """
+        Elimina las entradas con cualquiera de las etiquetas; retorna cuántas.
+        """
+        self.generation += 1
+        removed = 0
+        for tag in tags:
+            for key in self._tags.pop(tag, set()):
+                if key in self._entries:
+                    self._discard(key)
+                    removed += 1
+        self.invalidations += removed
+        return removed
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._tags.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+    def _discard(self, key: Hashable) -> None:
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+catalog_cache = CatalogCache(
+    max_entries=CATALOG_CACHE_MAX_ENTRIES,
+    ttl=CATALOG_CACHE_TTL,
+)
+
+def invalidate_product(product_id: Any) -> None:
+    """
+    Tras escribir un producto: su detalle y todos los listados de productos.
+    """
+    catalog_cache.invalidate(product_tag(product_id), PRODUCT_LISTS)
+
+def invalidate_category(category_id: Any) -> None:
+    """
+    Tras modificar o eliminar una categoría: su detalle, los listados de
+    categorías y los productos que la embeben (detalles y listados).
+    """
+    catalog_cache.invalidate(category_tag(category_id), CATEGORY_LISTS, PRODUCT_LISTS)
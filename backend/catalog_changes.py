@@ -0,0 +1,127 @@
+"""
+Cambios del catálogo desde la consulta anterior (GET /api/v1/changes), para
+que el POS y el panel de administración mantengan una copia local sin volver
+a descargar los listados.
+
+Con sql/007 la base mueve `updated_at` en cada UPDATE y deja en
+`catalog_tombstones` una lápida por cada producto o categoría eliminada. Se
+leen tres flujos ordenados por (fecha, id), cada uno con su índice:
+categorías modificadas, productos modificados y lápidas. El cursor guarda la
+posición en cada flujo, así que la respuesta crece con lo que cambió y no
+con el tamaño del catálogo.
+"""
+import asyncio
+import base64
+import json
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, Optional
+from uuid import UUID
+
+from postgrest.exceptions import APIError
+from supabase import Client
+
+import repository
+
+# Los cambios se leen hasta hace estos segundos: updated_at es la hora de
+# inicio de la transacción (now()), y una que todavía no confirmó puede
+# aparecer después con una fecha anterior a la ya leída
+CHANGES_SETTLE_SECONDS = float(os.getenv("CHANGES_SETTLE_SECONDS", "2"))
+
+# Flujo: (tabla, columna de fecha, columnas)
+STREAMS = {
+    "categories": ("categories", "updated_at", "*"),
+    "products": ("products", "updated_at", "*"),
+    "deleted": ("catalog_tombstones", "deleted_at", "id, table_name, row_id, deleted_at"),
+}
+
+def encode_cursor(positions: Dict[str, list]) -> str:
+    """
+    Cursor opaco con la posición (fecha, id) alcanzada en cada flujo; id
+    None significa "todo hasta esa fecha".
+    """
+    raw = json.dumps(positions, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str, streams: Iterable[str] = STREAMS) -> Dict[str, list]:
+    """
+    Decodifica un cursor de `encode_cursor` con una posición por cada uno de
+    `streams`; lanza ValueError si no es válido.
+    """
+    padded = cursor + "=" * (-len(cursor) % 4)
+    positions = json.loads(base64.urlsafe_b64decode(padded))
+    if not isinstance(positions, dict) or set(positions) != set(streams):
+        raise ValueError(cursor)
+    for name, position in positions.items():
+        if not isinstance(position, list) or len(position) != 2:
+            raise ValueError(cursor)
+        timestamp, row_id = position
+        # Los valores van dentro de filtros de PostgREST: solo fechas e ids
+        if datetime.fromisoformat(timestamp).tzinfo is None:
+            raise ValueError(cursor)
+        if row_id is None:
+            continue
+        if name == "deleted" and not isinstance(row_id, int):
+            raise ValueError(cursor)
+        if name != "deleted":
+            UUID(row_id)
+    return positions
+
+def after_position(query, column: str, position: Optional[list]):
+    if position is None:
+        return query
+    timestamp, row_id = position
+    if row_id is None:
+        return query.gt(column, timestamp)
+    return query.or_(
+        f'{column}.gt."{timestamp}",'
+        f'and({column}.eq."{timestamp}",id.gt.{row_id})'
+    )
+
+def caught_up(position: Optional[list], until: str) -> list:
+    # No retroceder si el cursor ya iba más adelante (otro worker, otro reloj)
+    if position is not None and datetime.fromisoformat(position[0]) > datetime.fromisoformat(until):
+        return [position[0], None]
+    return [until, None]
+
+async def fetch_changes(
+    supabase: Client,
+    positions: Optional[Dict[str, list]],
+    limit: int,
+) -> Optional[Dict[str, Any]]:
+    """
+    Hasta `limit` filas por flujo posteriores a `positions` (sin posiciones,
+    todo el catálogo y las eliminaciones desde ahora), más el cursor para la
+    consulta siguiente. None si falta sql/007.
+    """
+    until = (datetime.now(timezone.utc) - timedelta(seconds=CHANGES_SETTLE_SECONDS)).isoformat()
+    if positions is None:
+        positions = {"categories": None, "products": None, "deleted": [until, None]}
+
+    queries = []
+    for name, (table, column, columns) in STREAMS.items():
+        query = after_position(supabase.table(table).select(columns).lte(column, until), column, positions[name])
+        queries.append(repository.execute(query.order(column).order("id").limit(limit)))
+    try:
+        responses = await asyncio.gather(*queries)
+    except APIError as e:
+        if e.code not in repository.UNDEFINED_TABLE:
+            raise
+        return None
+
+    result: Dict[str, Any] = {"has_more": False}
+    next_positions = {}
+    for (name, (_, column, _)), response in zip(STREAMS.items(), responses):
+        rows = response.data or []
+        result[name] = rows
+        if len(rows) == limit:
+            result["has_more"] = True
+            next_positions[name] = [rows[-1][column], rows[-1]["id"]]
+        else:
+            next_positions[name] = caught_up(positions[name], until)
+    result["deleted"] = [
+        {"table": row["table_name"], "id": row["row_id"], "deleted_at": row["deleted_at"]}
+        for row in result["deleted"]
+    ]
+    result["next_since"] = encode_cursor(next_positions)
+    return result
@@ -0,0 +1,58 @@
+"""
+Punto único por el que los routers avisan de escrituras del catálogo.
+
+Mantiene coherentes con Supabase la caché de lecturas y los índices en
+memoria del proceso; los handlers llaman a estas funciones después de que
+la escritura se confirmó.
+"""
+from typing import Any, List, Optional
+
+from cache import catalog_cache, invalidate_category, invalidate_product, product_tag, CATEGORY_LISTS, PRODUCT_LISTS
+from search import search_index
+
+def product_written(product_id: Any, product: Optional[dict]) -> None:
+    """
+    Producto creado o modificado; `product` es la fila ya guardada (None si
+    desapareció entre la escritura y la relectura).
+    """
+    invalidate_product(product_id)
+    if search_index.active:
+        if product is None:
+            search_index.remove(product_id)
+        else:
+            search_index.upsert(product)
+
+def product_deleted(product_id: Any) -> None:
+    invalidate_product(product_id)
+    if search_index.active:
+        search_index.remove(product_id)
+
+def category_created(category_id: Any) -> None:
+    # Una categoría nueva no tiene productos: solo cambian los listados
+    catalog_cache.invalidate(CATEGORY_LISTS)
+
+def category_written(category_id: Any) -> None:
+    invalidate_category(category_id)
+
+def category_deleted(category_id: Any) -> None:
+    invalidate_category(category_id)
+
+def products_imported(products: List[dict]) -> None:
+    """
+    Productos nuevos de una importación masiva: basta invalidar los listados
+    una vez (ningún detalle de un producto nuevo puede estar en caché).
+    """
+    if not products:
+        return
+    catalog_cache.invalidate(PRODUCT_LISTS)
+    if search_index.active:
+        for product in products:
+            search_index.upsert(product)
+
+def stock_updated(product_ids: List[Any]) -> None:
+    """
+    Cambio de stock en lote; el índice de búsqueda no guarda el stock.
+    """
+    if not product_ids:
+        return
+    catalog_cache.invalidate(PRODUCT_LISTS, *(product_tag(product_id) for product_id in product_ids))
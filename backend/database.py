@@ -1,6 +1,22 @@
+"""
+Cliente de Supabase compartido por toda la app.
+
+Se crea una sola vez por proceso y de forma perezosa: en el arranque (ver
+`lifespan` en main.py) o, sin lifespan, en la primera petición. Así cada
+worker de uvicorn crea el suyo después de arrancar en lugar de heredarlo al
+importar. Las queries a PostgREST salen por un pool de conexiones
+keep-alive con tamaño y timeouts configurables, reutilizado por todas las
+peticiones.
+"""
 import os
-from supabase import create_client, Client
+import threading
+from typing import Dict, Optional, Union
+
+import httpx
 from dotenv import load_dotenv
+from postgrest import SyncPostgrestClient
+from postgrest.utils import SyncClient
+from supabase import Client
 
 load_dotenv()
 
@@ -8,12 +24,69 @@ load_dotenv()
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_ANON_KEY")
 
-if not SUPABASE_URL or not SUPABASE_KEY:
-    raise ValueError("SUPABASE_URL y SUPABASE_ANON_KEY deben estar configuradas en el archivo .env")
+# Pool de conexiones hacia PostgREST: por defecto una por hilo del pool de
+# `repository` (SUPABASE_MAX_WORKERS)
+SUPABASE_POOL_SIZE = int(os.getenv("SUPABASE_POOL_SIZE", os.getenv("SUPABASE_MAX_WORKERS", "16")))
+# Segundos que una conexión ociosa sigue abierta
+SUPABASE_KEEPALIVE_EXPIRY = float(os.getenv("SUPABASE_KEEPALIVE_EXPIRY", "60"))
+SUPABASE_CONNECT_TIMEOUT = float(os.getenv("SUPABASE_CONNECT_TIMEOUT", "5"))
+SUPABASE_TIMEOUT = float(os.getenv("SUPABASE_TIMEOUT", "30"))
+
+class PooledPostgrestClient(SyncPostgrestClient):
+    """
+    Cliente de PostgREST con el pool y los timeouts configurados.
+    """
+
+    def create_session(
+        self,
+        base_url: str,
+        headers: Dict[str, str],
+        timeout: Union[int, float, httpx.Timeout],
+        verify: bool = True,
+        proxy: Optional[str] = None,
+    ) -> SyncClient:
+        return SyncClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=httpx.Timeout(SUPABASE_TIMEOUT, connect=SUPABASE_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=SUPABASE_POOL_SIZE,
+                max_keepalive_connections=SUPABASE_POOL_SIZE,
+                keepalive_expiry=SUPABASE_KEEPALIVE_EXPIRY,
+            ),
+            verify=verify,
+            proxy=proxy,
+            follow_redirects=True,
+            http2=True,
+        )
 
-# Cliente de Supabase
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+class PooledClient(Client):
+    """
+    Cliente de Supabase cuyo cliente de PostgREST usa el pool; supabase-py
+    lo vuelve a crear por este mismo método si cambia la sesión de auth.
+    """
+
+    def _init_postgrest_client(self, rest_url, headers, schema, timeout=None, verify=True):
+        return PooledPostgrestClient(rest_url, headers=headers, schema=schema, verify=verify)
+
+_client: Optional[Client] = None
+_lock = threading.Lock()
 
 def get_supabase_client() -> Client:
-    """Retorna el cliente de Supabase"""
-    return supabase
+    """Retorna el cliente de Supabase, creándolo la primera vez"""
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                if not SUPABASE_URL or not SUPABASE_KEY:
+                    raise ValueError("SUPABASE_URL y SUPABASE_ANON_KEY deben estar configuradas en el archivo .env")
+                _client = PooledClient.create(supabase_url=SUPABASE_URL, supabase_key=SUPABASE_KEY)
+    return _client
+
+def close_supabase_client() -> None:
+    """Cierra las conexiones del pool (al apagar el worker)"""
+    global _client
+    with _lock:
+        client, _client = _client, None
+    if client is not None:
+        client.postgrest.session.close()
@@ -0,0 +1,145 @@
+"""
+Facetas del catálogo para la barra de filtros: cuántos productos hay por
+categoría, tag, alérgeno y rango de precio de cada nivel.
+
+Se calculan con la función `product_facets` (sql/004) en una sola consulta
+agregada. Si la función no está instalada, o si la búsqueda usa el índice
+en memoria, se recorren solo las columnas necesarias de los productos que
+cumplen los filtros y se cuentan en una pasada. Ambos caminos producen el
+mismo agregado "crudo", que `facets_response` ordena y completa.
+"""
+import bisect
+import os
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from postgrest.exceptions import APIError
+from supabase import Client
+
+import repository
+
+PRICE_TIERS = repository.PRICE_TIERS
+
+# Límites de los rangos de precio: [0, 5), [5, 10), ... y el último abierto
+PRICE_FACET_EDGES = [
+    float(edge) for edge in os.getenv("PRICE_FACET_EDGES", "0,5,10,20,50,100").split(",") if edge.strip()
+]
+
+FACET_COLUMNS = "id, category_id, tags, allergens, " + ", ".join(PRICE_TIERS)
+
+def _count(counts: Dict[str, int], value: Any) -> None:
+    key = str(value)
+    counts[key] = counts.get(key, 0) + 1
+
+class FacetCounter:
+    """
+    Agregado crudo en una pasada, con la misma forma que retorna
+    `product_facets`: conteos por valor y, por nivel de precio, mínimo,
+    máximo y conteo por rango (`width_bucket` de PostgreSQL).
+    """
+
+    def __init__(self, edges: List[float]):
+        self.edges = edges
+        self.total = 0
+        self.categories: Dict[str, int] = {}
+        self.tags: Dict[str, int] = {}
+        self.allergens: Dict[str, int] = {}
+        self.prices: Dict[str, Dict[str, Any]] = {}
+
+    def add(self, rows: List[dict]) -> None:
+        for row in rows:
+            self.total += 1
+            if row.get("category_id"):
+                _count(self.categories, row["category_id"])
+            for tag in row.get("tags") or ():
+                _count(self.tags, tag)
+            for allergen in row.get("allergens") or ():
+                _count(self.allergens, allergen)
+            for tier in PRICE_TIERS:
+                price = row.get(tier)
+                if price is None:
+                    continue
+                stats = self.prices.get(tier)
+                if stats is None:
+                    stats = self.prices[tier] = {"count": 0, "min": price, "max": price, "buckets": {}}
+                stats["count"] += 1
+                stats["min"] = min(stats["min"], price)
+                stats["max"] = max(stats["max"], price)
+                _count(stats["buckets"], bisect.bisect_right(self.edges, price))
+
+    def raw(self) -> Dict[str, Any]:
+        return {
+            "total": self.total,
+            "categories": self.categories,
+            "tags": self.tags,
+            "allergens": self.allergens,
+            "prices": self.prices,
+        }
+
+def _ranked(counts: Dict[str, int]) -> List[Dict[str, Any]]:
+    return [
+        {"value": value, "count": count}
+        for value, count in sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+    ]
+
+def facets_response(raw: Dict[str, Any], edges: List[float]) -> Dict[str, Any]:
+    """
+    Ordena los conteos de mayor a menor y arma todos los rangos de precio
+    de cada nivel, incluidos los vacíos, para que la barra no cambie de forma.
+    """
+    prices = []
+    for tier in PRICE_TIERS:
+        stats = (raw.get("prices") or {}).get(tier) or {}
+        counts = {int(bucket): count for bucket, count in (stats.get("buckets") or {}).items()}
+        buckets = [
+            {"min": edges[index - 1], "max": edges[index] if index < len(edges) else None, "count": counts.get(index, 0)}
+            for index in range(1, len(edges) + 1)
+        ]
+        # Precios bajo el primer límite (no debería haber con el límite en 0)
+        if counts.get(0):
+            buckets.insert(0, {"min": None, "max": edges[0], "count": counts[0]})
+        prices.append({
+            "tier": tier,
+            "count": stats.get("count", 0),
+            "min": stats.get("min"),
+            "max": stats.get("max"),
+            "buckets": buckets,
+        })
+    return {
+        "total": raw.get("total", 0),
+        "categories": _ranked(raw.get("categories") or {}),
+        "tags": _ranked(raw.get("tags") or {}),
+        "allergens": _ranked(raw.get("allergens") or {}),
+        "prices": prices,
+    }
+
+async def aggregate_in_database(supabase: Client, filters: dict) -> Optional[Dict[str, Any]]:
+    """
+    Agregado crudo con la función `product_facets`; None si no está
+    instalada. La búsqueda, si la hay, se aplica como `ilike` en la base.
+    """
+    try:
+        response = await repository.execute(supabase.rpc("product_facets", {
+            "p_category_id": filters["category_id"],
+            # Como en el listado, una búsqueda en blanco no filtra
+            "p_search": filters["search"] if filters["search"] and filters["search"].strip() else None,
+            "p_active_only": filters["active_only"],
+            "p_featured_only": filters["featured_only"],
+            "p_min_price": filters["min_price"],
+            "p_max_price": filters["max_price"],
+            "p_price_tier": filters["price_tier"],
+            "p_price_edges": PRICE_FACET_EDGES,
+        }))
+    except APIError as e:
+        if e.code != repository.FUNCTION_NOT_FOUND:
+            raise
+        return None
+    return response.data
+
+async def aggregate(chunks: AsyncIterator[List[dict]]) -> Dict[str, Any]:
+    """
+    Agregado crudo en una pasada sobre bloques de productos (FACET_COLUMNS).
+    """
+    counter = FacetCounter(PRICE_FACET_EDGES)
+    async for rows in chunks:
+        counter.add(rows)
+    return counter.raw()
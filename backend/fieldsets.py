@@ -0,0 +1,95 @@
+"""
+Campos parciales de producto (`fields=` en el listado y el detalle).
+
+Un preset con nombre (`card`, `detail`, `admin`) o una lista de campos
+separados por coma. Solo esas columnas se piden a Supabase y la respuesta
+se valida y serializa con un modelo armado a la medida, así que baja a la
+vez la transferencia desde Supabase, el trabajo de validación y el tamaño
+de la respuesta.
+"""
+from functools import lru_cache
+from typing import List, Optional, Tuple, Type
+
+from pydantic import BaseModel, create_model
+
+from models import ProductResponse, ProductsListResponse
+from repository import PRODUCT_SELECT
+
+# Campos de ProductResponse en su orden; `category` es la categoría embebida
+PRODUCT_FIELDS = tuple(ProductResponse.model_fields)
+
+CATEGORY_EMBED = "category:categories(id, name, slug)"
+
+# "price" es el precio del nivel pedido (`price_tier`). `admin` son todos
+# los campos: lo mismo que no enviar `fields`
+PRESETS = {
+    "card": ("name", "slug", "price", "main_image_url", "stock_quantity"),
+    "detail": (
+        "name", "description", "slug", "sku", "category", "price",
+        "weight_grams", "dimensions_cm", "ingredients", "nutritional_info", "allergens",
+        "stock_quantity", "max_order_quantity", "min_order_quantity",
+        "main_image_url", "gallery_images", "is_featured", "tags",
+    ),
+    "admin": None,
+}
+
+def resolve(fields: Optional[str], price_tier: str = "price_wholesale") -> Optional[Tuple[str, ...]]:
+    """
+    Campos pedidos, en el orden de ProductResponse y siempre con `id`; None
+    si son todos. Lanza ValueError si hay campos desconocidos.
+    """
+    if fields is None:
+        return None
+    if fields in PRESETS:
+        names = PRESETS[fields]
+        if names is None:
+            return None
+    else:
+        names = [name.strip() for name in fields.split(",") if name.strip()]
+        unknown = [name for name in names if name not in PRODUCT_FIELDS and name != "price"]
+        if not names or unknown:
+            raise ValueError(
+                f"Campos desconocidos: {', '.join(unknown) or '(ninguno indicado)'}. "
+                f"Use {', '.join(PRESETS)} o campos de: {', '.join(PRODUCT_FIELDS)}, price"
+            )
+    wanted = {price_tier if name == "price" else name for name in names}
+    wanted.add("id")
+    resolved = tuple(name for name in PRODUCT_FIELDS if name in wanted)
+    return None if len(resolved) == len(PRODUCT_FIELDS) else resolved
+
+def select_columns(fields: Optional[Tuple[str, ...]], *required: str) -> str:
+    """
+    `select` de Supabase para los campos, más las columnas que necesita la
+    paginación (`required`); el modelo de respuesta las descarta.
+    """
+    if fields is None:
+        return PRODUCT_SELECT
+    columns: List[str] = list(fields)
+    columns += [column for column in required if column not in columns]
+    return ", ".join(CATEGORY_EMBED if column == "category" else column for column in columns)
+
+@lru_cache(maxsize=256)
+def item_model(fields: Optional[Tuple[str, ...]]) -> Type[BaseModel]:
+    """
+    Modelo con solo esos campos de ProductResponse (con sus mismas
+    validaciones), compilado una sola vez por combinación.
+    """
+    if fields is None:
+        return ProductResponse
+    return create_model(
+        "ProductFields",
+        **{name: (ProductResponse.model_fields[name].annotation, ProductResponse.model_fields[name]) for name in fields}
+    )
+
+@lru_cache(maxsize=256)
+def list_model(fields: Optional[Tuple[str, ...]]) -> Type[BaseModel]:
+    """
+    ProductsListResponse con los productos de `item_model(fields)`.
+    """
+    if fields is None:
+        return ProductsListResponse
+    return create_model(
+        "ProductFieldsList",
+        __base__=ProductsListResponse,
+        products=(List[item_model(fields)], ...),
+    )
@@ -0,0 +1,188 @@
+"""
+Respuestas cacheables del catálogo: ETag fuerte, If-None-Match y Cache-Control.
+
+Las lecturas se serializan una sola vez a `RenderedBody` (bytes JSON + ETag
+calculado sobre esos bytes). Eso es lo que guarda la caché del catálogo, de
+modo que un acierto responde 200 o 304 sin volver a serializar ni a hashear.
+
+Si el cliente acepta gzip, el cuerpo comprimido se calcula la primera vez
+que se pide y queda en el mismo `RenderedBody`, junto al ETag: las páginas
+de la caché no se vuelven a comprimir en cada petición. El resto de las
+respuestas las comprime `GZipMiddleware` (ver main.py).
+
+Con `TRUSTED_UPSTREAM=true` las filas de Supabase no se revalidan: solo se
+recortan a los campos del modelo de respuesta y se codifican con orjson (si
+está instalado). Los valores salen tal como los guarda PostgreSQL.
+"""
+import gzip
+import hashlib
+import json
+import os
+from dataclasses import dataclass
+from functools import cached_property, lru_cache
+from typing import Any, Callable, List, Optional, Union, get_args, get_origin
+
+from fastapi import Request, Response
+from pydantic import BaseModel, TypeAdapter
+
+try:
+    import orjson
+except ImportError:  # opcional: sin orjson se usa el json estándar
+    orjson = None
+
+# Por defecto el navegador o la CDN guardan la respuesta pero revalidan
+# siempre con If-None-Match, lo que cuesta un 304 sin cuerpo
+CATALOG_CACHE_CONTROL = os.getenv("CATALOG_CACHE_CONTROL", "public, no-cache")
+
+# Confiar en los tipos que entrega Supabase y no validar las lecturas
+TRUSTED_UPSTREAM = os.getenv("TRUSTED_UPSTREAM", "false").lower() == "true"
+
+# Compresión gzip de respuestas desde GZIP_MIN_SIZE bytes. Las dinámicas se
+# comprimen en cada petición con GZIP_LEVEL; las del catálogo una sola vez
+# por entrada de la caché, así que pueden usar un nivel más alto
+GZIP_ENABLED = os.getenv("GZIP_ENABLED", "true").lower() == "true"
+GZIP_MIN_SIZE = int(os.getenv("GZIP_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "5"))
+GZIP_CACHE_LEVEL = int(os.getenv("GZIP_CACHE_LEVEL", "9"))
+
+@dataclass(frozen=True)
+class RenderedBody:
+    body: bytes
+    etag: str
+    
+    @cached_property
+    def gzipped(self) -> bytes:
+        """
+        Cuerpo comprimido, calculado la primera vez que se necesita.
+        """
+        return gzip.compress(self.body, compresslevel=GZIP_CACHE_LEVEL, mtime=0)
+    
+    @property
+    def gzip_etag(self) -> str:
+        """
+        ETag de la versión comprimida: otra representación, otro ETag fuerte.
+        """
+        return self.etag[:-1] + '-gzip"'
+
+@lru_cache(maxsize=None)
+def get_adapter(response_type: Any) -> TypeAdapter:
+    """
+    TypeAdapter compilado una sola vez por tipo de respuesta.
+    """
+    return TypeAdapter(response_type)
+
+def _identity(value: Any) -> Any:
+    return value
+
+@lru_cache(maxsize=None)
+def get_projector(response_type: Any) -> Callable[[Any], Any]:
+    """
+    Función compilada una sola vez por tipo que deja en un dict (o lista de
+    dicts) solo los campos del modelo, recursivamente, sin convertir valores.
+    Los campos ausentes toman su valor por defecto.
+    """
+    origin = get_origin(response_type)
+    if origin in (list, List):
+        item = get_projector(get_args(response_type)[0])
+        if item is _identity:
+            return _identity
+        return lambda values: None if values is None else [item(value) for value in values]
+    if origin is Union:
+        options = [option for option in get_args(response_type) if option is not type(None)]
+        if len(options) != 1:
+            return _identity
+        inner = get_projector(options[0])
+        if inner is _identity:
+            return _identity
+        return lambda value: None if value is None else inner(value)
+    if not (isinstance(response_type, type) and issubclass(response_type, BaseModel)):
+        return _identity
+
+    fields = [
+        (name, field, get_projector(field.annotation))
+        for name, field in response_type.model_fields.items()
+    ]
+
+    def project(data: dict) -> dict:
+        result = {}
+        for name, field, inner in fields:
+            if name in data:
+                result[name] = inner(data[name])
+            elif not field.is_required():
+                result[name] = field.get_default(call_default_factory=True)
+            else:
+                result[name] = None
+        return result
+
+    return project
+
+def dumps(data: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode()
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+def render(response_type: Any, data: Any, trusted: bool = False) -> RenderedBody:
+    """
+    Valida `data` contra el modelo de respuesta y lo serializa a JSON.
+    
+    - **trusted**: `data` son dicts armados con filas de Supabase; con
+      `TRUSTED_UPSTREAM` activo se recortan y serializan sin validar
+    """
+    if trusted and TRUSTED_UPSTREAM:
+        body = dumps(get_projector(response_type)(data))
+    else:
+        adapter = get_adapter(response_type)
+        body = adapter.dump_json(adapter.validate_python(data))
+    return RenderedBody(body=body, etag=make_etag(body))
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Comparación débil de If-None-Match (RFC 9110 §13.1.2).
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    """
+    Si `Accept-Encoding` incluye gzip (o `*`) sin `q=0`.
+    """
+    for item in (accept_encoding or "").split(","):
+        coding, _, params = item.partition(";")
+        if coding.strip().lower() not in ("gzip", "*"):
+            continue
+        quality = params.strip().lower()
+        if quality.startswith("q="):
+            try:
+                return float(quality[2:]) > 0
+            except ValueError:
+                return False
+        return True
+    return False
+
+def catalog_response(request: Request, rendered: RenderedBody) -> Response:
+    """
+    200 con el cuerpo (comprimido si el cliente acepta gzip) o 304 sin él si
+    el cliente ya tiene esa versión, comprimida o no.
+    """
+    compress = GZIP_ENABLED and len(rendered.body) >= GZIP_MIN_SIZE and accepts_gzip(
+        request.headers.get("accept-encoding")
+    )
+    etag = rendered.gzip_etag if compress else rendered.etag
+    headers = {"ETag": etag, "Cache-Control": CATALOG_CACHE_CONTROL}
+    if GZIP_ENABLED:
+        headers["Vary"] = "Accept-Encoding"
+    if_none_match = request.headers.get("if-none-match")
+    if etag_matches(if_none_match, rendered.etag) or etag_matches(if_none_match, rendered.gzip_etag):
+        return Response(status_code=304, headers=headers)
+    if compress:
+        # GZipMiddleware no vuelve a comprimir una respuesta con Content-Encoding
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=rendered.gzipped, media_type="application/json", headers=headers)
+    return Response(content=rendered.body, media_type="application/json", headers=headers)
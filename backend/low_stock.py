@@ -0,0 +1,120 @@
+"""
+Productos con stock bajo (stock_quantity <= min_stock_alert) para el job
+de compras.
+
+Con sql/005 la base mantiene la columna generada `is_low_stock`, un índice
+parcial con solo los productos en alerta y `stock_alert_changed_at`, que
+cambia cuando un producto entra o sale de la alerta. Así cualquier
+escritura (crear, editar, mover stock, eliminar) actualiza el conjunto sin
+que la API haga nada, y la consulta cuesta según los productos en alerta.
+Sin la migración se recorre el catálogo y se compara en Python.
+
+Un producto eliminado mientras estaba en alerta no aparece en `restocked`:
+las eliminaciones llegan por GET /api/v1/changes (`deleted`, sql/007).
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from postgrest.exceptions import APIError
+from supabase import Client
+
+import catalog_changes
+import repository
+
+LOW_STOCK_COLUMNS = "id, name, sku, category_id, stock_quantity, min_stock_alert, stock_alert_changed_at"
+
+# Flujos del cursor `since`: productos que entraron y que salieron de la alerta
+STREAMS = ("alerts", "restocked")
+
+def decode_since(since: str) -> Dict[str, list]:
+    """
+    Posiciones de `since`: el `next_since` de una consulta anterior o una
+    fecha ISO (sin zona horaria, UTC). Lanza ValueError si no es válido.
+    """
+    try:
+        timestamp = datetime.fromisoformat(since)
+    except ValueError:
+        return catalog_changes.decode_cursor(since, STREAMS)
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return {name: [timestamp.isoformat(), None] for name in STREAMS}
+
+def _filters(query, category_id: Optional[str], active_only: bool):
+    if active_only:
+        query = query.eq("is_active", True)
+    if category_id:
+        query = query.eq("category_id", category_id)
+    return query
+
+async def fetch_indexed(
+    supabase: Client,
+    category_id: Optional[str],
+    active_only: bool,
+    positions: Optional[Dict[str, list]],
+    limit: int,
+) -> Optional[Dict[str, Any]]:
+    """
+    Hasta `limit` alertas desde el índice parcial de sql/005 y los productos
+    que salieron de la alerta, en orden (stock_alert_changed_at, id),
+    posteriores a `positions`. Sin `positions` empieza por todas las
+    alertas actuales (con `total` contado por la base) y las salidas desde
+    ahora. None si falta la migración.
+    
+    Como en catalog_changes, los cambios se leen hasta hace
+    CHANGES_SETTLE_SECONDS: stock_alert_changed_at es la hora de inicio de la
+    transacción y una que todavía no confirmó puede aparecer después con una
+    fecha anterior a la ya leída.
+    """
+    until = (datetime.now(timezone.utc) - timedelta(seconds=catalog_changes.CHANGES_SETTLE_SECONDS)).isoformat()
+    column = "stock_alert_changed_at"
+    # Sin `since`, `total` son todas las alertas aunque la página traiga `limit`
+    count = "exact" if positions is None else None
+    if positions is None:
+        positions = {"alerts": None, "restocked": [until, None]}
+    alerts = supabase.table("products").select(LOW_STOCK_COLUMNS, count=count).eq("is_low_stock", True)
+    restocked = supabase.table("products").select("id, " + column).eq("is_low_stock", False)
+    queries = [
+        repository.execute(
+            catalog_changes.after_position(
+                _filters(query, category_id, active_only).lte(column, until), column, positions[name]
+            ).order(column).order("id").limit(limit)
+        )
+        for name, query in zip(STREAMS, (alerts, restocked))
+    ]
+    try:
+        responses = await asyncio.gather(*queries)
+    except APIError as e:
+        if e.code != repository.UNDEFINED_COLUMN:
+            raise
+        return None
+
+    products = responses[0].data or []
+    restocked_rows = responses[1].data or []
+    has_more = False
+    next_positions = {}
+    for name, rows in zip(STREAMS, (products, restocked_rows)):
+        if len(rows) == limit:
+            has_more = True
+            next_positions[name] = [rows[-1][column], rows[-1]["id"]]
+        else:
+            next_positions[name] = catalog_changes.caught_up(positions[name], until)
+    return {
+        "products": products,
+        "total": responses[0].count if count is not None else len(products),
+        "restocked": [row["id"] for row in restocked_rows],
+        "has_more": has_more,
+        "next_since": catalog_changes.encode_cursor(next_positions),
+    }
+
+async def fetch_scanned(supabase: Client, category_id: Optional[str], active_only: bool) -> Dict[str, Any]:
+    """
+    Alertas recorriendo todo el catálogo (sin sql/005).
+    """
+    products: List[dict] = []
+    columns = "id, name, sku, category_id, stock_quantity, min_stock_alert"
+    async for rows in repository.iter_rows(
+        supabase, "products", columns, prepare=lambda query: _filters(query, category_id, active_only)
+    ):
+        products.extend(row for row in rows if row["stock_quantity"] <= row["min_stock_alert"])
+    return {"products": products, "total": len(products), "restocked": [], "has_more": False, "next_since": None}
@@ -1,14 +1,101 @@
+import time
+
+# Desde aquí se mide el arranque: importaciones, cliente y precalentamiento
+IMPORT_STARTED = time.perf_counter()
+
 import os
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+import httpx
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from routers import categories, products
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
+from routers import categories, changes, products
+from cache import catalog_cache
+from search import search_index
+from single_flight import catalog_reads
+from database import get_supabase_client, close_supabase_client
+from metrics import MetricsMiddleware
+from admission import AdmissionMiddleware
+from http_cache import GZIP_ENABLED, GZIP_MIN_SIZE, GZIP_LEVEL
+import admission
+import metrics
+import repository
+
+logger = logging.getLogger(__name__)
+
+# Segundos que /health espera a Supabase antes de declararlo caído
+HEALTH_UPSTREAM_TIMEOUT = float(os.getenv("HEALTH_UPSTREAM_TIMEOUT", "2"))
+
+# Precalentamiento al arrancar: pedir estas rutas a la propia app (abre
+# conexiones del pool y llena la caché) y cargar el índice de búsqueda
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "false").lower() == "true"
+STARTUP_WARMUP_PATHS = [
+    path.strip()
+    for path in os.getenv("STARTUP_WARMUP_PATHS", "/api/v1/categories/,/api/v1/products/").split(",")
+    if path.strip()
+]
+STARTUP_WARMUP_TIMEOUT = float(os.getenv("STARTUP_WARMUP_TIMEOUT", "10"))
+
+# Segundos de cada etapa del arranque de este worker
+startup_stats = {"import_seconds": time.perf_counter() - IMPORT_STARTED}
+
+async def warm_up(app: FastAPI) -> None:
+    """
+    Pide en paralelo las rutas de STARTUP_WARMUP_PATHS: cada una abre su
+    conexión con Supabase y deja su respuesta en la caché.
+    """
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://warmup") as client:
+        responses = await asyncio.gather(*(client.get(path) for path in STARTUP_WARMUP_PATHS))
+    for path, response in zip(STARTUP_WARMUP_PATHS, responses):
+        if response.status_code >= 400:
+            logger.warning("Precalentamiento: %s respondió %d", path, response.status_code)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Crea el cliente de Supabase de este worker antes de aceptar peticiones
+    y cierra sus conexiones al apagar.
+    
+    Con STARTUP_WARMUP también precalienta antes de aceptar peticiones (una
+    ida y vuelta a Supabase) y carga el índice de búsqueda en segundo plano:
+    es lo más lento y no debe retrasar la primera respuesta tras despertar.
+    """
+    started = time.perf_counter()
+    supabase = get_supabase_client()
+    index_task = None
+    if STARTUP_WARMUP:
+        warmup_started = time.perf_counter()
+        try:
+            await asyncio.wait_for(warm_up(app), timeout=STARTUP_WARMUP_TIMEOUT)
+        except Exception as e:
+            # Sin precalentar la app funciona igual; la primera petición paga
+            logger.warning("Precalentamiento incompleto: %r", e)
+        startup_stats["warmup_seconds"] = time.perf_counter() - warmup_started
+        if search_index.enabled:
+            index_task = asyncio.create_task(search_index.ensure_fresh(supabase))
+    startup_stats["lifespan_seconds"] = time.perf_counter() - started
+    startup_stats["ready_seconds"] = time.perf_counter() - IMPORT_STARTED
+    logger.info("API lista en %.0f ms", startup_stats["ready_seconds"] * 1000)
+    yield
+    if index_task is not None and not index_task.done():
+        index_task.cancel()
+    close_supabase_client()
 
 app = FastAPI(
     title="DulProMax API",
     description="API para plataforma B2B de alimentos saludables",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# Cola y límite de peticiones de /api (503 con Retry-After al saturarse).
+# Se registra antes que CORS para quedar dentro: los 503 también llevan sus headers
+app.add_middleware(AdmissionMiddleware)
+
 # Configurar CORS
 app.add_middleware(
     CORSMiddleware,
@@ -21,11 +108,21 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "Retry-After"],
 )
 
+# Compresión gzip de las respuestas grandes; las del catálogo ya llegan
+# comprimidas desde la caché (ver http_cache)
+if GZIP_ENABLED:
+    app.add_middleware(GZipMiddleware, minimum_size=GZIP_MIN_SIZE, compresslevel=GZIP_LEVEL)
+
+# Llamadas a Supabase, tiempos y tamaño por ruta (/metrics, Server-Timing)
+app.add_middleware(MetricsMiddleware)
+
 # Incluir routers
 app.include_router(categories.router, prefix="/api/v1")
 app.include_router(products.router, prefix="/api/v1")
+app.include_router(changes.router, prefix="/api/v1")
 
 @app.get("/")
 async def root():
@@ -38,11 +135,62 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {
-        "status": "healthy", 
-        "service": "dulpromax-api", 
-        "version": "1.0.0"
-    }
+    """
+    Estado del servicio, incluida una consulta mínima a Supabase.
+    
+    Responde 503 si Supabase no contesta dentro de HEALTH_UPSTREAM_TIMEOUT,
+    para que el health check de Render refleje si la API puede atender.
+    """
+    started = time.perf_counter()
+    upstream = {"reachable": True}
+    try:
+        await asyncio.wait_for(
+            repository.execute(get_supabase_client().table("categories").select("id").limit(1)),
+            timeout=HEALTH_UPSTREAM_TIMEOUT
+        )
+    except asyncio.TimeoutError:
+        upstream = {"reachable": False, "error": f"Sin respuesta en {HEALTH_UPSTREAM_TIMEOUT:g} s"}
+    except Exception as e:
+        upstream = {"reachable": False, "error": str(e)}
+    upstream["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    
+    healthy = upstream["reachable"]
+    return JSONResponse(
+        status_code=200 if healthy else 503,
+        content={
+            "status": "healthy" if healthy else "unhealthy", 
+            "service": "dulpromax-api", 
+            "version": "1.0.0",
+            "upstream": upstream
+        }
+    )
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """
+    Histogramas por ruta (duración, espera a Supabase, tiempo propio,
+    llamadas a Supabase, tamaño de respuesta) y peticiones rechazadas por
+    sobrecarga, más el estado de la caché, del índice de búsqueda, de la
+    coalescencia de lecturas y de las colas de admisión, en el formato de
+    texto de Prometheus.
+    """
+    return PlainTextResponse(
+        metrics.render({
+            "catalog_cache": ("Caché del catálogo", catalog_cache.stats),
+            "search_index": ("Índice de búsqueda", search_index.stats),
+            "single_flight": ("Lecturas coalescidas", catalog_reads.stats),
+            "startup": ("Arranque del worker", lambda: startup_stats),
+            "admission": ("Control de admisión", admission.stats),
+        }),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """
+    Aciertos, fallos y ocupación de la caché del catálogo.
+    """
+    return catalog_cache.stats()
 
 # Punto de entrada para Render
 if __name__ == "__main__":
@@ -0,0 +1,251 @@
+"""
+Métricas por petición: llamadas a Supabase, tiempo esperando a Supabase,
+tiempo propio de la app (validación, serialización) y tamaño de respuesta.
+
+`MetricsMiddleware` abre un `RequestStats` por petición en un contextvar;
+`repository.execute` anota ahí cada llamada a Supabase. Al responder, el
+middleware agrega el header `Server-Timing` y alimenta histogramas por
+ruta que `/metrics` expone en el formato de texto de Prometheus.
+
+El tiempo de Supabase es de pared: llamadas en paralelo (`asyncio.gather`)
+cuentan una sola vez mientras se solapan, así que `app = total - upstream`
+nunca es negativo. Los histogramas son por proceso, como la caché.
+"""
+import bisect
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() not in ("0", "false", "no")
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CALL_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+class RequestStats:
+    """
+    Llamadas a Supabase de una petición y el tiempo de pared con al menos
+    una en vuelo.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.upstream_calls = 0
+        self.upstream_seconds = 0.0
+        self._in_flight = 0
+        self._since = 0.0
+
+    def call_started(self) -> None:
+        self.upstream_calls += 1
+        if self._in_flight == 0:
+            self._since = time.perf_counter()
+        self._in_flight += 1
+
+    def call_finished(self) -> None:
+        self._in_flight -= 1
+        if self._in_flight == 0:
+            self.upstream_seconds += time.perf_counter() - self._since
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def server_timing(self) -> str:
+        total = self.elapsed()
+        upstream = min(self.upstream_seconds, total)
+        return (
+            f'upstream;dur={upstream * 1000:.1f};desc="llamadas: {self.upstream_calls}", '
+            f"app;dur={(total - upstream) * 1000:.1f}, "
+            f"total;dur={total * 1000:.1f}"
+        )
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+def current() -> Optional[RequestStats]:
+    return _current.get()
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Histogram:
+    """
+    Histograma acumulativo con etiquetas, al estilo de Prometheus.
+    """
+
+    def __init__(self, name: str, help: str, labels: Sequence[str], buckets: Sequence[float]):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple[str, ...], List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: Tuple[str, ...], value: float) -> None:
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # [conteos por bucket (+Inf al final), suma]
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            series = [(labels, list(counts), total) for labels, (counts, total) in sorted(self._series.items())]
+        for labels, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                bucket = _labels(self.label_names, labels, 'le="' + le + '"')
+                yield f"{self.name}_bucket{bucket} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.label_names, labels)} {total:.6f}"
+            yield f"{self.name}_count{_labels(self.label_names, labels)} {cumulative}"
+
+class Counter:
+    """
+    Contador acumulado con etiquetas.
+    """
+
+    def __init__(self, name: str, help: str, labels: Sequence[str]):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: Tuple[str, ...], amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            yield f"{self.name}{_labels(self.label_names, labels)} {value:g}"
+
+ROUTE_LABELS = ("method", "route")
+
+REQUESTS = Counter("http_requests_total", "Peticiones atendidas", ROUTE_LABELS + ("status",))
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Duración total de la petición", ROUTE_LABELS, DURATION_BUCKETS
+)
+UPSTREAM_SECONDS = Histogram(
+    "http_request_upstream_seconds", "Tiempo esperando a Supabase por petición", ROUTE_LABELS, DURATION_BUCKETS
+)
+APP_SECONDS = Histogram(
+    "http_request_app_seconds",
+    "Tiempo propio de la app por petición (validación, serialización)",
+    ROUTE_LABELS,
+    DURATION_BUCKETS,
+)
+UPSTREAM_CALLS = Histogram(
+    "http_request_upstream_calls", "Llamadas a Supabase por petición", ROUTE_LABELS, CALL_BUCKETS
+)
+RESPONSE_BYTES = Histogram(
+    "http_response_size_bytes", "Tamaño del cuerpo de la respuesta", ROUTE_LABELS, SIZE_BUCKETS
+)
+# Etapa: "queue" (sin lugar en la cola de admisión) o "upstream" (plazo vencido esperando a Supabase)
+SHED_REQUESTS = Counter(
+    "http_requests_shed_total", "Peticiones rechazadas con 503 por sobrecarga", ("route_class", "stage")
+)
+
+METRICS = [REQUESTS, REQUEST_SECONDS, UPSTREAM_SECONDS, APP_SECONDS, UPSTREAM_CALLS, RESPONSE_BYTES, SHED_REQUESTS]
+
+def record(method: str, route: str, status: int, stats: RequestStats, size: int) -> None:
+    total = stats.elapsed()
+    upstream = min(stats.upstream_seconds, total)
+    labels = (method, route)
+    REQUESTS.inc(labels + (str(status),))
+    REQUEST_SECONDS.observe(labels, total)
+    UPSTREAM_SECONDS.observe(labels, upstream)
+    APP_SECONDS.observe(labels, total - upstream)
+    UPSTREAM_CALLS.observe(labels, stats.upstream_calls)
+    RESPONSE_BYTES.observe(labels, size)
+
+def _gauges(prefix: str, help: str, values: Dict[str, Any]) -> Iterable[str]:
+    """
+    Los valores numéricos de un `stats()` como gauges `<prefix>_<clave>`.
+    """
+    for key, value in values.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        yield f"# HELP {prefix}_{key} {help}: {key}"
+        yield f"# TYPE {prefix}_{key} gauge"
+        yield f"{prefix}_{key} {value:g}"
+
+def render(collectors: Optional[Dict[str, Tuple[str, Callable[[], Dict[str, Any]]]]] = None) -> str:
+    """
+    Texto para `/metrics`; `collectors` agrega los `stats()` de otros
+    componentes (prefijo -> (descripción, función)).
+    """
+    lines: List[str] = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    for prefix, (help, stats) in (collectors or {}).items():
+        lines.extend(_gauges(prefix, help, stats()))
+    return "\n".join(lines) + "\n"
+
+def _route_template(scope: dict) -> str:
+    """
+    Plantilla de la ruta (`/api/v1/products/{product_id}`), no la URL: así
+    la cantidad de series no crece con los IDs.
+    """
+    endpoint = scope.get("endpoint")
+    app = scope.get("app")
+    if endpoint is None or app is None:
+        return "unmatched"
+    for route in app.routes:
+        if getattr(route, "endpoint", None) is endpoint:
+            return route.path
+    return "unmatched"
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI: mide cada petición HTTP y agrega `Server-Timing`.
+
+    Es ASGI puro (no `BaseHTTPMiddleware`) para no acumular las respuestas
+    en streaming; en ellas `Server-Timing` refleja el tiempo hasta el primer
+    byte y los histogramas, la descarga completa.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        status = 500
+        size = 0
+
+        async def send_with_timing(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", stats.server_timing().encode()))
+                message = {**message, "headers": headers}
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            record(scope["method"], _route_template(scope), status, stats, size)
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field
-from typing import Optional, List, Dict, Any
+from pydantic import BaseModel, Field, model_validator
+from typing import Optional, List, Dict, Any, Literal
 from datetime import datetime
 from uuid import UUID
 
@@ -21,6 +21,17 @@ class CategoryResponse(CategoryBase):
     class Config:
         from_attributes = True
 
+class CategoryWithCounts(CategoryResponse):
+    """Categoría con sus conteos de productos (include_counts=true)"""
+    product_count: int
+    active_product_count: int
+
+class CategorySummary(BaseModel):
+    """Categoría embebida en los productos (id, name, slug)"""
+    id: UUID
+    name: str
+    slug: str
+
 class ProductBase(BaseModel):
     name: str = Field(..., max_length=200)
     description: Optional[str] = None
@@ -64,7 +75,7 @@ class ProductResponse(ProductBase):
     id: UUID
     created_at: datetime
     updated_at: datetime
-    category: Optional[CategoryResponse] = None
+    category: Optional[CategorySummary] = None
 
     class Config:
         from_attributes = True
@@ -75,3 +86,125 @@ class ProductsListResponse(BaseModel):
     page: int
     per_page: int
     total_pages: int
+    next_cursor: Optional[str] = None
+
+class ImportRowResult(BaseModel):
+    """Resultado de una fila de la importación masiva"""
+    row: int
+    status: Literal["accepted", "rejected"]
+    id: Optional[UUID] = None
+    slug: Optional[str] = None
+    errors: List[str] = []
+
+class ProductImportReport(BaseModel):
+    total_rows: int
+    accepted: int
+    rejected: int
+    rows: List[ImportRowResult]
+
+class StockItemKey(BaseModel):
+    """Producto de una operación de stock, identificado por ID o por SKU"""
+    product_id: Optional[UUID] = None
+    sku: Optional[str] = Field(None, max_length=50)
+
+    @model_validator(mode="after")
+    def check_identifier(self):
+        if (self.product_id is None) == (self.sku is None):
+            raise ValueError("Indique product_id o sku (solo uno)")
+        return self
+
+class StockUpdateItem(StockItemKey):
+    """Nuevo stock de un producto, identificado por ID o por SKU"""
+    new_stock: int = Field(..., ge=0)
+
+class StockBatchUpdate(BaseModel):
+    items: List[StockUpdateItem] = Field(..., min_length=1, max_length=10000)
+
+class StockLevel(BaseModel):
+    id: UUID
+    sku: Optional[str] = None
+    stock_quantity: int
+    updated_at: datetime
+
+class StockBatchUpdateResponse(BaseModel):
+    updated: List[StockLevel]
+    missing_ids: List[UUID]
+    missing_skus: List[str]
+
+class StockAdjustmentItem(StockItemKey):
+    """Cambio relativo de stock: negativo al vender, positivo al reponer"""
+    delta: int
+
+    @model_validator(mode="after")
+    def check_delta(self):
+        if self.delta == 0:
+            raise ValueError("delta no puede ser 0")
+        return self
+
+class StockAdjustment(BaseModel):
+    items: List[StockAdjustmentItem] = Field(..., min_length=1, max_length=1000)
+    # Rechazar salidas fuera de min_order_quantity / max_order_quantity
+    enforce_order_limits: bool = False
+
+class StockAdjustmentResponse(BaseModel):
+    updated: List[StockLevel]
+
+class ProductBatchLookup(BaseModel):
+    by: Literal["id", "slug", "sku"] = "id"
+    keys: List[str] = Field(..., min_length=1, max_length=100)
+
+class ProductBatchResponse(BaseModel):
+    products: List[ProductResponse]
+    not_found: List[str]
+
+class LowStockProduct(BaseModel):
+    id: UUID
+    name: str
+    sku: Optional[str] = None
+    category_id: Optional[UUID] = None
+    stock_quantity: int
+    min_stock_alert: int
+    stock_alert_changed_at: Optional[datetime] = None
+
+class LowStockResponse(BaseModel):
+    products: List[LowStockProduct]
+    total: int
+    restocked: List[UUID] = []
+    has_more: bool = False
+    next_since: Optional[str] = None
+
+class FacetCount(BaseModel):
+    value: str
+    count: int
+
+class PriceBucket(BaseModel):
+    min: Optional[float] = None
+    max: Optional[float] = None
+    count: int
+
+class PriceFacet(BaseModel):
+    tier: str
+    count: int
+    min: Optional[float] = None
+    max: Optional[float] = None
+    buckets: List[PriceBucket]
+
+class ProductFacetsResponse(BaseModel):
+    total: int
+    categories: List[FacetCount]
+    tags: List[FacetCount]
+    allergens: List[FacetCount]
+    prices: List[PriceFacet]
+
+class CatalogTombstone(BaseModel):
+    """Producto o categoría eliminada"""
+    table: Literal["categories", "products"]
+    id: UUID
+    deleted_at: datetime
+
+class CatalogChangesResponse(BaseModel):
+    categories: List[CategoryResponse]
+    products: List[ProductResponse]
+    deleted: List[CatalogTombstone]
+    has_more: bool
+    next_since: str
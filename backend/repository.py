@@ -0,0 +1,252 @@
+"""
+Capa de acceso a datos asíncrona sobre el cliente de Supabase.
+
+El cliente de Supabase es síncrono: cada `execute()` es una llamada HTTP
+bloqueante. Los routers no lo llaman directamente sino a través de
+`execute()`, que lo corre en un pool de hilos de tamaño explícito para que
+el event loop de uvicorn siga atendiendo otras peticiones mientras tanto.
+"""
+import asyncio
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Set
+
+from postgrest.exceptions import APIError
+from supabase import Client
+
+import admission
+import metrics
+
+# Llamadas simultáneas a Supabase por proceso
+SUPABASE_MAX_WORKERS = int(os.getenv("SUPABASE_MAX_WORKERS", "16"))
+
+# "checked" (por defecto): verificar slug, SKU y categoría antes de escribir;
+# un POST hace 4 llamadas a Supabase y un PUT 5.
+# "constraints": escribir directo y dejar que las restricciones de la base
+# (sql/002) rechacen los conflictos, en una sola llamada; requiere esa
+# migración aplicada.
+CATALOG_WRITE_MODE = os.getenv("CATALOG_WRITE_MODE", "checked").lower()
+WRITE_PRECHECKS = CATALOG_WRITE_MODE != "constraints"
+
+# Columnas de producto con su categoría embebida
+PRODUCT_SELECT = "*, category:categories(id, name, slug)"
+
+# Columnas de precio, una por nivel de cliente (solo mayorista es obligatoria)
+PRICE_TIERS = ("price_retail", "price_wholesale", "price_gym", "price_cafeteria", "price_store")
+
+# Columnas que retorna la actualización de stock en lote
+STOCK_COLUMNS = "id, sku, stock_quantity, updated_at"
+
+# PostgREST responde con este código si la función RPC no existe
+FUNCTION_NOT_FOUND = "PGRST202"
+
+# Códigos SQLSTATE de PostgreSQL que llegan en APIError.code
+UNIQUE_VIOLATION = "23505"
+FOREIGN_KEY_VIOLATION = "23503"
+# Columna inexistente: falta aplicar una migración de sql/
+UNDEFINED_COLUMN = "42703"
+# Tabla inexistente, según PostgreSQL o según la caché de esquema de PostgREST
+UNDEFINED_TABLE = ("42P01", "PGRST205")
+
+_executor = ThreadPoolExecutor(
+    max_workers=SUPABASE_MAX_WORKERS,
+    thread_name_prefix="supabase",
+)
+
+async def execute(query) -> Any:
+    """
+    Ejecuta una query de Supabase en el pool sin bloquear el event loop.
+    
+    La llamada se anota en las métricas de la petición en curso (cantidad y
+    tiempo de espera, incluida la espera de su lugar).
+    
+    Antes espera un lugar en `admission.upstream_slots` (SUPABASE_MAX_WORKERS
+    en vuelo, primero las clases de ruta favorecidas); lanza
+    `admission.Overloaded` (503) si la petición vence su plazo esperando.
+    """
+    loop = asyncio.get_running_loop()
+    stats = metrics.current()
+    if stats is None:
+        async with admission.upstream_slot():
+            return await loop.run_in_executor(_executor, query.execute)
+    stats.call_started()
+    try:
+        async with admission.upstream_slot():
+            return await loop.run_in_executor(_executor, query.execute)
+    finally:
+        stats.call_finished()
+
+async def fetch_product(supabase: Client, product_id: str, columns: str = PRODUCT_SELECT) -> Optional[dict]:
+    """
+    Retorna el producto con su categoría (o solo `columns`), o None si no existe.
+    """
+    response = await execute(
+        supabase.table("products").select(columns).eq("id", product_id)
+    )
+    return response.data[0] if response.data else None
+
+async def row_exists(supabase: Client, table: str, row_id: str) -> bool:
+    """
+    Indica si existe una fila con ese ID en la tabla.
+    """
+    response = await execute(
+        supabase.table(table).select("id").eq("id", str(row_id)).limit(1)
+    )
+    return bool(response.data)
+
+async def value_taken(
+    supabase: Client,
+    table: str,
+    column: str,
+    value: Any,
+    exclude_id: Optional[str] = None,
+) -> bool:
+    """
+    Indica si otra fila de la tabla ya usa ese valor en una columna única.
+    """
+    query = supabase.table(table).select("id").eq(column, value)
+    if exclude_id:
+        query = query.neq("id", exclude_id)
+    response = await execute(query.limit(1))
+    return bool(response.data)
+
+async def iter_rows(
+    supabase: Client,
+    table: str,
+    columns: str = "*",
+    chunk_size: int = 1000,
+    prepare: Optional[Callable[[Any], Any]] = None,
+) -> AsyncIterator[List[dict]]:
+    """
+    Recorre una tabla completa en bloques ordenados por id (keyset), de modo
+    que la memoria usada no depende del tamaño de la tabla. Termina con un
+    bloque vacío y no con uno corto porque Supabase puede limitar las filas
+    por respuesta (max-rows) por debajo de `chunk_size`.
+    
+    - **prepare**: función opcional que agrega filtros a cada query
+    """
+    last_id = None
+    while True:
+        query = supabase.table(table).select(columns)
+        if prepare is not None:
+            query = prepare(query)
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        response = await execute(query.order("id").limit(chunk_size))
+        rows = response.data or []
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1]["id"]
+
+async def rows_with_values(
+    supabase: Client,
+    table: str,
+    column: str,
+    values: Iterable[Any],
+    columns: str = "*",
+    batch_size: int = 100,
+) -> List[dict]:
+    """
+    Filas cuya columna toma alguno de los valores. Consulta con `in` en
+    lotes concurrentes para no exceder el largo máximo de la URL.
+    """
+    values = list(dict.fromkeys(str(value) for value in values if value is not None))
+    if not values:
+        return []
+    responses = await asyncio.gather(*(
+        execute(supabase.table(table).select(columns).in_(column, values[start:start + batch_size]))
+        for start in range(0, len(values), batch_size)
+    ))
+    return [row for response in responses for row in response.data or []]
+
+async def existing_values(
+    supabase: Client,
+    table: str,
+    column: str,
+    values: Iterable[Any],
+) -> Set[str]:
+    """
+    Cuáles de los valores ya existen en la columna.
+    """
+    rows = await rows_with_values(supabase, table, column, values, columns=column)
+    return {str(row[column]) for row in rows}
+
+def violated_column(error: APIError) -> Optional[str]:
+    """
+    Columna de la restricción violada según el detalle de PostgreSQL,
+    p. ej. "Key (slug)=(barra) already exists." -> "slug".
+    """
+    match = re.search(r"Key \((\w+)\)", error.details or "")
+    return match.group(1) if match else None
+
+def returning(query, columns: str):
+    """
+    Limita las columnas que retorna un insert/update/delete (por defecto
+    PostgREST devuelve la fila completa).
+    """
+    query.params = query.params.set("select", columns)
+    return query
+
+async def update_stock_batch(supabase: Client, items: List[dict]) -> List[dict]:
+    """
+    Aplica una lista de `{"product_id" | "sku", "new_stock"}` y retorna las
+    filas actualizadas (STOCK_COLUMNS).
+    
+    Usa la función `update_product_stock_batch` (sql/001) en una sola
+    llamada; si aún no está instalada, agrupa los productos por stock nuevo
+    y hace un PATCH por grupo.
+    """
+    try:
+        response = await execute(supabase.rpc("update_product_stock_batch", {"items": items}))
+        return response.data or []
+    except APIError as e:
+        if e.code != FUNCTION_NOT_FOUND:
+            raise
+
+    skus = [item["sku"] for item in items if not item.get("product_id")]
+    ids_by_sku = {
+        row["sku"]: row["id"]
+        for row in await rows_with_values(supabase, "products", "sku", skus, columns="id, sku")
+    }
+    # Si un producto aparece dos veces gana el último valor, como en el UPDATE
+    new_stock = {}
+    for item in items:
+        product_id = item.get("product_id") or ids_by_sku.get(item["sku"])
+        if product_id:
+            new_stock[str(product_id)] = item["new_stock"]
+    groups: Dict[int, List[str]] = {}
+    for product_id, stock in new_stock.items():
+        groups.setdefault(stock, []).append(product_id)
+
+    batch_size = 100
+    responses = await asyncio.gather(*(
+        execute(returning(
+            supabase.table("products")
+            .update({"stock_quantity": stock})
+            .in_("id", product_ids[start:start + batch_size]),
+            STOCK_COLUMNS,
+        ))
+        for stock, product_ids in groups.items()
+        for start in range(0, len(product_ids), batch_size)
+    ))
+    return [row for response in responses for row in response.data or []]
+
+async def adjust_stock(supabase: Client, items: List[dict], enforce_order_limits: bool) -> Optional[Dict[str, Any]]:
+    """
+    Aplica una lista de `{"product_id" | "sku", "delta"}` todo o nada con la
+    función `adjust_product_stock` (sql/006), en una sola llamada. Retorna
+    `{"updated": [...], "rejected": [...]}`, o None si la función no está
+    instalada: sin ella no hay forma atómica de hacerlo.
+    """
+    try:
+        response = await execute(supabase.rpc("adjust_product_stock", {
+            "items": items,
+            "p_enforce_order_limits": enforce_order_limits,
+        }))
+    except APIError as e:
+        if e.code != FUNCTION_NOT_FOUND:
+            raise
+        return None
+    return response.data
@@ -1,60 +1,179 @@
-from fastapi import APIRouter, HTTPException, Depends, status
-from typing import List
+from fastapi import APIRouter, HTTPException, Depends, status, Query, Request
+from typing import List, Union
 from database import get_supabase_client
-from models import CategoryResponse, CategoryCreate
+from models import CategoryResponse, CategoryWithCounts, CategoryCreate
 from supabase import Client
+from postgrest.exceptions import APIError
+from cache import catalog_cache, category_tag, CATEGORY_LISTS, PRODUCT_LISTS
+from http_cache import RenderedBody, render, catalog_response
+from single_flight import catalog_reads
+import catalog_events
+import repository
+import asyncio
 
 router = APIRouter(prefix="/categories", tags=["categories"])
 
-@router.get("/", response_model=List[CategoryResponse])
+# Conteos de productos en la misma consulta: PostgREST los agrega en la base
+# (count de los productos embebidos) sin enviar sus filas
+COUNTS_SELECT = "*, products(count), active_products:products(count)"
+
+def slug_conflict(category: CategoryCreate, article: str = "una") -> HTTPException:
+    return HTTPException(
+        status_code=400,
+        detail=f"Ya existe {article} categoría con el slug '{category.slug}'"
+    )
+
+def select_categories(supabase: Client, include_counts: bool):
+    """
+    Query de categorías, con `products(count)` si se piden los conteos.
+    """
+    if not include_counts:
+        return supabase.table("categories").select("*")
+    return supabase.table("categories").select(COUNTS_SELECT).eq("active_products.is_active", True)
+
+def with_counts(category: dict) -> dict:
+    """
+    Aplana los conteos embebidos ([{"count": n}]) en product_count y
+    active_product_count.
+    """
+    for embedded, field in (("products", "product_count"), ("active_products", "active_product_count")):
+        counts = category.pop(embedded, None)
+        if counts is not None:
+            category[field] = counts[0]["count"] if counts else 0
+    return category
+
+async def count_products(supabase: Client, category_id: str) -> int:
+    """
+    Productos de la categoría, contados en la base sin traer sus filas.
+    """
+    response = await repository.execute(
+        supabase.table("products").select("id", count="exact").eq("category_id", category_id).limit(1)
+    )
+    return response.count or 0
+
+def products_in_use_error(count: int) -> HTTPException:
+    """
+    400 al eliminar una categoría con productos, con cuántos son.
+    """
+    return HTTPException(
+        status_code=400,
+        detail=f"No se puede eliminar la categoría porque tiene {count} productos asociados"
+    )
+
+async def load_categories(
+    supabase: Client,
+    cache_key: tuple,
+    generation: int,
+    active_only: bool,
+    include_counts: bool = False,
+) -> RenderedBody:
+    """
+    Consulta y serializa el listado de categorías y lo guarda en la caché.
+    """
+    query = select_categories(supabase, include_counts)
+    
+    if active_only:
+        query = query.eq("is_active", True)
+    
+    query = query.order("name")
+    
+    response = await repository.execute(query)
+    categories = [with_counts(category) for category in response.data or []]
+    
+    # Sin include_counts la respuesta no lleva los campos de conteo
+    rendered = render(List[CategoryWithCounts] if include_counts else List[CategoryResponse], categories, trusted=True)
+    # Los conteos cambian con cada producto creado, editado o eliminado
+    tags = (CATEGORY_LISTS, PRODUCT_LISTS) if include_counts else (CATEGORY_LISTS,)
+    catalog_cache.set(cache_key, rendered, tags=tags, generation=generation)
+    return rendered
+
+async def load_category(
+    supabase: Client,
+    cache_key: tuple,
+    generation: int,
+    category_id: str,
+    include_counts: bool = False,
+) -> RenderedBody:
+    """
+    Consulta y serializa una categoría y la guarda en la caché; 404 si no existe.
+    """
+    response = await repository.execute(
+        select_categories(supabase, include_counts).eq("id", category_id)
+    )
+    
+    if not response.data:
+        raise HTTPException(
+            status_code=404, 
+            detail="Categoría no encontrada"
+        )
+    
+    rendered = render(CategoryWithCounts if include_counts else CategoryResponse, with_counts(response.data[0]), trusted=True)
+    tags = (category_tag(category_id), PRODUCT_LISTS) if include_counts else (category_tag(category_id),)
+    catalog_cache.set(cache_key, rendered, tags=tags, generation=generation)
+    return rendered
+
+@router.get("/", response_model=Union[List[CategoryWithCounts], List[CategoryResponse]])
 async def get_categories(
+    request: Request,
     active_only: bool = True,
+    include_counts: bool = Query(False, description="Incluir product_count y active_product_count"),
     supabase: Client = Depends(get_supabase_client)
 ):
     """
     Obtiene todas las categorías de productos.
     
     - **active_only**: Si es True, solo retorna categorías activas
+    - **include_counts**: agrega a cada categoría cuántos productos tiene y
+      cuántos están activos, calculados por la base en la misma consulta
+    
+    Responde con ETag; si `If-None-Match` coincide retorna 304 sin cuerpo.
     """
+    cache_key = catalog_cache.make_key("categories:list", active_only=active_only, include_counts=include_counts)
+    cached = catalog_cache.get(cache_key)
+    if cached is not None:
+        return catalog_response(request, cached)
+    generation = catalog_cache.generation
+    
     try:
-        query = supabase.table("categories").select("*")
-        
-        if active_only:
-            query = query.eq("is_active", True)
-        
-        query = query.order("name")
-        
-        response = query.execute()
-        
-        if response.data is None:
-            return []
-            
-        return response.data
+        # Peticiones idénticas simultáneas comparten la misma consulta
+        rendered = await catalog_reads.run(
+            (cache_key, generation),
+            lambda: load_categories(supabase, cache_key, generation, active_only, include_counts)
+        )
+        return catalog_response(request, rendered)
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500, 
             detail=f"Error al obtener categorías: {str(e)}"
         )
 
-@router.get("/{category_id}", response_model=CategoryResponse)
+@router.get("/{category_id}", response_model=Union[CategoryWithCounts, CategoryResponse])
 async def get_category(
+    request: Request,
     category_id: str,
+    include_counts: bool = Query(False, description="Incluir product_count y active_product_count"),
     supabase: Client = Depends(get_supabase_client)
 ):
     """
     Obtiene una categoría específica por ID.
+    
+    Responde con ETag; si `If-None-Match` coincide retorna 304 sin cuerpo.
     """
+    cache_key = catalog_cache.make_key("categories:detail", category_id=category_id, include_counts=include_counts)
+    cached = catalog_cache.get(cache_key)
+    if cached is not None:
+        return catalog_response(request, cached)
+    generation = catalog_cache.generation
+    
     try:
-        response = supabase.table("categories").select("*").eq("id", category_id).execute()
-        
-        if not response.data:
-            raise HTTPException(
-                status_code=404, 
-                detail="Categoría no encontrada"
-            )
-        
-        return response.data[0]
+        rendered = await catalog_reads.run(
+            (cache_key, generation),
+            lambda: load_category(supabase, cache_key, generation, category_id, include_counts)
+        )
+        return catalog_response(request, rendered)
         
     except HTTPException:
         raise
@@ -74,15 +193,19 @@ async def create_category(
     """
     try:
         # Verificar que el slug no exista
-        existing = supabase.table("categories").select("id").eq("slug", category.slug).execute()
-        if existing.data:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Ya existe una categoría con el slug '{category.slug}'"
-            )
+        if repository.WRITE_PRECHECKS:
+            if await repository.value_taken(supabase, "categories", "slug", category.slug):
+                raise slug_conflict(category)
         
         # Crear la categoría
-        response = supabase.table("categories").insert(category.dict()).execute()
+        try:
+            response = await repository.execute(
+                supabase.table("categories").insert(category.model_dump(mode="json"))
+            )
+        except APIError as e:
+            if e.code == repository.UNIQUE_VIOLATION:
+                raise slug_conflict(category)
+            raise
         
         if not response.data:
             raise HTTPException(
@@ -90,6 +213,8 @@ async def create_category(
                 detail="Error al crear la categoría"
             )
         
+        catalog_events.category_created(response.data[0]["id"])
+        
         return response.data[0]
         
     except HTTPException:
@@ -110,31 +235,41 @@ async def update_category(
     Actualiza una categoría existente.
     """
     try:
-        # Verificar que la categoría existe
-        existing = supabase.table("categories").select("id").eq("id", category_id).execute()
-        if not existing.data:
-            raise HTTPException(
-                status_code=404,
-                detail="Categoría no encontrada"
-            )
-        
-        # Verificar que el slug no esté en uso por otra categoría
-        slug_check = supabase.table("categories").select("id").eq("slug", category.slug).neq("id", category_id).execute()
-        if slug_check.data:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Ya existe otra categoría con el slug '{category.slug}'"
+        if repository.WRITE_PRECHECKS:
+            # Verificar existencia y slug en paralelo
+            exists, slug_taken = await asyncio.gather(
+                repository.row_exists(supabase, "categories", category_id),
+                repository.value_taken(supabase, "categories", "slug", category.slug, category_id)
             )
+            if not exists:
+                raise HTTPException(
+                    status_code=404,
+                    detail="Categoría no encontrada"
+                )
+            
+            # Verificar que el slug no esté en uso por otra categoría
+            if slug_taken:
+                raise slug_conflict(category, "otra")
         
         # Actualizar la categoría
-        response = supabase.table("categories").update(category.dict()).eq("id", category_id).execute()
+        try:
+            response = await repository.execute(
+                supabase.table("categories").update(category.model_dump(mode="json")).eq("id", category_id)
+            )
+        except APIError as e:
+            if e.code == repository.UNIQUE_VIOLATION:
+                raise slug_conflict(category, "otra")
+            raise
         
+        # Ninguna fila actualizada: la categoría no existe
         if not response.data:
             raise HTTPException(
-                status_code=500,
-                detail="Error al actualizar la categoría"
+                status_code=404,
+                detail="Categoría no encontrada"
             )
         
+        catalog_events.category_written(category_id)
+        
         return response.data[0]
         
     except HTTPException:
@@ -155,31 +290,42 @@ async def delete_category(
     Nota: Solo se puede eliminar si no tiene productos asociados.
     """
     try:
-        # Verificar que la categoría existe
-        existing = supabase.table("categories").select("id").eq("id", category_id).execute()
-        if not existing.data:
-            raise HTTPException(
-                status_code=404,
-                detail="Categoría no encontrada"
-            )
-        
-        # Verificar que no tenga productos asociados
-        products = supabase.table("products").select("id").eq("category_id", category_id).execute()
-        if products.data:
-            raise HTTPException(
-                status_code=400,
-                detail=f"No se puede eliminar la categoría porque tiene {len(products.data)} productos asociados"
+        if repository.WRITE_PRECHECKS:
+            # Verificar existencia y contar productos asociados en paralelo
+            exists, product_count = await asyncio.gather(
+                repository.row_exists(supabase, "categories", category_id),
+                count_products(supabase, category_id)
             )
+            if not exists:
+                raise HTTPException(
+                    status_code=404,
+                    detail="Categoría no encontrada"
+                )
+            
+            # Verificar que no tenga productos asociados
+            if product_count:
+                raise products_in_use_error(product_count)
         
-        # Eliminar la categoría
-        response = supabase.table("categories").delete().eq("id", category_id).execute()
+        # Eliminar la categoría; la llave foránea (ON DELETE RESTRICT) la
+        # protege si tiene productos
+        try:
+            response = await repository.execute(repository.returning(
+                supabase.table("categories").delete().eq("id", category_id),
+                "id"
+            ))
+        except APIError as e:
+            if e.code == repository.FOREIGN_KEY_VIOLATION:
+                raise products_in_use_error(await count_products(supabase, category_id))
+            raise
         
         if not response.data:
             raise HTTPException(
-                status_code=500,
-                detail="Error al eliminar la categoría"
+                status_code=404,
+                detail="Categoría no encontrada"
             )
         
+        catalog_events.category_deleted(category_id)
+        
         return None
         
     except HTTPException:
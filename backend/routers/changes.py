@@ -0,0 +1,55 @@
+from fastapi import APIRouter, HTTPException, Depends, Query
+from typing import Optional
+from database import get_supabase_client
+from models import CatalogChangesResponse
+from supabase import Client
+import catalog_changes
+
+router = APIRouter(prefix="/changes", tags=["changes"])
+
+@router.get("/", response_model=CatalogChangesResponse)
+async def get_catalog_changes(
+    since: Optional[str] = Query(None, description="`next_since` de la consulta anterior; sin él, todo el catálogo"),
+    limit: int = Query(500, ge=1, le=1000, description="Máximo de filas de cada tipo (categorías, productos, eliminados)"),
+    supabase: Client = Depends(get_supabase_client)
+):
+    """
+    Categorías y productos creados o modificados desde `since`, y en
+    `deleted` los eliminados, para mantener una copia local del catálogo.
+    
+    La primera vez (sin `since`) retorna todo el catálogo. Cada respuesta
+    trae `next_since` para la consulta siguiente; mientras `has_more` sea
+    true hay más cambios y conviene consultar de nuevo enseguida. Aplicar
+    en orden: categorías, productos y al final `deleted`. Un mismo cambio
+    puede llegar más de una vez, y una eliminación de algo que el cliente
+    nunca recibió se ignora.
+    
+    Los productos no traen la categoría embebida: se toma de `categories`
+    por `category_id`. Requiere sql/007.
+    """
+    try:
+        positions = None
+        if since is not None:
+            try:
+                positions = catalog_changes.decode_cursor(since)
+            except (ValueError, TypeError):
+                raise HTTPException(
+                    status_code=400,
+                    detail="`since` inválido: use el `next_since` de la consulta anterior"
+                )
+        
+        result = await catalog_changes.fetch_changes(supabase, positions, limit)
+        if result is None:
+            raise HTTPException(
+                status_code=501,
+                detail="La sincronización de cambios requiere la migración sql/007_catalog_changes.sql"
+            )
+        return result
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error al obtener cambios del catálogo: {str(e)}"
+        )
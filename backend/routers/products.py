@@ -1,101 +1,711 @@
-from fastapi import APIRouter, HTTPException, Depends, status, Query
-from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Depends, status, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from typing import AsyncIterator, Dict, List, Literal, Optional
+from datetime import datetime
+from uuid import UUID
 from database import get_supabase_client
-from models import ProductResponse, ProductCreate, ProductsListResponse
+from models import (
+    ProductResponse, ProductCreate, ProductsListResponse, ProductImportReport,
+    StockBatchUpdate, StockBatchUpdateResponse, ProductBatchLookup, ProductBatchResponse,
+    StockAdjustment, StockAdjustmentResponse,
+    ProductFacetsResponse, LowStockResponse,
+)
 from supabase import Client
+from postgrest.exceptions import APIError
+from repository import PRODUCT_SELECT
+from cache import catalog_cache, product_tag, category_tag, PRODUCT_LISTS
+from http_cache import RenderedBody, render, catalog_response, dumps
+from single_flight import catalog_reads
+from search import search_index
+import bulk_export
+import bulk_import
+import facets
+import fieldsets
+import low_stock
+import catalog_events
+import repository
+import asyncio
+import base64
+import json
 import math
 
 router = APIRouter(prefix="/products", tags=["products"])
 
+CountMode = Literal["exact", "planned", "estimated"]
+ImportFormat = Literal["csv", "ndjson"]
+ExportFormat = Literal["ndjson", "csv"]
+PriceTier = Literal["retail", "wholesale", "gym", "cafeteria", "store"]
+ProductSort = Literal["newest", "price_asc", "price_desc"]
+
+# Ordenamientos por precio: si son descendentes
+PRICE_SORTS = {"price_asc": False, "price_desc": True}
+
+IMPORT_CONTENT_TYPES = {
+    "text/csv": "csv",
+    "application/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+}
+
+def apply_product_filters(
+    query,
+    category_id: Optional[str] = None,
+    search: Optional[str] = None,
+    active_only: bool = True,
+    featured_only: bool = False,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    price_tier: str = "price_wholesale",
+):
+    """
+    Aplica los filtros del listado de productos a una query de Supabase.
+    El rango de precio se aplica a la columna `price_tier`.
+    """
+    if active_only:
+        query = query.eq("is_active", True)
+        
+    if featured_only:
+        query = query.eq("is_featured", True)
+        
+    if category_id:
+        query = query.eq("category_id", category_id)
+        
+    # Una búsqueda en blanco no filtra
+    if search and search.strip():
+        query = query.or_(f"name.ilike.%{search}%,description.ilike.%{search}%")
+        
+    if min_price is not None:
+        query = query.gte(price_tier, min_price)
+        
+    if max_price is not None:
+        query = query.lte(price_tier, max_price)
+    
+    return query
+
+def apply_sort(query, sort: Optional[str], price_tier: str):
+    """
+    Ordena el listado: por más recientes o por el precio de `price_tier`,
+    siempre con id como desempate. Ordenar por precio deja fuera los
+    productos sin precio en ese nivel; así la query recorre el índice
+    parcial del nivel (sql/004) aunque el nivel tenga pocos precios.
+    """
+    if sort in PRICE_SORTS:
+        desc = PRICE_SORTS[sort]
+        query = query.not_.is_(price_tier, "null")
+        return query.order(price_tier, desc=desc).order("id", desc=desc)
+    return query.order("created_at", desc=True).order("id", desc=True)
+
+def encode_cursor(product: dict, sort: Optional[str] = None, price_tier: str = "price_wholesale") -> str:
+    """
+    Cursor opaco con la posición del último producto entregado: (created_at, id)
+    o, ordenando por precio, el orden, el nivel y (precio, id).
+    """
+    if sort in PRICE_SORTS:
+        position = [sort, price_tier, product[price_tier], product["id"]]
+    else:
+        position = [product["created_at"], product["id"]]
+    raw = json.dumps(position).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> list:
+    """
+    Decodifica un cursor de `encode_cursor`; lanza 400 si no es válido.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded))
+        if not isinstance(position, list) or len(position) not in (2, 4):
+            raise ValueError(cursor)
+        # Los valores van dentro de un filtro `or` de PostgREST: solo fechas,
+        # precios, ids y los órdenes y niveles conocidos
+        if len(position) == 2:
+            created_at, product_id = position
+            datetime.fromisoformat(created_at)
+        else:
+            sort, price_tier, price, product_id = position
+            if sort not in PRICE_SORTS or price_tier not in repository.PRICE_TIERS:
+                raise ValueError(cursor)
+            if isinstance(price, bool) or not isinstance(price, (int, float)):
+                raise ValueError(cursor)
+        UUID(product_id)
+        return position
+    except (ValueError, TypeError, AttributeError):
+        raise HTTPException(
+            status_code=400,
+            detail="Cursor de paginación inválido"
+        )
+
+def apply_cursor(query, cursor: str, sort: Optional[str] = None, price_tier: str = "price_wholesale"):
+    """
+    Keyset: filas estrictamente posteriores al cursor en el orden de `apply_sort`.
+    El cursor solo vale para el mismo orden y nivel de precio con que se generó.
+    """
+    position = decode_cursor(cursor)
+    if sort in PRICE_SORTS:
+        if len(position) != 4 or position[:2] != [sort, price_tier] or not isinstance(position[2], (int, float)):
+            raise HTTPException(
+                status_code=400,
+                detail="El cursor no corresponde a este orden o nivel de precio"
+            )
+        _, _, price, product_id = position
+        after = "lt" if PRICE_SORTS[sort] else "gt"
+        return query.or_(
+            f"{price_tier}.{after}.{price},"
+            f"and({price_tier}.eq.{price},id.{after}.{product_id})"
+        )
+    if len(position) != 2:
+        raise HTTPException(
+            status_code=400,
+            detail="El cursor no corresponde a este orden o nivel de precio"
+        )
+    created_at, product_id = position
+    return query.or_(
+        f'created_at.lt."{created_at}",'
+        f'and(created_at.eq."{created_at}",id.lt.{product_id})'
+    )
+
+async def search_product_page(
+    supabase: Client,
+    filters: dict,
+    offset: int,
+    per_page: int,
+    sort: Optional[str] = None,
+    columns: str = PRODUCT_SELECT,
+) -> tuple:
+    """
+    Página de resultados del índice de búsqueda, ordenada por relevancia
+    (o por `sort`).
+    
+    El índice resuelve términos y filtros en memoria; de Supabase solo se
+    traen los productos de la página (una query por id), volviendo a aplicar
+    los filtros por si el índice quedó atrasado respecto a otro worker.
+    """
+    await search_index.ensure_fresh(supabase)
+    index_filters = {name: value for name, value in filters.items() if name != "search"}
+    ranked, total = search_index.search(filters["search"], limit=offset + per_page, sort=sort, **index_filters)
+    page_ids = ranked[offset:]
+    if not page_ids:
+        return [], total
+    
+    query = supabase.table("products").select(columns).in_("id", page_ids)
+    response = await repository.execute(apply_product_filters(query, **index_filters))
+    by_id = {row["id"]: row for row in response.data or []}
+    return [by_id[product_id] for product_id in page_ids if product_id in by_id], total
+
+async def iter_product_chunks(
+    supabase: Client,
+    filters: dict,
+    columns: str,
+    chunk_size: int,
+) -> AsyncIterator[List[dict]]:
+    """
+    Todos los productos que cumplen los filtros del listado, en bloques.
+
+    Sin búsqueda recorre la tabla por id (keyset); con búsqueda usa el orden
+    de relevancia del índice y trae los productos por lotes de IDs.
+    """
+    if not search_index.handles(filters["search"]):
+        async for rows in repository.iter_rows(
+            supabase, "products", columns, chunk_size,
+            prepare=lambda query: apply_product_filters(query, **filters)
+        ):
+            yield rows
+        return
+
+    await search_index.ensure_fresh(supabase)
+    index_filters = {name: value for name, value in filters.items() if name != "search"}
+    ranked, _ = search_index.search(filters["search"], **index_filters)
+    # Lotes chicos: los IDs van en la URL
+    batch_size = min(chunk_size, 100)
+    for start in range(0, len(ranked), batch_size):
+        ids = ranked[start:start + batch_size]
+        query = supabase.table("products").select(columns).in_("id", ids)
+        response = await repository.execute(apply_product_filters(query, **index_filters))
+        by_id = {row["id"]: row for row in response.data or []}
+        yield [by_id[product_id] for product_id in ids if product_id in by_id]
+
+def product_conflict(column: str, product: ProductCreate, exclude_id: Optional[str] = None) -> HTTPException:
+    """
+    Error 400 por slug/SKU repetido o categoría inexistente.
+    """
+    article = "otro" if exclude_id else "un"
+    if column == "category_id":
+        return HTTPException(
+            status_code=400,
+            detail="La categoría especificada no existe"
+        )
+    label = "SKU" if column == "sku" else "slug"
+    return HTTPException(
+        status_code=400,
+        detail=f"Ya existe {article} producto con el {label} '{getattr(product, column)}'"
+    )
+
+async def check_product_conflicts(
+    supabase: Client,
+    product: ProductCreate,
+    exclude_id: Optional[str] = None,
+):
+    """
+    Verifica en paralelo que el slug y el SKU estén libres y que la categoría
+    exista; lanza 400 con el primer conflicto encontrado.
+    """
+    checks = {}
+    if product.slug:
+        checks["slug"] = repository.value_taken(supabase, "products", "slug", product.slug, exclude_id)
+    if product.sku:
+        checks["sku"] = repository.value_taken(supabase, "products", "sku", product.sku, exclude_id)
+    if product.category_id:
+        checks["category_id"] = repository.row_exists(supabase, "categories", product.category_id)
+    results = dict(zip(checks, await asyncio.gather(*checks.values())))
+    
+    if results.get("slug"):
+        raise product_conflict("slug", product, exclude_id)
+    
+    if results.get("sku"):
+        raise product_conflict("sku", product, exclude_id)
+    
+    if not results.get("category_id", True):
+        raise product_conflict("category_id", product, exclude_id)
+
+def constraint_error(error: APIError, product: ProductCreate, exclude_id: Optional[str] = None) -> Exception:
+    """
+    Traduce una violación de restricción de la base al mismo 400 que daría
+    `check_product_conflicts`; cualquier otro error se retorna tal cual.
+    """
+    if error.code == repository.UNIQUE_VIOLATION:
+        column = repository.violated_column(error)
+        return product_conflict("sku" if column == "sku" else "slug", product, exclude_id)
+    if error.code == repository.FOREIGN_KEY_VIOLATION:
+        return product_conflict("category_id", product, exclude_id)
+    return error
+
+async def load_product_page(
+    supabase: Client,
+    cache_key: tuple,
+    generation: int,
+    filters: dict,
+    page: int,
+    per_page: int,
+    count_mode: str,
+    cursor: Optional[str],
+    sort: Optional[str] = None,
+    fields: Optional[tuple] = None,
+) -> RenderedBody:
+    """
+    Consulta y serializa una página del listado de productos y la guarda en
+    la caché (si no hubo escrituras desde `generation`). Con `fields` solo
+    se piden y se retornan esos campos.
+    """
+    search = filters["search"]
+    next_cursor = None
+    # El cursor necesita la posición del último producto aunque no se retorne
+    columns = fieldsets.select_columns(fields, "created_at", filters["price_tier"])
+    if search_index.handles(search):
+        if cursor:
+            raise HTTPException(
+                status_code=400,
+                detail="La búsqueda pagina con `page`; no admite `cursor`"
+            )
+        products, total = await search_product_page(supabase, filters, (page - 1) * per_page, per_page, sort, columns)
+    else:
+        # El total llega en el header Content-Range de la misma respuesta
+        query = supabase.table("products").select(columns, count=count_mode)
+        query = apply_product_filters(query, **filters)
+        
+        # Aplicar paginación: se pide una fila extra para saber si hay más
+        offset = 0 if cursor else (page - 1) * per_page
+        if cursor:
+            query = apply_cursor(query, cursor, sort, filters["price_tier"])
+        query = apply_sort(query, sort, filters["price_tier"])
+        query = query.range(offset, offset + per_page)
+        
+        try:
+            response = await repository.execute(query)
+            products = response.data if response.data else []
+            total = response.count if response.count is not None else offset + len(products)
+        except APIError as e:
+            # PostgREST responde 416 cuando la página pedida está fuera de rango
+            if e.code != "PGRST103":
+                raise
+            products = []
+            count_query = supabase.table("products").select("id", count=count_mode).limit(1)
+            if sort in PRICE_SORTS:
+                count_query = count_query.not_.is_(filters["price_tier"], "null")
+            count_response = await repository.execute(apply_product_filters(count_query, **filters))
+            total = count_response.count or 0
+        
+        if len(products) > per_page:
+            products = products[:per_page]
+            next_cursor = encode_cursor(products[-1], sort, filters["price_tier"])
+    
+    total_pages = math.ceil(total / per_page)
+    
+    rendered = render(fieldsets.list_model(fields), {
+        "products": products,
+        "total": total,
+        "page": page,
+        "per_page": per_page,
+        "total_pages": total_pages,
+        "next_cursor": next_cursor,
+    }, trusted=True)
+    catalog_cache.set(cache_key, rendered, tags=(PRODUCT_LISTS,), generation=generation)
+    return rendered
+
 @router.get("/", response_model=ProductsListResponse)
 async def get_products(
+    request: Request,
     page: int = Query(1, ge=1, description="Número de página"),
     per_page: int = Query(20, ge=1, le=100, description="Productos por página"),
     category_id: Optional[str] = Query(None, description="Filtrar por categoría"),
-    search: Optional[str] = Query(None, description="Buscar por nombre o descripción"),
+    search: Optional[str] = Query(None, description="Buscar por nombre, descripción, tags, ingredientes o SKU"),
     active_only: bool = Query(True, description="Solo productos activos"),
     featured_only: bool = Query(False, description="Solo productos destacados"),
     min_price: Optional[float] = Query(None, ge=0, description="Precio mínimo"),
     max_price: Optional[float] = Query(None, ge=0, description="Precio máximo"),
+    price_tier: PriceTier = Query("wholesale", description="Nivel de precio al que se aplican min_price, max_price y el orden"),
+    count_mode: CountMode = Query("exact", description="Método de conteo del total: exact, planned o estimated"),
+    cursor: Optional[str] = Query(None, description="Cursor `next_cursor` de la respuesta anterior"),
+    sort: Optional[ProductSort] = Query(None, description="newest, price_asc o price_desc"),
+    fields: Optional[str] = Query(None, description="card, detail, admin o campos separados por coma"),
     supabase: Client = Depends(get_supabase_client)
 ):
     """
     Obtiene todos los productos con paginación y filtros.
+    
+    - **count_mode**: `exact` cuenta todas las filas; `planned` y `estimated`
+      usan las estadísticas de PostgreSQL y son más baratos en catálogos grandes
+    - **cursor**: continúa después del último producto de la página anterior
+      (paginación keyset); cuando se envía, `page` se ignora y `total` cuenta
+      los productos que quedan desde el cursor. Cada respuesta incluye
+      `next_cursor` mientras queden productos
+    - **search**: usa el índice en memoria (sin acentos, por prefijo) y ordena
+      por relevancia; pagina solo con `page`. Si solo tiene stopwords o
+      signos ("de la", "-") busca el texto con `ilike`; en blanco no filtra
+    - **price_tier**: nivel de precio (retail, wholesale, gym, cafeteria o
+      store) para `min_price`, `max_price` y el orden por precio
+    - **sort**: `newest` (por defecto sin búsqueda), `price_asc` o
+      `price_desc`; ordenar por precio lista solo los productos con precio
+      en ese nivel. Un cursor solo sirve con el mismo orden y nivel
+    - **fields**: solo esos campos de cada producto (siempre con `id`). Presets:
+      `card` (nombre, slug, precio de `price_tier`, imagen y stock), `detail`
+      (la ficha sin los datos internos) y `admin` (todos, por defecto)
+    
+    Responde con ETag; si `If-None-Match` coincide retorna 304 sin cuerpo.
     """
+    filters = dict(
+        category_id=category_id,
+        search=search,
+        active_only=active_only,
+        featured_only=featured_only,
+        min_price=min_price,
+        max_price=max_price,
+        price_tier=f"price_{price_tier}",
+    )
+    try:
+        fieldset = fieldsets.resolve(fields, filters["price_tier"])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    cache_key = catalog_cache.make_key(
+        "products:list",
+        page=None if cursor else page,
+        per_page=per_page,
+        count_mode=count_mode,
+        cursor=cursor,
+        sort=sort,
+        fields=fieldset,
+        **filters
+    )
+    cached = catalog_cache.get(cache_key)
+    if cached is not None:
+        return catalog_response(request, cached)
+    generation = catalog_cache.generation
+    
     try:
-        # Construir query base
-        query = supabase.table("products").select("""
-            *,
-            category:categories(id, name, slug)
-        """)
-        
-        # Aplicar filtros
-        if active_only:
-            query = query.eq("is_active", True)
-            
-        if featured_only:
-            query = query.eq("is_featured", True)
-            
-        if category_id:
-            query = query.eq("category_id", category_id)
-            
-        if search:
-            query = query.or_(f"name.ilike.%{search}%,description.ilike.%{search}%")
-            
-        if min_price is not None:
-            query = query.gte("price_wholesale", min_price)
-            
-        if max_price is not None:
-            query = query.lte("price_wholesale", max_price)
-        
-        # Contar total de productos (para paginación)
-        count_response = query.execute()
-        total = len(count_response.data) if count_response.data else 0
-        
-        # Aplicar paginación
-        offset = (page - 1) * per_page
-        query = query.order("created_at", desc=True).range(offset, offset + per_page - 1)
-        
-        response = query.execute()
-        
-        products = response.data if response.data else []
-        total_pages = math.ceil(total / per_page)
-        
-        return ProductsListResponse(
-            products=products,
-            total=total,
-            page=page,
-            per_page=per_page,
-            total_pages=total_pages
+        # Peticiones idénticas simultáneas comparten la misma consulta
+        rendered = await catalog_reads.run(
+            (cache_key, generation),
+            lambda: load_product_page(
+                supabase, cache_key, generation, filters, page, per_page, count_mode, cursor, sort, fieldset
+            )
         )
+        return catalog_response(request, rendered)
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Error al obtener productos: {str(e)}"
         )
 
+async def load_product_facets(
+    supabase: Client,
+    cache_key: tuple,
+    generation: int,
+    filters: dict,
+) -> RenderedBody:
+    """
+    Calcula y serializa las facetas y las guarda en la caché.
+    
+    La búsqueda con el índice en memoria no se puede delegar a la función
+    SQL (que buscaría con `ilike`): en ese caso se cuenta en una pasada
+    sobre los productos que encontró el índice.
+    """
+    raw = None
+    if not search_index.handles(filters["search"]):
+        raw = await facets.aggregate_in_database(supabase, filters)
+    if raw is None:
+        raw = await facets.aggregate(iter_product_chunks(supabase, filters, facets.FACET_COLUMNS, 1000))
+    rendered = render(ProductFacetsResponse, facets.facets_response(raw, facets.PRICE_FACET_EDGES), trusted=True)
+    catalog_cache.set(cache_key, rendered, tags=(PRODUCT_LISTS,), generation=generation)
+    return rendered
+
+@router.get("/facets", response_model=ProductFacetsResponse)
+async def get_product_facets(
+    request: Request,
+    category_id: Optional[str] = Query(None, description="Filtrar por categoría"),
+    search: Optional[str] = Query(None, description="Buscar por nombre, descripción, tags, ingredientes o SKU"),
+    active_only: bool = Query(True, description="Solo productos activos"),
+    featured_only: bool = Query(False, description="Solo productos destacados"),
+    min_price: Optional[float] = Query(None, ge=0, description="Precio mínimo"),
+    max_price: Optional[float] = Query(None, ge=0, description="Precio máximo"),
+    price_tier: PriceTier = Query("wholesale", description="Nivel de precio al que se aplican min_price, max_price y el orden"),
+    supabase: Client = Depends(get_supabase_client)
+):
+    """
+    Conteos para la barra de filtros con los mismos filtros del listado:
+    productos por categoría, tag y alérgeno (de mayor a menor) y, por cada
+    nivel de precio, mínimo, máximo y productos por rango (PRICE_FACET_EDGES).
+    
+    `min_price` y `max_price` filtran por el precio de `price_tier`.
+    
+    Se calcula en una sola consulta agregada (sql/004) y se guarda en la
+    caché del catálogo. Responde con ETag; si `If-None-Match` coincide
+    retorna 304 sin cuerpo.
+    """
+    filters = dict(
+        category_id=category_id,
+        search=search,
+        active_only=active_only,
+        featured_only=featured_only,
+        min_price=min_price,
+        max_price=max_price,
+        price_tier=f"price_{price_tier}",
+    )
+    cache_key = catalog_cache.make_key("products:facets", **filters)
+    cached = catalog_cache.get(cache_key)
+    if cached is not None:
+        return catalog_response(request, cached)
+    generation = catalog_cache.generation
+    
+    try:
+        rendered = await catalog_reads.run(
+            (cache_key, generation),
+            lambda: load_product_facets(supabase, cache_key, generation, filters)
+        )
+        return catalog_response(request, rendered)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error al obtener facetas: {str(e)}"
+        )
+
+@router.get("/low-stock", response_model=LowStockResponse)
+async def get_low_stock_products(
+    category_id: Optional[str] = Query(None, description="Filtrar por categoría"),
+    active_only: bool = Query(True, description="Solo productos activos"),
+    since: Optional[str] = Query(None, description="Solo cambios posteriores (`next_since` de la consulta anterior)"),
+    limit: int = Query(500, ge=1, le=1000, description="Máximo de productos en alerta (y de `restocked`) por respuesta"),
+    supabase: Client = Depends(get_supabase_client)
+):
+    """
+    Productos con stock igual o menor a su `min_stock_alert`, del que entró
+    en alerta hace más tiempo al más reciente, de a `limit`. Sin `since`,
+    `total` es la cantidad de alertas actuales; si `has_more` es true el
+    resto se pide con `since=next_since`.
+    
+    - **since**: para consultar periódicamente; retorna solo los productos
+      que entraron en alerta después y, en `restocked`, los que salieron.
+      Cada respuesta trae `next_since` para la consulta siguiente; mientras
+      `has_more` sea true conviene consultar de nuevo enseguida. También
+      acepta una fecha ISO. Un mismo cambio puede llegar más de una vez
+    
+    Los productos eliminados mientras estaban en alerta no aparecen en
+    `restocked`: se obtienen de `deleted` en /api/v1/changes.
+    
+    Requiere sql/005 para `since`; sin esa migración recorre el catálogo.
+    """
+    try:
+        positions = None
+        if since is not None:
+            try:
+                positions = low_stock.decode_since(since)
+            except (ValueError, TypeError):
+                raise HTTPException(
+                    status_code=400,
+                    detail="`since` inválido: use el `next_since` de la consulta anterior"
+                )
+        
+        result = await low_stock.fetch_indexed(supabase, category_id, active_only, positions, limit)
+        if result is None:
+            if since is not None:
+                raise HTTPException(
+                    status_code=400,
+                    detail="`since` requiere la migración sql/005_low_stock.sql"
+                )
+            result = await low_stock.fetch_scanned(supabase, category_id, active_only)
+        return result
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error al obtener productos con stock bajo: {str(e)}"
+        )
+
+@router.get("/export")
+async def export_products(
+    format: ExportFormat = Query("ndjson", description="ndjson o csv"),
+    include_category: bool = Query(True, description="Incluir la categoría de cada producto"),
+    category_id: Optional[str] = Query(None, description="Filtrar por categoría"),
+    search: Optional[str] = Query(None, description="Buscar por nombre, descripción, tags, ingredientes o SKU"),
+    active_only: bool = Query(True, description="Solo productos activos"),
+    featured_only: bool = Query(False, description="Solo productos destacados"),
+    min_price: Optional[float] = Query(None, ge=0, description="Precio mínimo"),
+    max_price: Optional[float] = Query(None, ge=0, description="Precio máximo"),
+    price_tier: PriceTier = Query("wholesale", description="Nivel de precio al que se aplican min_price, max_price y el orden"),
+    chunk_size: int = Query(1000, ge=100, le=1000, description="Productos por consulta a Supabase"),
+    supabase: Client = Depends(get_supabase_client)
+):
+    """
+    Exporta todos los productos que cumplen los filtros, en streaming.
+    
+    Acepta los mismos filtros que el listado. Sin `search` los productos
+    salen ordenados por id; con `search`, por relevancia. En CSV las listas
+    van separadas por `|` (el mismo formato que acepta `/products/import`).
+    """
+    filters = dict(
+        category_id=category_id,
+        search=search,
+        active_only=active_only,
+        featured_only=featured_only,
+        min_price=min_price,
+        max_price=max_price,
+        price_tier=f"price_{price_tier}",
+    )
+    try:
+        columns = PRODUCT_SELECT if include_category else "*"
+        chunks = iter_product_chunks(supabase, filters, columns, chunk_size)
+        body = await bulk_export.open_export(chunks, format, include_category)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error al exportar productos: {str(e)}"
+        )
+    
+    return StreamingResponse(
+        body,
+        media_type=bulk_export.EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="productos.{format}"'}
+    )
+
+def cache_product_detail(
+    product: dict,
+    cache_key: tuple,
+    generation: int,
+    fields: Optional[tuple] = None,
+) -> RenderedBody:
+    """
+    Serializa un producto (o solo `fields`) y lo guarda en la caché como su detalle.
+    """
+    tags = [product_tag(product["id"])]
+    if product.get("category_id"):
+        tags.append(category_tag(product["category_id"]))
+    rendered = render(fieldsets.item_model(fields), product, trusted=True)
+    catalog_cache.set(cache_key, rendered, tags=tags, generation=generation)
+    return rendered
+
+def lookup_value(by: str, key: str) -> Optional[str]:
+    """
+    Valor a buscar para una llave de la consulta en lote; None si no puede
+    existir (un ID que no es UUID haría fallar toda la consulta).
+    """
+    if by != "id":
+        return key
+    try:
+        return str(UUID(key))
+    except ValueError:
+        return None
+
+def product_cache_key(product_id: str, fields: Optional[tuple] = None) -> tuple:
+    """
+    Llave de la caché de un producto. El ID se normaliza como UUID para que
+    `GET /{id}` y `/batch` compartan la entrada aunque el cliente lo envíe
+    en mayúsculas.
+    """
+    return catalog_cache.make_key("products:detail", product_id=lookup_value("id", product_id) or product_id, fields=fields)
+
+async def load_product(
+    supabase: Client,
+    cache_key: tuple,
+    generation: int,
+    product_id: str,
+    fields: Optional[tuple] = None,
+) -> RenderedBody:
+    """
+    Consulta y serializa un producto y lo guarda en la caché; 404 si no existe.
+    """
+    # category_id etiqueta la entrada de la caché aunque no se retorne
+    columns = fieldsets.select_columns(fields, "category_id")
+    product = await repository.fetch_product(supabase, product_id, columns)
+    
+    if not product:
+        raise HTTPException(
+            status_code=404,
+            detail="Producto no encontrado"
+        )
+    
+    return cache_product_detail(product, cache_key, generation, fields)
+
 @router.get("/{product_id}", response_model=ProductResponse)
 async def get_product(
+    request: Request,
     product_id: str,
+    fields: Optional[str] = Query(None, description="card, detail, admin o campos separados por coma"),
+    price_tier: PriceTier = Query("wholesale", description="Nivel del campo `price` de los presets"),
     supabase: Client = Depends(get_supabase_client)
 ):
     """
     Obtiene un producto específico por ID.
+    
+    - **fields**: solo esos campos, como en el listado
+    
+    Responde con ETag; si `If-None-Match` coincide retorna 304 sin cuerpo.
     """
     try:
-        response = supabase.table("products").select("""
-            *,
-            category:categories(id, name, slug)
-        """).eq("id", product_id).execute()
-        
-        if not response.data:
-            raise HTTPException(
-                status_code=404,
-                detail="Producto no encontrado"
-            )
-        
-        return response.data[0]
+        fieldset = fieldsets.resolve(fields, f"price_{price_tier}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    cache_key = product_cache_key(product_id, fieldset)
+    cached = catalog_cache.get(cache_key)
+    if cached is not None:
+        return catalog_response(request, cached)
+    generation = catalog_cache.generation
+    
+    try:
+        rendered = await catalog_reads.run(
+            (cache_key, generation),
+            lambda: load_product(supabase, cache_key, generation, lookup_value("id", product_id) or product_id, fieldset)
+        )
+        return catalog_response(request, rendered)
         
     except HTTPException:
         raise
@@ -114,35 +724,18 @@ async def create_product(
     Crea un nuevo producto.
     """
     try:
-        # Verificar que el slug no exista
-        if product.slug:
-            existing = supabase.table("products").select("id").eq("slug", product.slug).execute()
-            if existing.data:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Ya existe un producto con el slug '{product.slug}'"
-                )
-        
-        # Verificar que el SKU no exista (si se proporciona)
-        if product.sku:
-            existing_sku = supabase.table("products").select("id").eq("sku", product.sku).execute()
-            if existing_sku.data:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Ya existe un producto con el SKU '{product.sku}'"
-                )
-        
-        # Verificar que la categoría existe (si se proporciona)
-        if product.category_id:
-            category = supabase.table("categories").select("id").eq("id", product.category_id).execute()
-            if not category.data:
-                raise HTTPException(
-                    status_code=400,
-                    detail="La categoría especificada no existe"
-                )
+        # Verificar slug, SKU y categoría (en paralelo)
+        if repository.WRITE_PRECHECKS:
+            await check_product_conflicts(supabase, product)
         
-        # Crear el producto
-        response = supabase.table("products").insert(product.dict()).execute()
+        # Crear el producto; la respuesta ya trae la categoría embebida
+        try:
+            response = await repository.execute(repository.returning(
+                supabase.table("products").insert(product.model_dump(mode="json")),
+                PRODUCT_SELECT
+            ))
+        except APIError as e:
+            raise constraint_error(e, product)
         
         if not response.data:
             raise HTTPException(
@@ -150,13 +743,10 @@ async def create_product(
                 detail="Error al crear el producto"
             )
         
-        # Obtener el producto creado con la categoría
-        created_product = supabase.table("products").select("""
-            *,
-            category:categories(id, name, slug)
-        """).eq("id", response.data[0]["id"]).execute()
+        created_product = response.data[0]
+        catalog_events.product_written(created_product["id"], created_product)
         
-        return created_product.data[0]
+        return created_product
         
     except HTTPException:
         raise
@@ -166,6 +756,101 @@ async def create_product(
             detail=f"Error al crear producto: {str(e)}"
         )
 
+@router.post("/import", response_model=ProductImportReport)
+async def import_products(
+    request: Request,
+    format: Optional[ImportFormat] = Query(None, description="csv o ndjson; por defecto según el Content-Type"),
+    chunk_size: int = Query(500, ge=1, le=1000, description="Productos por insert"),
+    supabase: Client = Depends(get_supabase_client)
+):
+    """
+    Importa productos en masa desde el cuerpo del request (text/csv o
+    application/x-ndjson), leído como stream.
+
+    Las filas inválidas o repetidas se rechazan sin detener la importación;
+    el reporte indica el resultado de cada fila.
+    """
+    try:
+        if format is None:
+            content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+            format = IMPORT_CONTENT_TYPES.get(content_type)
+        if format is None:
+            raise HTTPException(
+                status_code=415,
+                detail="Formato no soportado: use text/csv o application/x-ndjson, o el parámetro format"
+            )
+
+        lines = bulk_import.iter_lines(request.stream())
+        if format == "csv":
+            rows = bulk_import.iter_csv_rows(lines)
+        else:
+            rows = bulk_import.iter_ndjson_rows(lines)
+        return await bulk_import.import_products(supabase, rows, chunk_size=chunk_size)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error al importar productos: {str(e)}"
+        )
+
+@router.post("/batch", response_model=ProductBatchResponse)
+async def get_products_batch(
+    lookup: ProductBatchLookup,
+    supabase: Client = Depends(get_supabase_client)
+):
+    """
+    Obtiene varios productos por ID, slug o SKU en una sola consulta.
+    
+    - **by**: `id`, `slug` o `sku`
+    - **keys**: hasta 100 valores; los repetidos se retornan una sola vez
+    
+    Los productos vuelven en el orden de `keys` y `not_found` lista las
+    llaves que no existen. Con `by=id` los productos que ya están en la
+    caché del catálogo no se consultan; los consultados quedan en ella.
+    """
+    try:
+        values = {key: lookup_value(lookup.by, key) for key in lookup.keys}
+        found: Dict[str, RenderedBody] = {}
+        if lookup.by == "id":
+            for value in values.values():
+                cached = catalog_cache.get(product_cache_key(value)) if value else None
+                if cached is not None:
+                    found[value] = cached
+        
+        pending = [value for value in values.values() if value is not None and value not in found]
+        if pending:
+            generation = catalog_cache.generation
+            rows = await repository.rows_with_values(
+                supabase, "products", lookup.by, pending, columns=PRODUCT_SELECT
+            )
+            for row in rows:
+                cache_key = product_cache_key(row["id"])
+                found[str(row[lookup.by])] = cache_product_detail(row, cache_key, generation)
+        
+        # Los cuerpos ya serializados se insertan tal cual en la respuesta
+        bodies = {}
+        missing = []
+        for key, value in values.items():
+            if value in found:
+                bodies.setdefault(value, found[value].body)
+            else:
+                missing.append(key)
+        content = (
+            b'{"products":[' + b",".join(bodies.values())
+            + b'],"not_found":' + dumps(missing) + b"}"
+        )
+        return Response(content=content, media_type="application/json")
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error al obtener productos: {str(e)}"
+        )
+
 @router.put("/{product_id}", response_model=ProductResponse)
 async def update_product(
     product_id: str,
@@ -176,57 +861,43 @@ async def update_product(
     Actualiza un producto existente.
     """
     try:
-        # Verificar que el producto existe
-        existing = supabase.table("products").select("id").eq("id", product_id).execute()
-        if not existing.data:
-            raise HTTPException(
-                status_code=404,
-                detail="Producto no encontrado"
+        if repository.WRITE_PRECHECKS:
+            # Verificar existencia, slug, SKU y categoría en paralelo
+            exists, conflicts = await asyncio.gather(
+                repository.row_exists(supabase, "products", product_id),
+                check_product_conflicts(supabase, product, exclude_id=product_id),
+                return_exceptions=True
             )
-        
-        # Verificar que el slug no esté en uso por otro producto
-        if product.slug:
-            slug_check = supabase.table("products").select("id").eq("slug", product.slug).neq("id", product_id).execute()
-            if slug_check.data:
+            if exists is not True:
+                if isinstance(exists, BaseException):
+                    raise exists
                 raise HTTPException(
-                    status_code=400,
-                    detail=f"Ya existe otro producto con el slug '{product.slug}'"
+                    status_code=404,
+                    detail="Producto no encontrado"
                 )
+            if isinstance(conflicts, BaseException):
+                raise conflicts
         
-        # Verificar que el SKU no esté en uso por otro producto
-        if product.sku:
-            sku_check = supabase.table("products").select("id").eq("sku", product.sku).neq("id", product_id).execute()
-            if sku_check.data:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Ya existe otro producto con el SKU '{product.sku}'"
-                )
-        
-        # Verificar que la categoría existe (si se proporciona)
-        if product.category_id:
-            category = supabase.table("categories").select("id").eq("id", product.category_id).execute()
-            if not category.data:
-                raise HTTPException(
-                    status_code=400,
-                    detail="La categoría especificada no existe"
-                )
-        
-        # Actualizar el producto
-        response = supabase.table("products").update(product.dict()).eq("id", product_id).execute()
+        # Actualizar el producto; la respuesta ya trae la categoría embebida
+        try:
+            response = await repository.execute(repository.returning(
+                supabase.table("products").update(product.model_dump(mode="json")).eq("id", product_id),
+                PRODUCT_SELECT
+            ))
+        except APIError as e:
+            raise constraint_error(e, product, exclude_id=product_id)
         
+        # Ninguna fila actualizada: el producto no existe
         if not response.data:
             raise HTTPException(
-                status_code=500,
-                detail="Error al actualizar el producto"
+                status_code=404,
+                detail="Producto no encontrado"
             )
         
-        # Obtener el producto actualizado con la categoría
-        updated_product = supabase.table("products").select("""
-            *,
-            category:categories(id, name, slug)
-        """).eq("id", product_id).execute()
+        updated_product = response.data[0]
+        catalog_events.product_written(product_id, updated_product)
         
-        return updated_product.data[0]
+        return updated_product
         
     except HTTPException:
         raise
@@ -245,31 +916,116 @@ async def delete_product(
     Elimina un producto.
     """
     try:
-        # Verificar que el producto existe
-        existing = supabase.table("products").select("id").eq("id", product_id).execute()
-        if not existing.data:
+        # Eliminar el producto; si no se borró ninguna fila no existía
+        response = await repository.execute(repository.returning(
+            supabase.table("products").delete().eq("id", product_id),
+            "id"
+        ))
+        
+        if not response.data:
             raise HTTPException(
                 status_code=404,
                 detail="Producto no encontrado"
             )
         
-        # Eliminar el producto
-        response = supabase.table("products").delete().eq("id", product_id).execute()
+        catalog_events.product_deleted(product_id)
         
-        if not response.data:
+        return None
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error al eliminar producto: {str(e)}"
+        )
+
+@router.patch("/stock", response_model=StockBatchUpdateResponse)
+async def update_stock_batch(
+    batch: StockBatchUpdate,
+    supabase: Client = Depends(get_supabase_client)
+):
+    """
+    Actualiza el stock de muchos productos a la vez (sincronización con el
+    almacén). Cada ítem identifica el producto por `product_id` o por `sku`.
+
+    Retorna las filas actualizadas en forma compacta y los IDs y SKUs que no
+    existen; los ítems faltantes no impiden aplicar el resto.
+    """
+    try:
+        items = [item.model_dump(mode="json", exclude_none=True) for item in batch.items]
+        updated = await repository.update_stock_batch(supabase, items)
+        catalog_events.stock_updated([row["id"] for row in updated])
+
+        updated_ids = {str(row["id"]) for row in updated}
+        updated_skus = {row["sku"] for row in updated if row.get("sku")}
+        missing_ids = [
+            item.product_id for item in batch.items
+            if item.product_id is not None and str(item.product_id) not in updated_ids
+        ]
+        missing_skus = [
+            item.sku for item in batch.items
+            if item.product_id is None and item.sku not in updated_skus
+        ]
+
+        return StockBatchUpdateResponse(
+            updated=updated,
+            missing_ids=list(dict.fromkeys(missing_ids)),
+            missing_skus=list(dict.fromkeys(missing_skus)),
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error al actualizar stock: {str(e)}"
+        )
+
+@router.post("/stock/adjustments", response_model=StockAdjustmentResponse)
+async def adjust_stock(
+    adjustment: StockAdjustment,
+    supabase: Client = Depends(get_supabase_client)
+):
+    """
+    Suma o resta stock (`delta`) a uno o varios productos de forma atómica,
+    en una sola llamada a Supabase: para descontar un pedido sin leer,
+    calcular y escribir, y sin perder actualizaciones entre pedidos
+    simultáneos del mismo producto.
+    
+    Se aplica todo o nada. Responde 409 con los ítems rechazados si algún
+    producto no existe, quedaría con stock negativo o, con
+    `enforce_order_limits`, si una salida no respeta su
+    `min_order_quantity` / `max_order_quantity`. Requiere sql/006.
+    """
+    try:
+        items = [item.model_dump(mode="json", exclude_none=True) for item in adjustment.items]
+        result = await repository.adjust_stock(supabase, items, adjustment.enforce_order_limits)
+        if result is None:
             raise HTTPException(
-                status_code=500,
-                detail="Error al eliminar el producto"
+                status_code=501,
+                detail="El ajuste de stock requiere la migración sql/006_adjust_product_stock.sql"
             )
         
-        return None
+        if result["rejected"]:
+            raise HTTPException(
+                status_code=409,
+                detail={
+                    "message": "No se aplicó ningún ajuste de stock",
+                    "rejected": result["rejected"],
+                }
+            )
+        
+        catalog_events.stock_updated([row["id"] for row in result["updated"]])
+        
+        return StockAdjustmentResponse(updated=result["updated"])
         
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
-            detail=f"Error al eliminar producto: {str(e)}"
+            detail=f"Error al ajustar stock: {str(e)}"
         )
 
 @router.patch("/{product_id}/stock", response_model=ProductResponse)
@@ -282,32 +1038,24 @@ async def update_product_stock(
     Actualiza solo el stock de un producto.
     """
     try:
-        # Verificar que el producto existe
-        existing = supabase.table("products").select("id").eq("id", product_id).execute()
-        if not existing.data:
-            raise HTTPException(
-                status_code=404,
-                detail="Producto no encontrado"
-            )
-        
-        # Actualizar solo el stock
-        response = supabase.table("products").update({
-            "stock_quantity": new_stock
-        }).eq("id", product_id).execute()
+        # Actualizar solo el stock; la respuesta ya trae la categoría embebida
+        response = await repository.execute(repository.returning(
+            supabase.table("products").update({
+                "stock_quantity": new_stock
+            }).eq("id", product_id),
+            PRODUCT_SELECT
+        ))
         
         if not response.data:
             raise HTTPException(
-                status_code=500,
-                detail="Error al actualizar el stock"
+                status_code=404,
+                detail="Producto no encontrado"
             )
         
-        # Obtener el producto actualizado
-        updated_product = supabase.table("products").select("""
-            *,
-            category:categories(id, name, slug)
-        """).eq("id", product_id).execute()
+        updated_product = response.data[0]
+        catalog_events.product_written(product_id, updated_product)
         
-        return updated_product.data[0]
+        return updated_product
         
     except HTTPException:
         raise
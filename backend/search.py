@@ -0,0 +1,346 @@
+"""
+Motor de búsqueda de productos: índice invertido en memoria.
+
+Indexa nombre, descripción, tags, ingredientes y SKU con plegado de acentos
+("proteína" = "proteina"), coincidencia por prefijo para búsqueda mientras
+se escribe y ranking por campo y rareza del término. Se carga completo la
+primera vez que se usa, se actualiza con cada escritura local (ver
+`catalog_events`) y se reconstruye cada `SEARCH_INDEX_TTL` segundos para
+recoger los cambios hechos por otros workers.
+"""
+import asyncio
+import bisect
+import contextvars
+import heapq
+import logging
+import math
+import os
+import re
+import sys
+import time
+import unicodedata
+from array import array
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from supabase import Client
+
+import repository
+
+logger = logging.getLogger(__name__)
+
+SEARCH_INDEX_ENABLED = os.getenv("SEARCH_INDEX_ENABLED", "true").lower() == "true"
+SEARCH_INDEX_TTL = float(os.getenv("SEARCH_INDEX_TTL", "300"))
+
+# Columnas necesarias para indexar y filtrar sin traer el producto completo
+INDEX_COLUMNS = (
+    "id, name, description, tags, ingredients, sku, "
+    "is_active, is_featured, category_id, created_at, " + ", ".join(repository.PRICE_TIERS)
+)
+
+# Cada campo es un bit; el peso de un token en un producto es el de su mejor campo.
+# Un posting es un entero (documento << MASK_BITS | campos) dentro de un array
+FIELD_BITS = {"name": 1, "sku": 2, "tags": 4, "description": 8, "ingredients": 16}
+MASK_BITS = 5
+MASK = (1 << MASK_BITS) - 1
+FIELD_WEIGHTS = {1: 5.0, 2: 4.0, 4: 3.0, 8: 1.0, 16: 1.0}
+MASK_WEIGHTS = [
+    max((weight for bit, weight in FIELD_WEIGHTS.items() if mask & bit), default=0.0)
+    for mask in range(1 << MASK_BITS)
+]
+
+# Un prefijo (no la palabra completa) puntúa menos que la coincidencia exacta
+PREFIX_FACTOR = 0.6
+
+STOPWORDS = frozenset(
+    "a al con de del el en es la las lo los o para por se sin su un una y".split()
+)
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+def fold(text: str) -> str:
+    """
+    Minúsculas sin acentos: "Proteína" -> "proteina".
+    """
+    if not text.isascii():
+        # NFKD separa la letra de su acento; el tokenizador solo conserva [a-z0-9]
+        text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii")
+    return text.lower()
+
+def tokenize(text: Optional[str]) -> List[str]:
+    if not text:
+        return []
+    # intern: cada token se guarda una sola vez aunque aparezca en miles de productos
+    return [sys.intern(token) for token in _TOKEN_RE.findall(fold(text)) if token not in STOPWORDS]
+
+def _field_text(value: Any) -> str:
+    if isinstance(value, (list, tuple)):
+        return " ".join(str(item) for item in value)
+    return str(value) if value is not None else ""
+
+class IndexedProduct(NamedTuple):
+    id: str
+    tokens: Tuple[str, ...]
+    is_active: bool
+    is_featured: bool
+    category_id: Optional[str]
+    # Un precio por columna de repository.PRICE_TIERS, None si no tiene
+    prices: Tuple[Optional[float], ...]
+    created_at: str
+
+class ProductSearchIndex:
+    """
+    Índice invertido token -> postings ordenados, con vocabulario ordenado
+    para resolver prefijos con búsqueda binaria.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._postings: Dict[str, array] = {}
+        self._vocabulary: List[str] = []
+        self._docs: Dict[int, IndexedProduct] = {}
+        self._doc_numbers: Dict[str, int] = {}
+        self._next_doc = 0
+        self.loaded_at: Optional[float] = None
+        # Escrituras recibidas mientras se recarga, para aplicarlas al terminar
+        self._replay: Optional[List[Tuple[str, Any]]] = None
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    @property
+    def active(self) -> bool:
+        """
+        Cargado o cargándose: solo entonces vale la pena aplicar escrituras.
+        """
+        return self.loaded_at is not None or self._replay is not None
+
+    # ------------------------------------------------------------ escritura
+
+    def upsert(self, product: dict) -> None:
+        """
+        Indexa (o reindexa) un producto a partir de sus columnas.
+        """
+        if self._replay is not None:
+            self._replay.append(("upsert", product))
+        product_id = str(product["id"])
+        self._remove(product_id)
+        self._add(product_id, product, sorted_vocabulary=True)
+
+    def remove(self, product_id: Any) -> None:
+        if self._replay is not None:
+            self._replay.append(("remove", product_id))
+        self._remove(product_id)
+
+    def rebuild(self, products: Iterable[dict]) -> None:
+        self._swap(self._build(products))
+
+    @staticmethod
+    def _build(products: Iterable[dict]) -> "ProductSearchIndex":
+        fresh = ProductSearchIndex()
+        for product in products:
+            fresh._add(str(product["id"]), product, sorted_vocabulary=False)
+        # Ordenar el vocabulario una sola vez es mucho más barato que insort por token
+        fresh._vocabulary = sorted(fresh._postings)
+        return fresh
+
+    def _swap(self, fresh: "ProductSearchIndex") -> None:
+        self._postings, self._vocabulary = fresh._postings, fresh._vocabulary
+        self._docs, self._doc_numbers = fresh._docs, fresh._doc_numbers
+        self._next_doc = fresh._next_doc
+        self.loaded_at = time.monotonic()
+
+    def _add(self, product_id: str, product: dict, sorted_vocabulary: bool) -> None:
+        fields: Dict[str, int] = {}
+        for field, bit in FIELD_BITS.items():
+            for token in tokenize(_field_text(product.get(field))):
+                fields[token] = fields.get(token, 0) | bit
+        # Los números de documento crecen, así que cada posting queda ordenado
+        doc = self._next_doc
+        self._next_doc += 1
+        self._doc_numbers[product_id] = doc
+        category_id = product.get("category_id")
+        self._docs[doc] = IndexedProduct(
+            id=product_id,
+            tokens=tuple(fields),
+            is_active=bool(product.get("is_active", True)),
+            is_featured=bool(product.get("is_featured", False)),
+            category_id=sys.intern(str(category_id)) if category_id else None,
+            prices=tuple(product.get(tier) for tier in repository.PRICE_TIERS),
+            created_at=str(product.get("created_at") or ""),
+        )
+        for token, mask in fields.items():
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = array("I")
+                if sorted_vocabulary:
+                    bisect.insort(self._vocabulary, token)
+            postings.append(doc << MASK_BITS | mask)
+
+    def _remove(self, product_id: str) -> None:
+        doc = self._doc_numbers.pop(str(product_id), None)
+        if doc is None:
+            return
+        for token in self._docs.pop(doc).tokens:
+            postings = self._postings[token]
+            del postings[bisect.bisect_left(postings, doc << MASK_BITS)]
+            if not postings:
+                del self._postings[token]
+                del self._vocabulary[bisect.bisect_left(self._vocabulary, token)]
+
+    # -------------------------------------------------------------- lectura
+
+    def _expand(self, term: str) -> List[Tuple[str, float]]:
+        """
+        Tokens del vocabulario que empiezan con `term`, con su factor.
+        """
+        vocabulary = self._vocabulary
+        index = bisect.bisect_left(vocabulary, term)
+        matches = []
+        while index < len(vocabulary) and vocabulary[index].startswith(term):
+            token = vocabulary[index]
+            matches.append((token, 1.0 if token == term else PREFIX_FACTOR))
+            index += 1
+        return matches
+
+    def _term_scores(self, term: str) -> Dict[int, float]:
+        total = len(self._docs) or 1
+        scores: Dict[int, float] = {}
+        for token, factor in self._expand(term):
+            postings = self._postings[token]
+            boost = math.log(1 + total / len(postings)) * factor
+            weights = [weight * boost for weight in MASK_WEIGHTS]
+            for entry in postings:
+                doc = entry >> MASK_BITS
+                score = weights[entry & MASK]
+                if score > scores.get(doc, 0.0):
+                    scores[doc] = score
+        return scores
+
+    def handles(self, query: Optional[str]) -> bool:
+        """
+        Indica si la búsqueda se resuelve con el índice: está habilitado y
+        la búsqueda tiene algún término indexado. Una de solo stopwords
+        ("de la") o signos ("%", "-") va por `ilike` en Supabase, como antes
+        del índice.
+        """
+        return self.enabled and bool(tokenize(query))
+
+    def search(
+        self,
+        query: str,
+        limit: Optional[int] = None,
+        category_id: Optional[str] = None,
+        active_only: bool = True,
+        featured_only: bool = False,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        price_tier: str = "price_wholesale",
+        sort: Optional[str] = None,
+    ) -> Tuple[List[str], int]:
+        """
+        Productos que contienen todos los términos (por prefijo), ordenados
+        por relevancia y luego por más recientes.
+        
+        `min_price` y `max_price` se aplican al precio de `price_tier`. Con
+        `sort` se ordena igual que el listado: `newest`, o `price_asc` /
+        `price_desc` por ese precio (solo productos que lo tienen).
+        
+        Retorna los primeros `limit` IDs (todos si es None) y el total de
+        coincidencias.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return [], 0
+        # Empezar por el término más selectivo reduce las intersecciones
+        per_term = sorted((self._term_scores(term) for term in terms), key=len)
+        scores = per_term[0]
+        for other in per_term[1:]:
+            scores = {doc: score + other[doc] for doc, score in scores.items() if doc in other}
+            if not scores:
+                return [], 0
+
+        tier = repository.PRICE_TIERS.index(price_tier)
+        priced_only = sort in ("price_asc", "price_desc")
+        results = []
+        for doc, score in scores.items():
+            product = self._docs[doc]
+            if active_only and not product.is_active:
+                continue
+            if featured_only and not product.is_featured:
+                continue
+            if category_id and product.category_id != category_id:
+                continue
+            price = product.prices[tier]
+            if price is None and (priced_only or min_price is not None or max_price is not None):
+                continue
+            if min_price is not None and price < min_price:
+                continue
+            if max_price is not None and price > max_price:
+                continue
+            if priced_only:
+                results.append((price, product.id))
+            elif sort == "newest":
+                results.append((product.created_at, product.id))
+            else:
+                results.append((score, product.created_at, product.id))
+        # Precio ascendente: los menores; el resto, los mayores
+        if sort == "price_asc":
+            top = sorted(results) if limit is None else heapq.nsmallest(limit, results)
+        else:
+            top = sorted(results, reverse=True) if limit is None else heapq.nlargest(limit, results)
+        return [result[-1] for result in top], len(results)
+
+    # ---------------------------------------------------------------- carga
+
+    @property
+    def stale(self) -> bool:
+        return self.loaded_at is None or time.monotonic() - self.loaded_at > SEARCH_INDEX_TTL
+
+    async def load(self, supabase: Client) -> None:
+        products: List[dict] = []
+        self._replay = []
+        try:
+            async for rows in repository.iter_rows(supabase, "products", INDEX_COLUMNS):
+                products.extend(rows)
+            # Construir fuera del event loop: con catálogos grandes toma segundos
+            fresh = await asyncio.to_thread(self._build, products)
+        finally:
+            replay, self._replay = self._replay, None
+        self._swap(fresh)
+        for operation, argument in replay:
+            getattr(self, operation)(argument)
+        logger.info("Índice de búsqueda cargado con %d productos", len(self))
+
+    async def ensure_fresh(self, supabase: Client) -> None:
+        """
+        Carga el índice si nunca se cargó; si está vencido lo reconstruye en
+        segundo plano y mientras tanto se sigue usando el actual.
+        """
+        if self.loaded_at is None:
+            async with self._lock:
+                if self.loaded_at is None:
+                    await self.load(supabase)
+            return
+        if self.stale and (self._refresh_task is None or self._refresh_task.done()):
+            # Contexto vacío: la tarea no hereda el plazo ni la clase de
+            # admisión de la petición que la disparó, ni sus métricas
+            self._refresh_task = contextvars.Context().run(asyncio.create_task, self._refresh(supabase))
+
+    async def _refresh(self, supabase: Client) -> None:
+        try:
+            async with self._lock:
+                await self.load(supabase)
+        except Exception:
+            logger.exception("No se pudo reconstruir el índice de búsqueda")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "products": len(self._docs),
+            "tokens": len(self._vocabulary),
+            "age_seconds": round(time.monotonic() - self.loaded_at, 1) if self.loaded_at else None,
+        }
+
+search_index = ProductSearchIndex(enabled=SEARCH_INDEX_ENABLED)
@@ -0,0 +1,102 @@
+"""
+Coalescencia de lecturas idénticas en vuelo (single-flight).
+
+Cuando llegan muchas peticiones iguales a la vez (un correo de promoción,
+la caché recién invalidada), la primera consulta a Supabase y las demás
+esperan su resultado en lugar de repetir la consulta. La llave es la misma
+de la caché del catálogo más su `generation`: una lectura que empieza
+después de una escritura no se une a una consulta anterior a ella.
+
+La consulta corre en su propia tarea: si una de las peticiones se cancela
+(el cliente cerró la conexión), las demás siguen esperando; solo cuando ya
+no queda ninguna se cancela la consulta. Un error llega a todas.
+
+La tarea no hereda el contexto de la primera petición: corre con su clase de
+admisión pero sin su plazo (`admission.shared_context`), y cada petición
+espera el resultado con su propio plazo. En las métricas, cada una cuenta la
+consulta compartida como una llamada a Supabase durante su espera.
+"""
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Dict, Hashable, TypeVar
+
+import admission
+import metrics
+
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() not in ("0", "false", "no")
+
+T = TypeVar("T")
+
+class _Call:
+    def __init__(self, task: "asyncio.Task[Any]"):
+        self.task = task
+        self.waiters = 0
+
+class SingleFlight:
+    """
+    Agrupa las llamadas concurrentes con la misma llave en una sola.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._calls: Dict[Hashable, _Call] = {}
+        self.leaders = 0
+        self.followers = 0
+        self.abandoned = 0
+
+    async def run(self, key: Hashable, load: Callable[[], Awaitable[T]]) -> T:
+        """
+        Retorna el resultado de `load()`, compartido con las demás llamadas
+        con la misma `key` que estén en curso.
+        """
+        if not self.enabled:
+            return await load()
+
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(admission.shared_context().run(asyncio.ensure_future, load()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda task: self._finished(key, call))
+            self.leaders += 1
+        else:
+            self.followers += 1
+
+        call.waiters += 1
+        stats = metrics.current()
+        if stats is not None:
+            stats.call_started()
+        try:
+            return await admission.wait_shared(call.task)
+        finally:
+            if stats is not None:
+                stats.call_finished()
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Nadie espera ya el resultado: se cancela la consulta y una
+                # llamada nueva empieza otra en lugar de unirse a esta
+                self._forget(key, call)
+                call.task.cancel()
+                self.abandoned += 1
+
+    def _forget(self, key: Hashable, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    def _finished(self, key: Hashable, call: _Call) -> None:
+        self._forget(key, call)
+        if not call.task.cancelled():
+            # Marca el error como recuperado aunque no quede quien lo espere
+            call.task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        calls = self.leaders + self.followers
+        return {
+            "enabled": self.enabled,
+            "in_flight": len(self._calls),
+            "leaders": self.leaders,
+            "followers": self.followers,
+            "abandoned": self.abandoned,
+            "coalesced_ratio": round(self.followers / calls, 4) if calls else 0.0,
+        }
+
+catalog_reads = SingleFlight(enabled=SINGLE_FLIGHT_ENABLED)
@@ -0,0 +1,35 @@
+-- Actualización de stock en lote (PATCH /api/v1/products/stock).
+--
+-- Recibe un arreglo JSON de {"product_id": uuid, "sku": text, "new_stock": int}
+-- (product_id o sku) y lo aplica con un solo UPDATE. Si un producto aparece
+-- más de una vez gana el último valor. Retorna solo las filas actualizadas,
+-- en forma compacta; las que no aparecen no existen.
+--
+-- Aplicar desde el SQL Editor de Supabase. Sin esta función el backend sigue
+-- funcionando: agrupa los productos por stock y hace un PATCH por grupo.
+
+create or replace function public.update_product_stock_batch(items jsonb)
+returns table (id uuid, sku text, stock_quantity integer, updated_at timestamptz)
+language sql
+as $$
+    -- UPDATE ... FROM con dos filas para el mismo producto aplicaría una
+    -- cualquiera: se deja solo la última del arreglo
+    with requested as (
+        select distinct on (p.id) p.id, i.new_stock
+          from rows from (jsonb_to_recordset(items) as (product_id uuid, sku text, new_stock integer))
+               with ordinality as i(product_id, sku, new_stock, position)
+          join public.products as p
+            on (i.product_id is not null and p.id = i.product_id)
+            or (i.product_id is null and p.sku = i.sku)
+         order by p.id, i.position desc
+    )
+    update public.products as p
+       set stock_quantity = r.new_stock,
+           updated_at = now()
+      from requested as r
+     where p.id = r.id
+    returning p.id, p.sku, p.stock_quantity, p.updated_at;
+$$;
+
+-- El cruce por SKU necesita índice (la restricción UNIQUE ya lo crea si existe)
+create index if not exists products_sku_idx on public.products (sku);
@@ -0,0 +1,34 @@
+-- Restricciones del catálogo que respaldan CATALOG_WRITE_MODE=constraints.
+--
+-- Con ellas el backend escribe en un solo request y deja que PostgreSQL
+-- rechace slugs/SKUs repetidos (23505) y categorías inexistentes o con
+-- productos (23503), en vez de verificar antes de escribir. Además cierran
+-- la carrera entre dos administradores que escriben a la vez.
+--
+-- Falla si ya hay datos que las violan: resolver los duplicados primero.
+
+do $$
+begin
+    if not exists (select 1 from pg_constraint where conname = 'categories_slug_key') then
+        alter table public.categories add constraint categories_slug_key unique (slug);
+    end if;
+    if not exists (select 1 from pg_constraint where conname = 'products_slug_key') then
+        alter table public.products add constraint products_slug_key unique (slug);
+    end if;
+    if not exists (select 1 from pg_constraint where conname = 'products_sku_key') then
+        alter table public.products add constraint products_sku_key unique (sku);
+    end if;
+end $$;
+
+-- El índice de sql/001 queda cubierto por la restricción única
+drop index if exists public.products_sku_idx;
+
+-- Una categoría con productos no se puede eliminar
+alter table public.products drop constraint if exists products_category_id_fkey;
+alter table public.products
+    add constraint products_category_id_fkey
+    foreign key (category_id) references public.categories (id)
+    on delete restrict;
+
+-- La llave foránea no crea índice; sin él cada DELETE de categoría recorre products
+create index if not exists products_category_id_idx on public.products (category_id);
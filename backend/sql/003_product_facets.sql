@@ -0,0 +1,89 @@
+-- Facetas del catálogo (GET /api/v1/products/facets).
+--
+-- Con los mismos filtros que el listado de productos, cuenta en una sola
+-- consulta los productos por categoría, tag y alérgeno, y por nivel de
+-- precio el mínimo, el máximo y cuántos caen en cada rango de
+-- p_price_edges (width_bucket: 0 bajo el primer límite, n desde el último).
+--
+-- Retorna el agregado crudo:
+-- {"total": n, "categories": {id: n}, "tags": {tag: n}, "allergens": {a: n},
+--  "prices": {nivel: {"count": n, "min": x, "max": y, "buckets": {"1": n}}}}
+--
+-- Aplicar desde el SQL Editor de Supabase. Sin esta función el backend
+-- sigue funcionando: trae las columnas necesarias y cuenta en Python.
+
+create or replace function public.product_facets(
+    p_category_id uuid default null,
+    p_search text default null,
+    p_active_only boolean default true,
+    p_featured_only boolean default false,
+    p_min_price numeric default null,
+    p_max_price numeric default null,
+    p_price_edges numeric[] default '{0,5,10,20,50,100}'
+)
+returns jsonb
+language sql
+stable
+as $$
+    with filtered as (
+        select category_id, tags, allergens,
+               price_retail, price_wholesale, price_gym, price_cafeteria, price_store
+          from public.products
+         where (not p_active_only or is_active)
+           and (not p_featured_only or is_featured)
+           and (p_category_id is null or category_id = p_category_id)
+           and (p_search is null
+                or name ilike '%' || p_search || '%'
+                or description ilike '%' || p_search || '%')
+           and (p_min_price is null or price_wholesale >= p_min_price)
+           and (p_max_price is null or price_wholesale <= p_max_price)
+    ),
+    bucketed as (
+        select tier, width_bucket(price, p_price_edges) as bucket,
+               count(*) as n, min(price) as low, max(price) as high
+          from filtered
+         cross join lateral (values
+               ('price_retail', price_retail),
+               ('price_wholesale', price_wholesale),
+               ('price_gym', price_gym),
+               ('price_cafeteria', price_cafeteria),
+               ('price_store', price_store)
+         ) as tiers (tier, price)
+         where price is not null
+         group by tier, bucket
+    )
+    select jsonb_build_object(
+        'total', (select count(*) from filtered),
+        'categories', (
+            select coalesce(jsonb_object_agg(category_id, n), '{}')
+              from (select category_id, count(*) as n
+                      from filtered
+                     where category_id is not null
+                     group by category_id) as c
+        ),
+        'tags', (
+            select coalesce(jsonb_object_agg(tag, n), '{}')
+              from (select tag, count(*) as n
+                      from filtered cross join unnest(tags) as tag
+                     group by tag) as t
+        ),
+        'allergens', (
+            select coalesce(jsonb_object_agg(allergen, n), '{}')
+              from (select allergen, count(*) as n
+                      from filtered cross join unnest(allergens) as allergen
+                     group by allergen) as a
+        ),
+        'prices', (
+            select coalesce(jsonb_object_agg(tier, stats), '{}')
+              from (select tier,
+                           jsonb_build_object(
+                               'count', sum(n),
+                               'min', min(low),
+                               'max', max(high),
+                               'buckets', jsonb_object_agg(bucket, n)
+                           ) as stats
+                      from bucketed
+                     group by tier) as p
+        )
+    );
+$$;
@@ -0,0 +1,117 @@
+-- Filtros y orden por nivel de precio (price_tier y sort en
+-- GET /api/v1/products y /facets).
+--
+-- Un índice parcial por nivel, (precio, id) solo de los productos activos
+-- con precio en ese nivel: el rango de precio y el orden por precio
+-- (ascendente o, recorriéndolo al revés, descendente) con su keyset salen
+-- del índice sin leer la tabla completa. Al no incluir los productos sin
+-- precio, el índice de un nivel con pocos precios es chico. PostgreSQL los
+-- mantiene al día en cada escritura.
+--
+-- También reemplaza `product_facets` (sql/003) por una versión que aplica
+-- p_min_price y p_max_price al nivel p_price_tier.
+--
+-- Aplicar desde el SQL Editor de Supabase. Sin esta migración el backend
+-- sigue funcionando: las queries son las mismas, solo más lentas, y las
+-- facetas se cuentan en Python.
+
+create index if not exists products_price_retail_idx
+    on public.products (price_retail, id) where is_active and price_retail is not null;
+create index if not exists products_price_wholesale_idx
+    on public.products (price_wholesale, id) where is_active and price_wholesale is not null;
+create index if not exists products_price_gym_idx
+    on public.products (price_gym, id) where is_active and price_gym is not null;
+create index if not exists products_price_cafeteria_idx
+    on public.products (price_cafeteria, id) where is_active and price_cafeteria is not null;
+create index if not exists products_price_store_idx
+    on public.products (price_store, id) where is_active and price_store is not null;
+
+drop function if exists public.product_facets(uuid, text, boolean, boolean, numeric, numeric, numeric[]);
+
+create or replace function public.product_facets(
+    p_category_id uuid default null,
+    p_search text default null,
+    p_active_only boolean default true,
+    p_featured_only boolean default false,
+    p_min_price numeric default null,
+    p_max_price numeric default null,
+    p_price_edges numeric[] default '{0,5,10,20,50,100}',
+    p_price_tier text default 'price_wholesale'
+)
+returns jsonb
+language sql
+stable
+as $$
+    with candidates as (
+        select category_id, tags, allergens,
+               price_retail, price_wholesale, price_gym, price_cafeteria, price_store,
+               case p_price_tier
+                   when 'price_retail' then price_retail
+                   when 'price_wholesale' then price_wholesale
+                   when 'price_gym' then price_gym
+                   when 'price_cafeteria' then price_cafeteria
+                   when 'price_store' then price_store
+               end as tier_price
+          from public.products
+         where (not p_active_only or is_active)
+           and (not p_featured_only or is_featured)
+           and (p_category_id is null or category_id = p_category_id)
+           and (p_search is null
+                or name ilike '%' || p_search || '%'
+                or description ilike '%' || p_search || '%')
+    ),
+    filtered as (
+        select *
+          from candidates
+         where (p_min_price is null or tier_price >= p_min_price)
+           and (p_max_price is null or tier_price <= p_max_price)
+    ),
+    bucketed as (
+        select tier, width_bucket(price, p_price_edges) as bucket,
+               count(*) as n, min(price) as low, max(price) as high
+          from filtered
+         cross join lateral (values
+               ('price_retail', price_retail),
+               ('price_wholesale', price_wholesale),
+               ('price_gym', price_gym),
+               ('price_cafeteria', price_cafeteria),
+               ('price_store', price_store)
+         ) as tiers (tier, price)
+         where price is not null
+         group by tier, bucket
+    )
+    select jsonb_build_object(
+        'total', (select count(*) from filtered),
+        'categories', (
+            select coalesce(jsonb_object_agg(category_id, n), '{}')
+              from (select category_id, count(*) as n
+                      from filtered
+                     where category_id is not null
+                     group by category_id) as c
+        ),
+        'tags', (
+            select coalesce(jsonb_object_agg(tag, n), '{}')
+              from (select tag, count(*) as n
+                      from filtered cross join unnest(tags) as tag
+                     group by tag) as t
+        ),
+        'allergens', (
+            select coalesce(jsonb_object_agg(allergen, n), '{}')
+              from (select allergen, count(*) as n
+                      from filtered cross join unnest(allergens) as allergen
+                     group by allergen) as a
+        ),
+        'prices', (
+            select coalesce(jsonb_object_agg(tier, stats), '{}')
+              from (select tier,
+                           jsonb_build_object(
+                               'count', sum(n),
+                               'min', min(low),
+                               'max', max(high),
+                               'buckets', jsonb_object_agg(bucket, n)
+                           ) as stats
+                      from bucketed
+                     group by tier) as p
+        )
+    );
+$$;
@@ -0,0 +1,56 @@
+-- Alertas de stock bajo (GET /api/v1/products/low-stock).
+--
+-- is_low_stock es una columna generada (stock_quantity <= min_stock_alert):
+-- PostgreSQL la recalcula en cada INSERT o UPDATE, venga de la API, del
+-- lote de stock (sql/001) o del SQL Editor. El índice parcial solo contiene
+-- los productos en alerta, así que listarlos cuesta según cuántos son y no
+-- según el tamaño del catálogo.
+--
+-- stock_alert_changed_at registra cuándo el producto entró o salió de la
+-- alerta (null si nunca estuvo); con el parámetro `since` el job de compras
+-- pide solo los cambios desde su consulta anterior.
+--
+-- Aplicar desde el SQL Editor de Supabase. Sin esta migración el endpoint
+-- sigue funcionando recorriendo el catálogo, pero no admite `since`.
+
+alter table public.products
+    add column if not exists is_low_stock boolean
+    generated always as (stock_quantity <= min_stock_alert) stored;
+
+alter table public.products
+    add column if not exists stock_alert_changed_at timestamptz;
+
+update public.products
+   set stock_alert_changed_at = now()
+ where is_low_stock and stock_alert_changed_at is null;
+
+-- Las columnas generadas todavía no están calculadas en un trigger BEFORE:
+-- se compara la expresión con los valores viejos y nuevos
+create or replace function public.products_stock_alert_changed()
+returns trigger
+language plpgsql
+as $$
+begin
+    if tg_op = 'INSERT' then
+        if new.stock_quantity <= new.min_stock_alert then
+            new.stock_alert_changed_at := now();
+        end if;
+    elsif (new.stock_quantity <= new.min_stock_alert) is distinct from (old.stock_quantity <= old.min_stock_alert) then
+        new.stock_alert_changed_at := now();
+    end if;
+    return new;
+end;
+$$;
+
+drop trigger if exists products_stock_alert_changed on public.products;
+create trigger products_stock_alert_changed
+    before insert or update of stock_quantity, min_stock_alert on public.products
+    for each row execute function public.products_stock_alert_changed();
+
+-- Productos en alerta, en el orden en que los retorna el endpoint
+create index if not exists products_low_stock_idx
+    on public.products (stock_alert_changed_at, id) where is_low_stock;
+
+-- Productos que salieron de la alerta desde `since`
+create index if not exists products_stock_alert_changed_at_idx
+    on public.products (stock_alert_changed_at);
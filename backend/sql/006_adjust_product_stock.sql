@@ -0,0 +1,100 @@
+-- Ajuste relativo de stock (POST /api/v1/products/stock/adjustments).
+--
+-- Recibe un arreglo JSON de {"product_id": uuid, "sku": text, "delta": int}
+-- (product_id o sku; delta negativo al vender) y lo aplica todo o nada en
+-- una sola llamada:
+--
+--   1. bloquea las filas afectadas (FOR UPDATE, en orden de id para que
+--      dos pedidos con los mismos productos no se bloqueen mutuamente);
+--   2. con el stock ya bloqueado, rechaza el lote si algún producto no
+--      existe, quedaría con stock negativo o, con p_enforce_order_limits,
+--      si una salida no respeta min/max_order_quantity;
+--   3. si no hay rechazos, suma los deltas (un producto repetido suma todos).
+--
+-- Los pedidos simultáneos sobre el mismo producto esperan el bloqueo y
+-- leen el stock que dejó el anterior: no se pierden actualizaciones.
+--
+-- Retorna {"updated": [{id, sku, stock_quantity, updated_at}],
+--          "rejected": [{position, product_id, sku, delta, stock_quantity, reason}]}
+--
+-- Aplicar desde el SQL Editor de Supabase. Sin esta función el endpoint
+-- responde 501: hacerlo con lecturas y escrituras separadas no sería atómico.
+
+create or replace function public.adjust_product_stock(
+    items jsonb,
+    p_enforce_order_limits boolean default false
+)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_rejected jsonb;
+    v_updated jsonb;
+begin
+    -- FOR UPDATE espera a los pedidos en curso y lee el stock que dejaron
+    with requested as (
+        select i.position - 1 as position, i.product_id, i.sku, i.delta, p.id
+          from rows from (jsonb_to_recordset(items) as (product_id uuid, sku text, delta integer))
+               with ordinality as i(product_id, sku, delta, position)
+          left join public.products as p
+            on (i.product_id is not null and p.id = i.product_id)
+            or (i.product_id is null and p.sku = i.sku)
+    ),
+    locked as (
+        select p.id, p.stock_quantity, p.min_order_quantity, p.max_order_quantity
+          from public.products as p
+         where p.id in (select r.id from requested as r)
+         order by p.id
+           for update
+    ),
+    totals as (
+        select r.id, sum(r.delta) as total
+          from requested as r
+         group by r.id
+    )
+    select coalesce(jsonb_agg(checked order by checked.position), '[]')
+      into v_rejected
+      from (
+        select r.position, r.product_id, r.sku, r.delta, l.stock_quantity,
+               case
+                   when l.id is null then 'not_found'
+                   when l.stock_quantity + t.total < 0 then 'insufficient_stock'
+                   when p_enforce_order_limits and r.delta < 0
+                        and -r.delta < l.min_order_quantity then 'below_min_order_quantity'
+                   when p_enforce_order_limits and r.delta < 0
+                        and -r.delta > l.max_order_quantity then 'above_max_order_quantity'
+               end as reason
+          from requested as r
+          left join locked as l on l.id = r.id
+          left join totals as t on t.id = r.id
+      ) as checked
+     where checked.reason is not null;
+
+    if jsonb_array_length(v_rejected) > 0 then
+        return jsonb_build_object('updated', '[]'::jsonb, 'rejected', v_rejected);
+    end if;
+
+    -- Las filas siguen bloqueadas por esta transacción
+    with totals as (
+        select p.id, sum(i.delta) as total
+          from jsonb_to_recordset(items) as i(product_id uuid, sku text, delta integer)
+          join public.products as p
+            on (i.product_id is not null and p.id = i.product_id)
+            or (i.product_id is null and p.sku = i.sku)
+         group by p.id
+    ),
+    changed as (
+        update public.products as p
+           set stock_quantity = p.stock_quantity + t.total,
+               updated_at = now()
+          from totals as t
+         where p.id = t.id
+        returning p.id, p.sku, p.stock_quantity, p.updated_at
+    )
+    select coalesce(jsonb_agg(to_jsonb(changed)), '[]')
+      into v_updated
+      from changed;
+
+    return jsonb_build_object('updated', v_updated, 'rejected', '[]'::jsonb);
+end;
+$$;
@@ -0,0 +1,69 @@
+-- Sincronización incremental del catálogo (GET /api/v1/changes).
+--
+-- 1. updated_at se actualiza en cada UPDATE de productos y categorías,
+--    venga de la API, de las funciones de stock o del SQL Editor; sin este
+--    trigger un PUT no mueve updated_at y el cambio no se sincroniza.
+-- 2. catalog_tombstones guarda una lápida por cada producto o categoría
+--    eliminada, para que los clientes borren su copia local.
+-- 3. Índices por (fecha, id) para leer cada flujo desde el cursor sin
+--    recorrer el catálogo.
+--
+-- Aplicar desde el SQL Editor de Supabase. Sin esta migración el endpoint
+-- responde 501: sin lápidas los clientes no se enterarían de lo eliminado.
+--
+-- Las lápidas crecen con cada eliminación; se pueden purgar las antiguas
+-- (p. ej. de más de 90 días) siempre que ningún cliente tenga un cursor
+-- anterior: esos clientes deben volver a sincronizar desde cero.
+
+create or replace function public.set_updated_at()
+returns trigger
+language plpgsql
+as $$
+begin
+    new.updated_at := now();
+    return new;
+end;
+$$;
+
+drop trigger if exists products_set_updated_at on public.products;
+create trigger products_set_updated_at
+    before update on public.products
+    for each row execute function public.set_updated_at();
+
+drop trigger if exists categories_set_updated_at on public.categories;
+create trigger categories_set_updated_at
+    before update on public.categories
+    for each row execute function public.set_updated_at();
+
+create table if not exists public.catalog_tombstones (
+    id bigint generated always as identity primary key,
+    table_name text not null check (table_name in ('categories', 'products')),
+    row_id uuid not null,
+    deleted_at timestamptz not null default now()
+);
+
+create or replace function public.record_catalog_tombstone()
+returns trigger
+language plpgsql
+as $$
+begin
+    insert into public.catalog_tombstones (table_name, row_id)
+    values (tg_table_name, old.id);
+    return old;
+end;
+$$;
+
+drop trigger if exists products_record_tombstone on public.products;
+create trigger products_record_tombstone
+    after delete on public.products
+    for each row execute function public.record_catalog_tombstone();
+
+drop trigger if exists categories_record_tombstone on public.categories;
+create trigger categories_record_tombstone
+    after delete on public.categories
+    for each row execute function public.record_catalog_tombstone();
+
+-- Un índice por flujo, en el orden en que los lee el endpoint
+create index if not exists products_updated_at_idx on public.products (updated_at, id);
+create index if not exists categories_updated_at_idx on public.categories (updated_at, id);
+create index if not exists catalog_tombstones_deleted_at_idx on public.catalog_tombstones (deleted_at, id);
@@ -1,2 +1,3 @@
 #!/bin/bash
-uvicorn main:app --host 0.0.0.0 --port ${PORT:-8000}
\ No newline at end of file
+# WEB_CONCURRENCY: procesos de uvicorn; cada uno crea su cliente de Supabase al arrancar
+uvicorn main:app --host 0.0.0.0 --port ${PORT:-8000} --workers ${WEB_CONCURRENCY:-1}
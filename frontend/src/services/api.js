@@ -34,10 +34,10 @@ export const apiService = {
   },
 
   // === CATEGORÍAS ===
-  async getCategories(activeOnly = true) {
+  async getCategories(activeOnly = true, includeCounts = false) {
     try {
       const response = await api.get('/api/v1/categories/', {
-        params: { active_only: activeOnly }
+        params: { active_only: activeOnly, include_counts: includeCounts }
       })
       return response.data
     } catch (error) {